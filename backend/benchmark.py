@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the retrieval stack.
+
+Usage:
+    python -m backend.benchmark index [--path vector_store_data | --synthetic 50000] [--types flat,hnsw,ivfpq,ivfsq]
+    python -m backend.benchmark memory [--chunks 20000]
+    python -m backend.benchmark load [--synthetic 50000] [--types flat,hnsw,ivfpq,ivfsq]
+    python -m backend.benchmark batch [--synthetic 50000] [--batch-sizes 1,8,32]
+    python -m backend.benchmark hybrid [--synthetic 20000] [--noise 1.0]
+    python -m backend.benchmark chunk [--pages 20] [--page-kb 500] [--workers 0,2,4]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+import numpy as np
+from backend.chunk_pool import ChunkingPool
+from backend.chunker import TextChunker
+from backend.sharded_store import ShardedVectorStore
+from backend.vector_store import LexicalIndexBuild, VectorStore, INDEX_TYPES
+
+logger = logging.getLogger(__name__)
+
+def synthetic_vectors(count: int, dimension: int = 1536, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors that roughly mimic the neighbourhood structure of text embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def sample_queries(vectors: np.ndarray, count: int, noise: float = 0.05, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of stored vectors, so every query has meaningful neighbours"""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    queries = picks + noise * rng.standard_normal(picks.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries.astype(np.float32)
+
+def load_vectors(args) -> np.ndarray:
+    if args.synthetic:
+        return synthetic_vectors(args.synthetic)
+    store = ShardedVectorStore()
+    store.load_from_disk(args.path, read_only=True)
+    if store.is_empty():
+        raise SystemExit(f"No vectors found at '{args.path}'; use --synthetic N instead")
+    return np.concatenate([shard._stored_vectors()[1] for shard in store.shards.values()])
+
+def build_store(index_type: str, vectors: np.ndarray, args) -> VectorStore:
+    store = VectorStore(index_type=index_type, ef_search=args.ef_search, nprobe=args.nprobe, min_train_size=1)
+    chunks = [{'text': '', 'url': f'bench://{i}', 'chunk_id': i} for i in range(len(vectors))]
+    store.add_embeddings(vectors, chunks)
+    return store
+
+def bench_index(args) -> List[Dict[str, Any]]:
+    """Recall-vs-latency report of each index type against the exact flat baseline"""
+    vectors = load_vectors(args)
+    queries = sample_queries(vectors, args.queries)
+    reports = []
+    for index_type in args.types.split(','):
+        started = time.perf_counter()
+        store = build_store(index_type, vectors, args)
+        build_seconds = time.perf_counter() - started
+        report = store.evaluate_index(queries, top_k=args.top_k)
+        report['build_seconds'] = build_seconds
+        reports.append(report)
+    recall_key = f"recall@{min(args.top_k, len(vectors))}"
+    print(f"{'index':<8}{'vectors':>10}{recall_key:>12}{'ms/query':>10}{'flat ms':>10}{'speedup':>9}{'build s':>9}")
+    for r in reports:
+        print(f"{r['index_type']:<8}{r['vectors']:>10}{r[recall_key]:>12.3f}{r['index_ms_per_query']:>10.3f}"
+              f"{r['flat_ms_per_query']:>10.3f}{r['speedup']:>9.1f}{r['build_seconds']:>9.2f}")
+    return reports
+
+def synthetic_chunks(count: int) -> List[Dict[str, Any]]:
+    text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20
+    return [{'text': text, 'url': f'https://bench.example/page/{i // 10}', 'tokens': 240, 'chunk_id': i % 10,
+             'source_domain': 'bench.example', 'title': f'Page {i // 10}', 'depth': 1} for i in range(count)]
+
+def _measure(build) -> Dict[str, Any]:
+    """Python heap retained by build() and the size of what it writes to disk"""
+    tracemalloc.start()
+    retained = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with tempfile.TemporaryDirectory() as tmp:
+        disk_bytes = retained(tmp)
+    return {'heap_mb': current / 2**20, 'peak_mb': peak / 2**20, 'disk_mb': disk_bytes / 2**20}
+
+def bench_memory(args) -> Dict[str, Dict[str, Any]]:
+    """Heap and on-disk size of chunk dicts carrying float lists versus the columnar store"""
+    vectors = synthetic_vectors(args.chunks)
+    reports = {}
+
+    def build_dicts():
+        chunks = synthetic_chunks(len(vectors))
+        for chunk, vector in zip(chunks, vectors):
+            chunk['embedding'] = vector.tolist()
+
+        def save(tmp: str) -> int:
+            path = os.path.join(tmp, 'chunks.pkl')
+            with open(path, 'wb') as f:
+                pickle.dump(chunks, f)
+            return os.path.getsize(path)
+        return save
+    reports['dict+list'] = _measure(build_dicts)
+
+    def build_store():
+        store = VectorStore()
+        store.add_embeddings(vectors, synthetic_chunks(len(vectors)))
+
+        def save(tmp: str) -> int:
+            prefix = os.path.join(tmp, 'store')
+            store.save_to_disk(prefix)
+            # Both layouts write the FAISS index alike, so leave it out
+            return sum(os.path.getsize(os.path.join(prefix, name)) for name in os.listdir(prefix)
+                       if not name.endswith('.faiss'))
+        return save
+    reports['columnar'] = _measure(build_store)
+
+    print(f"{'layout':<12}{'chunks':>10}{'heap MB':>10}{'peak MB':>10}{'disk MB':>10}")
+    for layout, r in reports.items():
+        print(f"{layout:<12}{args.chunks:>10}{r['heap_mb']:>10.1f}{r['peak_mb']:>10.1f}{r['disk_mb']:>10.1f}")
+    # ru_maxrss is in KiB on Linux
+    print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    return reports
+
+def _process_memory_mb() -> Dict[str, float]:
+    """Resident memory of this process and its private part (resident minus file-backed shared pages)"""
+    with open('/proc/self/statm') as f:
+        resident, shared = (int(field) for field in f.read().split()[1:3])
+    page_mb = os.sysconf('SC_PAGE_SIZE') / 2**20
+    return {'rss_mb': resident * page_mb, 'private_mb': (resident - shared) * page_mb}
+
+def _load_and_search(path: str, queries: np.ndarray) -> Dict[str, Any]:
+    """Runs in a fresh process: memory growth from loading a saved store, and after searching it"""
+    before = _process_memory_mb()
+    started = time.perf_counter()
+    store = VectorStore()
+    store.load_from_disk(path)
+    load_seconds = time.perf_counter() - started
+    loaded = _process_memory_mb()
+    store.search_batch(queries, top_k=10)
+    searched = _process_memory_mb()
+    return {
+        'load_seconds': load_seconds,
+        'loaded_rss_mb': loaded['rss_mb'] - before['rss_mb'],
+        'loaded_private_mb': loaded['private_mb'] - before['private_mb'],
+        'searched_rss_mb': searched['rss_mb'] - before['rss_mb'],
+        'searched_private_mb': searched['private_mb'] - before['private_mb']
+    }
+
+def bench_load(args) -> List[Dict[str, Any]]:
+    """
+    Memory a saved store costs a process that loads it, per index type. Mapped vectors show up
+    in RSS as shared page cache once searches touch them; private memory is what the process
+    owns on top of the files.
+    """
+    if not os.path.exists('/proc/self/statm'):
+        raise SystemExit("The load benchmark reads /proc/self/statm and only runs on Linux")
+    vectors = synthetic_vectors(args.synthetic)
+    queries = sample_queries(vectors, 32)
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type in args.types.split(','):
+            path = os.path.join(tmp, index_type)
+            build_store(index_type, vectors, args).save_to_disk(path)
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                report = pool.submit(_load_and_search, path, queries).result()
+            report['index_type'] = index_type
+            report['disk_mb'] = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2**20
+            reports.append(report)
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dimensions ({vectors.nbytes / 2**20:.0f} MB); memory growth in MB")
+    print(f"{'index':<8}{'load s':>8}{'RSS':>8}{'private':>9}{'RSS after search':>18}{'private':>9}{'disk':>8}")
+    for r in reports:
+        print(f"{r['index_type']:<8}{r['load_seconds']:>8.2f}{r['loaded_rss_mb']:>8.1f}{r['loaded_private_mb']:>9.1f}"
+              f"{r['searched_rss_mb']:>18.1f}{r['searched_private_mb']:>9.1f}{r['disk_mb']:>8.1f}")
+    return reports
+
+def coded_chunks(count: int, seed: int = 2) -> List[Dict[str, Any]]:
+    """Chunks of filler words that each mention one unique product code"""
+    rng = np.random.default_rng(seed)
+    words = np.array(["install", "device", "error", "setting", "update", "account", "network", "battery",
+                      "screen", "warranty", "support", "reset", "model", "cable", "firmware", "order"])
+    return [{'text': f"{' '.join(rng.choice(words, 40))} Product code SKU-{i:06d} {' '.join(rng.choice(words, 40))}",
+             'url': f'https://bench.example/product/{i}', 'tokens': 100, 'chunk_id': 0} for i in range(count)]
+
+def bench_hybrid(args) -> List[Dict[str, Any]]:
+    """
+    Recall and latency of dense against hybrid search for code lookups. Each query asks for one
+    product code; its embedding is the target chunk's vector under heavy noise, standing in for
+    an embedding model that does not capture the code.
+    """
+    vectors = synthetic_vectors(args.synthetic)
+    store = VectorStore(index_type=args.index_type, min_train_size=1)
+    store.add_embeddings(vectors, coded_chunks(len(vectors)))
+    targets = np.random.default_rng(3).integers(0, len(vectors), args.queries)
+    queries = vectors[targets] + args.noise * np.random.default_rng(4).standard_normal(vectors[targets].shape).astype(np.float32)
+    texts = [f"Which device has product code SKU-{target:06d}?" for target in targets]
+    # Time a full build like the first hybrid search after a load runs; the store's own index was kept up to date on add
+    started = time.perf_counter()
+    LexicalIndexBuild(store).run()
+    build_seconds = time.perf_counter() - started
+
+    reports = []
+    for mode in ('dense', 'hybrid'):
+        started = time.perf_counter()
+        hits = [store.search(query, top_k=args.top_k, query_text=text if mode == 'hybrid' else None)
+                for query, text in zip(queries, texts)]
+        elapsed = time.perf_counter() - started
+        found = sum(1 for target, query_hits in zip(targets, hits) if any(h['vector_id'] == target for h in query_hits))
+        reports.append({'mode': mode, f'recall@{args.top_k}': found / len(targets),
+                        'ms_per_query': elapsed * 1000 / len(targets)})
+    print(f"{len(vectors)} chunks, lexical index built in {build_seconds:.2f}s: {store.lexical_index().get_stats()}")
+    print(f"{'mode':<8}{f'recall@{args.top_k}':>12}{'ms/query':>10}")
+    for r in reports:
+        print(f"{r['mode']:<8}{r[f'recall@{args.top_k}']:>12.3f}{r['ms_per_query']:>10.3f}")
+    return reports
+
+def bench_batch(args) -> List[Dict[str, Any]]:
+    """Queries per second of one-at-a-time search against search_batch at several batch sizes"""
+    vectors = load_vectors(args)
+    store = build_store(args.index_type, vectors, args)
+    queries = sample_queries(vectors, args.queries)
+    reports = []
+    started = time.perf_counter()
+    for query in queries:
+        store.search(query, top_k=args.top_k)
+    baseline_qps = len(queries) / (time.perf_counter() - started)
+    for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+        started = time.perf_counter()
+        for start in range(0, len(queries), batch_size):
+            store.search_batch(queries[start:start + batch_size], top_k=args.top_k)
+        qps = len(queries) / (time.perf_counter() - started)
+        reports.append({'batch_size': batch_size, 'qps': qps, 'speedup': qps / baseline_qps})
+    print(f"{args.index_type} index, {len(vectors)} vectors, single-query search: {baseline_qps:.0f} qps")
+    print(f"{'batch':>6}{'qps':>10}{'speedup':>9}")
+    for r in reports:
+        print(f"{r['batch_size']:>6}{r['qps']:>10.0f}{r['speedup']:>9.2f}")
+    return reports
+
+def synthetic_pages(kind: str, count: int, size_kb: int, seed: int = 5) -> List[str]:
+    """Large pages of prose sentences, or of indented JSON like the API endpoint scraper produces"""
+    rng = np.random.default_rng(seed)
+    words = np.array("the store returns a page of results for each query and every site keeps its own index "
+                     "while new content is crawled embedded and saved to disk in small segments".split())
+    pages = []
+    for _ in range(count):
+        parts, size = [], 0
+        while size < size_kb * 1024:
+            if kind == 'prose':
+                part = ' '.join(rng.choice(words, rng.integers(5, 30))).capitalize() + '.'
+            else:
+                part = json.dumps({'id': int(rng.integers(1e6)), 'name': ' '.join(rng.choice(words, 3)),
+                                   'tags': rng.choice(words, 4).tolist(), 'score': float(rng.random())}, indent=2)
+            parts.append(part)
+            size += len(part) + 1
+        pages.append(' '.join(parts) if kind == 'prose' else '[' + ',\n'.join(parts) + ']')
+    return pages
+
+def bench_chunk(args) -> List[Dict[str, Any]]:
+    """Chunking throughput on large prose pages and unpunctuated JSON dumps"""
+    chunker = TextChunker(max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens)
+    reports = []
+    for kind in ('prose', 'json'):
+        pages = synthetic_pages(kind, args.pages, args.page_kb)
+        started = time.perf_counter()
+        chunk_count = sum(len(chunker.chunk_text(page, f'bench://{kind}/{i}', 'text')) for i, page in enumerate(pages))
+        elapsed = time.perf_counter() - started
+        megabytes = sum(len(page) for page in pages) / 1e6
+        reports.append({'kind': kind, 'pages': len(pages), 'chunks': chunk_count, 'chunks_per_sec': chunk_count / elapsed,
+                        'pages_per_sec': len(pages) / elapsed, 'mb_per_sec': megabytes / elapsed})
+    print(f"{args.pages} pages of {args.page_kb}KB each, max_tokens={args.max_tokens}")
+    print(f"{'kind':<7}{'chunks':>8}{'chunks/s':>10}{'pages/s':>9}{'MB/s':>7}")
+    for r in reports:
+        print(f"{r['kind']:<7}{r['chunks']:>8}{r['chunks_per_sec']:>10.0f}{r['pages_per_sec']:>9.2f}{r['mb_per_sec']:>7.2f}")
+
+    if args.workers:
+        requests = [(page, f'bench://{i}', 'text', {}) for i, page in
+                    enumerate(synthetic_pages('prose', args.pages, args.page_kb) + synthetic_pages('json', args.pages, args.page_kb))]
+        print(f"\nChunking pool on {len(requests)} pages ({os.cpu_count()} CPUs); loop lag is the longest event loop stall")
+        print(f"{'workers':>8}{'pages/s':>9}{'loop lag ms':>13}")
+        for workers in (int(count) for count in args.workers.split(',')):
+            pool = ChunkingPool(chunker, workers=workers, min_parallel_chars=0)
+            if workers:
+                # Start the worker processes outside the measurement
+                asyncio.run(pool.chunk_many(requests[:workers * pool.pages_per_task]))
+            elapsed, lag = asyncio.run(_measure_pool(pool, requests))
+            pool.close()
+            reports.append({'workers': workers, 'pages_per_sec': len(requests) / elapsed, 'loop_lag_ms': lag * 1000})
+            print(f"{workers:>8}{len(requests) / elapsed:>9.2f}{lag * 1000:>13.1f}")
+    return reports
+
+async def _measure_pool(pool: ChunkingPool, requests: List[Any]):
+    """Time chunk_many while a ticker records the longest gap between event loop iterations"""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag = max(lag, time.perf_counter() - before - 0.001)
+
+    task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await pool.chunk_many(requests)
+    elapsed = time.perf_counter() - started
+    done = True
+    await task
+    return elapsed, lag
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark harness for the retrieval stack")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser('index', help="Recall vs latency of ANN index types against flat search")
+    index_parser.add_argument('--path', default='vector_store_data', help="Vector store path prefix to benchmark")
+    index_parser.add_argument('--synthetic', type=int, default=0, help="Use N synthetic vectors instead of a saved store")
+    index_parser.add_argument('--types', default=','.join(INDEX_TYPES), help="Comma-separated index types")
+    index_parser.add_argument('--queries', type=int, default=200)
+    index_parser.add_argument('--top-k', type=int, default=10)
+    index_parser.add_argument('--ef-search', type=int, default=64)
+    index_parser.add_argument('--nprobe', type=int, default=16)
+    index_parser.set_defaults(func=bench_index)
+
+    batch_parser = subparsers.add_parser('batch', help="Throughput of batched against single-query search")
+    batch_parser.add_argument('--path', default='vector_store_data', help="Vector store path to benchmark")
+    batch_parser.add_argument('--synthetic', type=int, default=0, help="Use N synthetic vectors instead of a saved store")
+    batch_parser.add_argument('--index-type', default='hnsw', choices=INDEX_TYPES)
+    batch_parser.add_argument('--batch-sizes', default='1,8,32,64')
+    batch_parser.add_argument('--queries', type=int, default=512)
+    batch_parser.add_argument('--top-k', type=int, default=5)
+    batch_parser.add_argument('--ef-search', type=int, default=64)
+    batch_parser.add_argument('--nprobe', type=int, default=16)
+    batch_parser.set_defaults(func=bench_batch)
+
+    hybrid_parser = subparsers.add_parser('hybrid', help="Recall and latency of dense vs hybrid (BM25 + dense) search")
+    hybrid_parser.add_argument('--synthetic', type=int, default=20000)
+    hybrid_parser.add_argument('--index-type', default='flat', choices=INDEX_TYPES)
+    hybrid_parser.add_argument('--noise', type=float, default=1.0, help="Query embedding noise; higher is a worse embedding match")
+    hybrid_parser.add_argument('--queries', type=int, default=200)
+    hybrid_parser.add_argument('--top-k', type=int, default=5)
+    hybrid_parser.set_defaults(func=bench_hybrid)
+
+    chunk_parser = subparsers.add_parser('chunk', help="Chunking throughput on large pages")
+    chunk_parser.add_argument('--pages', type=int, default=20)
+    chunk_parser.add_argument('--page-kb', type=int, default=500)
+    chunk_parser.add_argument('--max-tokens', type=int, default=5000)
+    chunk_parser.add_argument('--overlap-tokens', type=int, default=50)
+    chunk_parser.add_argument('--workers', default='', help="Also measure the chunking pool at these worker counts, e.g. 0,2,4")
+    chunk_parser.set_defaults(func=bench_chunk)
+
+    memory_parser = subparsers.add_parser('memory', help="Memory and on-disk size of the chunk/embedding storage")
+    memory_parser.add_argument('--chunks', type=int, default=20000)
+    memory_parser.set_defaults(func=bench_memory)
+
+    load_parser = subparsers.add_parser('load', help="Load time and process memory of saved stores")
+    load_parser.add_argument('--synthetic', type=int, default=50000)
+    load_parser.add_argument('--types', default=','.join(INDEX_TYPES), help="Comma-separated index types")
+    load_parser.add_argument('--ef-search', type=int, default=64)
+    load_parser.add_argument('--nprobe', type=int, default=16)
+    load_parser.set_defaults(func=bench_load)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+class _PooledPage:
+    """
+    A pool slot: a warm browser context and page together with its usage counter. The page is
+    None while the slot is empty, after opening it failed; the next lease of the slot retries.
+    """
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.context = None
+        self.page = None
+        self.uses = 0
+
+
+class BrowserPool:
+    def __init__(self, size: int = 4, max_uses_per_page: int = 50):
+        """
+        Initialize a pool of warm Playwright pages backed by one long-lived Chromium process.
+        The browser is launched lazily on the first lease.
+
+        Args:
+            size: Number of browser contexts/pages kept warm in the pool
+            max_uses_per_page: Number of leases after which a page and its context are recycled
+        """
+        self.size = size
+        self.max_uses_per_page = max_uses_per_page
+        self._playwright = None
+        self._browser = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._pages: List[_PooledPage] = []
+        # Incremented on every launch; slots of an earlier browser are dropped when returned
+        self._generation = 0
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+        self.stats = {
+            'leases': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'recycled_pages': 0,
+            'failed_pages': 0,
+            'browser_launches': 0,
+            'total_wait_seconds': 0.0
+        }
+
+    async def _open_page(self, pooled: _PooledPage):
+        context = await self._browser.new_context()
+        try:
+            page = await context.new_page()
+        except Exception:
+            await context.close()
+            raise
+        pooled.context, pooled.page, pooled.uses = context, page, 0
+
+    async def _close_page(self, pooled: _PooledPage):
+        context, pooled.context, pooled.page = pooled.context, None, None
+        if context is None:
+            return
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled browser context: {str(e)}")
+
+    async def start(self):
+        """Launch the browser and warm up the pool if it is not running yet"""
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._browser is not None:
+                logger.warning("Pooled browser disconnected, relaunching")
+                await self._shutdown_browser()
+            self._closed = False
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch()
+            self.stats['browser_launches'] += 1
+            self._generation += 1
+            # Keep the queue across launches so that leases already waiting on it get the new pages
+            if self._idle is None:
+                self._idle = asyncio.Queue()
+            while not self._idle.empty():
+                self._idle.get_nowait()
+            self._pages = [_PooledPage(self._generation) for _ in range(self.size)]
+            warm = 0
+            for pooled in self._pages:
+                try:
+                    await self._open_page(pooled)
+                    warm += 1
+                except Exception as e:
+                    logger.warning(f"Failed to open pooled page, retrying on lease: {str(e)}")
+                self._idle.put_nowait(pooled)
+            logger.info(f"Browser pool started with {warm}/{self.size} warm pages")
+
+    async def _recycle(self, pooled: _PooledPage):
+        """Replace a worn-out or broken page with a fresh one, leaving the slot empty if that fails"""
+        await self._close_page(pooled)
+        if self._closed or self._browser is None or not self._browser.is_connected():
+            return
+        try:
+            await self._open_page(pooled)
+        except Exception as e:
+            logger.warning(f"Failed to recycle pooled page: {str(e)}")
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Lease a warm page from the pool for the duration of the context.
+        Pages are recycled after max_uses_per_page leases or when the caller raised.
+        Raises the error of opening the page if the leased slot was empty and opening it
+        failed again; the slot goes back to the pool.
+        """
+        if self._closed or self._browser is None or not self._browser.is_connected():
+            await self.start()
+        loop = asyncio.get_running_loop()
+        wait_started = loop.time()
+        while True:
+            pooled = await self._idle.get()
+            if pooled.generation == self._generation:
+                break
+        self.stats['total_wait_seconds'] += loop.time() - wait_started
+        if pooled.page is None:
+            try:
+                await self._open_page(pooled)
+            except BaseException:
+                self._idle.put_nowait(pooled)
+                raise
+        self.stats['leases'] += 1
+        self.stats['in_use'] += 1
+        self.stats['peak_in_use'] = max(self.stats['peak_in_use'], self.stats['in_use'])
+        pooled.uses += 1
+        failed = False
+        try:
+            yield pooled.page
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.stats['in_use'] -= 1
+            # A slot of a browser that was closed or relaunched meanwhile is not returned;
+            # the new launch filled the pool with fresh slots
+            if pooled.generation == self._generation and not self._closed:
+                if failed or pooled.uses >= self.max_uses_per_page or pooled.page.is_closed():
+                    if failed:
+                        self.stats['failed_pages'] += 1
+                    else:
+                        self.stats['recycled_pages'] += 1
+                    await self._recycle(pooled)
+                if pooled.generation == self._generation and not self._closed:
+                    self._idle.put_nowait(pooled)
+
+    async def _shutdown_browser(self):
+        for pooled in list(self._pages):
+            await self._close_page(pooled)
+        self._pages = []
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                logger.debug(f"Error closing pooled browser: {str(e)}")
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def close(self):
+        """Close all pages, the browser and the Playwright driver"""
+        async with self._start_lock:
+            self._closed = True
+            await self._shutdown_browser()
+            logger.info("Browser pool closed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool utilisation statistics"""
+        running = self._browser is not None and self._browser.is_connected()
+        return {
+            **self.stats,
+            'size': self.size,
+            'running': running,
+            'idle': self._idle.qsize() if running and self._idle else 0,
+            'utilisation': self.stats['in_use'] / self.size if self.size else 0.0,
+            'avg_wait_seconds': self.stats['total_wait_seconds'] / self.stats['leases'] if self.stats['leases'] else 0.0
+        }
@@ -0,0 +1,160 @@
+"""
+Near-duplicate chunk elimination between chunking and embedding.
+"""
+import hashlib
+import logging
+import re
+import zlib
+from itertools import takewhile
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from backend.chunk_records import chunk_domain
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'\w+')
+
+class ChunkDeduplicator:
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16, shingle_size: int = 3,
+                 seed: int = 1):
+        """
+        Drop chunks that are near-identical to one already seen in the same scrape, such as
+        navigation text, cookie banners and footers repeated on every page. Each chunk gets a
+        MinHash signature over its word shingles, and signatures are bucketed by band (LSH),
+        so a chunk is only compared with the few earlier chunks it shares a bucket with. A
+        duplicate is merged into the first copy: its URL is added to that chunk's
+        'source_urls' list, and it is not embedded or indexed.
+
+        One instance holds the state of one scrape. Only the signature, URL list and domain of
+        each kept chunk stay for the whole scrape; the chunk itself is held until it is indexed.
+        Chunks are not compared with those already in the index, so a re-crawl re-embeds the
+        boilerplate of the pages it re-chunks.
+
+        Args:
+            threshold: Estimated Jaccard similarity of the shingle sets from which chunks count as duplicates
+            num_perm: MinHash signature length
+            bands: Number of LSH bands; num_perm must be divisible by it
+            shingle_size: Words per shingle
+            seed: Seed of the MinHash permutations
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: odd 64-bit multipliers applied to 32-bit shingle hashes
+        self._multipliers = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._offsets = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._exact: Dict[Tuple[Optional[str], bytes], int] = {}
+        self._buckets: Dict[Tuple[Optional[str], int, bytes], List[int]] = {}
+        # Per representative (kept chunk), by position: signature, source URLs and domain
+        self._signatures: List[np.ndarray] = []
+        self._urls: List[List[str]] = []
+        self._domains: List[str] = []
+        # Representatives not indexed yet: position -> chunk, and id(chunk) -> position
+        self._queued: Dict[int, Dict[str, Any]] = {}
+        self._positions: Dict[int, int] = {}
+        # Representative -> (vector id, number of source URLs when it was indexed)
+        self._indexed: Dict[int, Tuple[int, int]] = {}
+        self.stats = {'chunks': 0, 'duplicates': 0}
+
+    def _signature(self, words: List[str]) -> np.ndarray:
+        size = min(self.shingle_size, len(words))
+        shingles = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        with np.errstate(over='ignore'):
+            permuted = (hashes[:, None] * self._multipliers + self._offsets) >> np.uint64(32)
+        return permuted.min(axis=0)
+
+    def _merge(self, representative: int, chunk: Dict[str, Any]):
+        urls = self._urls[representative]
+        if chunk.get('url', '') not in urls:
+            urls.append(chunk.get('url', ''))
+        kept = self._queued.get(representative)
+        if kept is not None:
+            # Still to be indexed, so the chunk carries the list itself
+            kept['source_urls'] = urls
+        self.stats['duplicates'] += 1
+
+    def filter(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Return the chunks that are not duplicates of earlier ones, in order. Chunks are only
+        compared with chunks of the same content type.
+        """
+        unique = []
+        for chunk in chunks:
+            self.stats['chunks'] += 1
+            content_type = chunk.get('content_type')
+            words = _WORD.findall(chunk.get('text', '').lower())
+            exact_key = (content_type, hashlib.sha1(' '.join(words).encode('utf-8')).digest())
+            if exact_key in self._exact:
+                self._merge(self._exact[exact_key], chunk)
+                continue
+            representative = None
+            band_keys = []
+            if words:
+                signature = self._signature(words)
+                band_keys = [(content_type, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                             for band in range(self.bands)]
+                candidates = {i for key in band_keys for i in self._buckets.get(key, ())}
+                for i in sorted(candidates):
+                    if np.count_nonzero(self._signatures[i] == signature) >= self.threshold * self.num_perm:
+                        representative = i
+                        break
+            else:
+                signature = np.zeros(self.num_perm, dtype=np.uint64)
+            if representative is not None:
+                self._merge(representative, chunk)
+                continue
+            index = len(self._signatures)
+            self._signatures.append(signature)
+            self._urls.append(list(chunk.get('source_urls') or [chunk.get('url', '')]))
+            self._domains.append(chunk_domain(chunk))
+            self._queued[index] = chunk
+            self._positions[id(chunk)] = index
+            self._exact[exact_key] = index
+            for key in band_keys:
+                self._buckets.setdefault(key, []).append(index)
+            unique.append(chunk)
+        return unique
+
+    def mark_indexed(self, chunks: List[Dict[str, Any]], vector_ids: List[int]):
+        """
+        Record the vector ids of kept chunks that were indexed, so that URLs of duplicates
+        found afterwards can still be added to them (see late_source_urls)
+        """
+        indexed = []
+        for chunk, vector_id in zip(chunks, vector_ids):
+            position = self._positions.pop(id(chunk), None)
+            if position is not None:
+                del self._queued[position]
+                self._indexed[position] = (vector_id, len(self._urls[position]))
+                indexed.append(position)
+        if indexed:
+            # Chunks are indexed in the order they were kept, so any kept before the last one
+            # indexed and still queued were dropped on the way (their embedding failed)
+            last = max(indexed)
+            for position in list(takewhile(lambda queued: queued < last, self._queued)):
+                del self._positions[id(self._queued.pop(position))]
+
+    def late_source_urls(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        """
+        Metadata updates for indexed chunks that gained source URLs after they were indexed
+
+        Returns:
+            domain -> vector id -> {'source_urls': [...]}
+        """
+        updates: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        for position, (vector_id, url_count) in self._indexed.items():
+            urls = self._urls[position]
+            if len(urls) > url_count:
+                updates.setdefault(self._domains[position], {})[vector_id] = {'source_urls': list(urls)}
+        return updates
+
+    @property
+    def ratio(self) -> float:
+        """Fraction of the chunks seen that were dropped as duplicates"""
+        return self.stats['duplicates'] / self.stats['chunks'] if self.stats['chunks'] else 0.0
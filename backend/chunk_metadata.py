@@ -0,0 +1,141 @@
+import json
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from backend.chunk_records import ChunkRecord
+
+logger = logging.getLogger(__name__)
+
+class ChunkMetadataStore:
+    def __init__(self, path: str):
+        """
+        SQLite table of chunk records keyed by vector id. Rows are read on demand, so a
+        loaded store only pays for the metadata of the hits it returns.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets the voice agent read while the API writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, domain TEXT NOT NULL, content_type TEXT, url TEXT NOT NULL, "
+            "text TEXT NOT NULL, tokens INTEGER NOT NULL, chunk_id INTEGER NOT NULL, extra TEXT)"
+        )
+        # Page-level deletes during incremental re-crawls look chunks up by URL
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_url ON chunks(url)")
+        # Further pages a deduplicated chunk was found on (its 'source_urls' besides url)
+        has_sources = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_sources'"
+        ).fetchone()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunk_sources (id INTEGER NOT NULL, url TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunk_sources_url ON chunk_sources(url)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunk_sources_id ON chunk_sources(id)")
+        if not has_sources:
+            rows = self._conn.execute(
+                "SELECT id, url, extra FROM chunks WHERE extra LIKE '%\"source_urls\"%'"
+            ).fetchall()
+            self._conn.executemany("INSERT INTO chunk_sources VALUES (?, ?)", [
+                (chunk_id, source) for chunk_id, url, extra in rows
+                for source in self._extra_sources(url, json.loads(extra))
+            ])
+        self._conn.commit()
+
+    @staticmethod
+    def _extra_sources(url: str, extra: Optional[Dict]) -> List[str]:
+        return [source for source in (extra or {}).get('source_urls') or () if source != url]
+
+    def put_many(self, records: Iterable[ChunkRecord]):
+        records_list = list(records)
+        rows = [
+            (r.id, r.source_domain, r.content_type, r.url, r.text, r.tokens, r.chunk_id,
+             json.dumps(r.extra, default=str) if r.extra else None)
+            for r in records_list
+        ]
+        sources = [(r.id, source) for r in records_list for source in self._extra_sources(r.url, r.extra)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM chunk_sources WHERE id = ?", [(row[0],) for row in rows])
+            self._conn.executemany("INSERT INTO chunk_sources VALUES (?, ?)", sources)
+            self._conn.commit()
+
+    def delete_many(self, ids: Iterable[int]):
+        ids = [(i,) for i in ids]
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", ids)
+            self._conn.executemany("DELETE FROM chunk_sources WHERE id = ?", ids)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM chunk_sources")
+            self._conn.commit()
+
+    def get_many(self, ids: List[int]) -> Dict[int, ChunkRecord]:
+        """Fetch records by id; ids without a row are left out"""
+        found: Dict[int, ChunkRecord] = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT id, text, url, tokens, chunk_id, domain, content_type, extra FROM chunks "
+                    f"WHERE id IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for row in rows:
+                    extra = json.loads(row[7]) if row[7] else None
+                    found[row[0]] = ChunkRecord.from_fields(*row[:7], extra)
+        return found
+
+    def iter_keys(self) -> Iterator[Tuple[int, str, Optional[str]]]:
+        """Yield (id, domain, content_type) for every row, without reading the text"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, domain, content_type FROM chunks").fetchall()
+        return iter(rows)
+
+    def iter_texts(self, batch_size: int = 1000) -> Iterator[List[Tuple[int, str]]]:
+        """Yield (id, text) rows in batches, for rebuilding derived indexes"""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, text FROM chunks WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def ids_for_urls(self, urls: List[str]) -> List[int]:
+        """Return the ids of the rows whose url, or one of whose source URLs, is one of urls"""
+        ids: Set[int] = set()
+        with self._lock:
+            for start in range(0, len(urls), 500):
+                part = urls[start:start + 500]
+                placeholders = ','.join('?' * len(part))
+                ids.update(row[0] for row in self._conn.execute(
+                    f"SELECT id FROM chunks WHERE url IN ({placeholders}) "
+                    f"UNION SELECT id FROM chunk_sources WHERE url IN ({placeholders})", part + part
+                ))
+        return sorted(ids)
+
+    def get_keys(self, ids: List[int]) -> List[Tuple[int, str, Optional[str]]]:
+        """Return (id, domain, content_type) for the given ids"""
+        rows: List[Tuple[int, str, Optional[str]]] = []
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                rows.extend(self._conn.execute(
+                    f"SELECT id, domain, content_type FROM chunks WHERE id IN ({','.join('?' * len(part))})", part
+                ).fetchall())
+        return rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,100 @@
+"""
+Chunking off the event loop, spread across worker processes for large crawls.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from backend.chunker import TextChunker
+
+logger = logging.getLogger(__name__)
+
+# (text, source_url, content_type, metadata): the arguments of TextChunker.chunk_text
+ChunkRequest = Tuple[str, str, str, Dict[str, Any]]
+
+# Chunker of a worker process, created by its initializer
+_worker_chunker: Optional[TextChunker] = None
+
+def _init_worker(max_tokens: int, overlap_tokens: int, section_tokens: int):
+    global _worker_chunker
+    _worker_chunker = TextChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens, section_tokens=section_tokens)
+
+def _chunk_batch(requests: List[ChunkRequest]) -> List[List[Dict[str, Any]]]:
+    return [_worker_chunker.chunk_text(*request) for request in requests]
+
+class ChunkingPool:
+    def __init__(self, chunker: TextChunker, workers: Optional[int] = None, pages_per_task: int = 4,
+                 min_parallel_chars: int = 200_000):
+        """
+        Run TextChunker.chunk_text for many pages without blocking the event loop. Pages are
+        sent to a pool of worker processes in small batches, and results come back in input
+        order. Each worker builds its own chunker with the same settings. The pool starts on
+        first use and uses the 'spawn' start method, because the API process runs threads
+        that a fork could copy in a locked state.
+
+        Args:
+            chunker: Chunker whose settings the workers copy; it also handles small inputs in-process
+            workers: Number of worker processes (default: CPU count, at most 4); 0 chunks on a
+                thread of this process
+            pages_per_task: Pages sent to a worker at once, to amortize inter-process overhead
+            min_parallel_chars: Inputs with less text than this are chunked in-process
+        """
+        self.chunker = chunker
+        self.workers = min(os.cpu_count() or 1, 4) if workers is None else workers
+        self.pages_per_task = pages_per_task
+        self.min_parallel_chars = min_parallel_chars
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {'pages': 0, 'chunks': 0, 'parallel_batches': 0, 'chunk_seconds': 0.0}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.chunker.max_tokens, self.chunker.overlap_tokens, self.chunker.section_tokens)
+            )
+            logger.info(f"Started chunking pool with {self.workers} worker processes")
+        return self._executor
+
+    def _chunk_inline(self, requests: List[ChunkRequest]) -> List[List[Dict[str, Any]]]:
+        return [self.chunker.chunk_text(*request) for request in requests]
+
+    async def chunk_many(self, requests: List[ChunkRequest]) -> List[List[Dict[str, Any]]]:
+        """
+        Chunk several pages.
+
+        Args:
+            requests: chunk_text arguments per page
+
+        Returns:
+            One list of chunks per request, in request order
+        """
+        if not requests:
+            return []
+        started = time.perf_counter()
+        if self.workers <= 0 or len(requests) == 1 or sum(len(r[0]) for r in requests) < self.min_parallel_chars:
+            results = await asyncio.to_thread(self._chunk_inline, requests)
+        else:
+            loop = asyncio.get_running_loop()
+            pool = self._pool()
+            batches = [requests[i:i + self.pages_per_task] for i in range(0, len(requests), self.pages_per_task)]
+            batch_results = await asyncio.gather(*(loop.run_in_executor(pool, _chunk_batch, batch) for batch in batches))
+            results = [chunks for batch in batch_results for chunks in batch]
+            self.stats['parallel_batches'] += len(batches)
+        self.stats['pages'] += len(requests)
+        self.stats['chunks'] += sum(len(chunks) for chunks in results)
+        self.stats['chunk_seconds'] += time.perf_counter() - started
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'workers': self.workers, 'pool_started': self._executor is not None}
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,112 @@
+"""
+Chunk metadata records kept by the vector store and the search hits that expose them.
+"""
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+def chunk_domain(chunk: Dict[str, Any]) -> str:
+    """Domain a chunk belongs to: its source_domain, else the host of its URL"""
+    return chunk.get('source_domain') or chunk.get('domain') or urlparse(chunk.get('url', '')).netloc
+
+class ChunkRecord:
+    """
+    Compact chunk metadata. Common fields live in slots and anything else in a small
+    extra dict; the embedding is kept in the store's vector matrix, not on the record.
+    Supports read-only dict-style access (record['text'], record.get('title')).
+    """
+    __slots__ = ('id', 'text', 'url', 'tokens', 'chunk_id', 'source_domain', 'content_type', 'extra')
+    _FIELDS = ('text', 'url', 'tokens', 'chunk_id', 'source_domain', 'content_type')
+
+    def __init__(self, record_id: int, chunk: Dict[str, Any]):
+        self.id = record_id
+        self.text = chunk.get('text', '')
+        self.url = chunk.get('url', '')
+        self.tokens = chunk.get('tokens', 0)
+        self.chunk_id = chunk.get('chunk_id', 0)
+        self.source_domain = chunk_domain(chunk)
+        self.content_type = chunk.get('content_type')
+        extra = {key: value for key, value in chunk.items()
+                 if key not in self._FIELDS and key not in ('embedding', 'vector_id', 'domain')}
+        self.extra = extra or None
+
+    @classmethod
+    def from_fields(cls, record_id: int, text: str, url: str, tokens: int, chunk_id: int, source_domain: str,
+                    content_type: Optional[str], extra: Optional[Dict[str, Any]]) -> 'ChunkRecord':
+        """Rebuild a record from stored columns"""
+        record = cls.__new__(cls)
+        record.id = record_id
+        record.text = text
+        record.url = url
+        record.tokens = tokens
+        record.chunk_id = chunk_id
+        record.source_domain = source_domain
+        record.content_type = content_type
+        record.extra = extra or None
+        return record
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'vector_id':
+            return self.id
+        if key in self._FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {key: getattr(self, key) for key in self._FIELDS if getattr(self, key) is not None}
+        data['vector_id'] = self.id
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+class SearchHit:
+    """A search result: a view of a stored record plus its score and rank, without copying the record"""
+    __slots__ = ('record', 'similarity_score', 'rank', 'fusion_score')
+
+    def __init__(self, record: ChunkRecord, similarity_score: float, rank: int, fusion_score: Optional[float] = None):
+        self.record = record
+        self.similarity_score = similarity_score
+        self.rank = rank
+        # Reciprocal rank fusion score of hybrid searches, None for dense-only searches
+        self.fusion_score = fusion_score
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'similarity_score':
+            return self.similarity_score
+        if key == 'rank':
+            return self.rank
+        if key == 'fusion_score' and self.fusion_score is not None:
+            return self.fusion_score
+        return self.record[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in ('similarity_score', 'rank') or (key == 'fusion_score' and self.fusion_score is not None) \
+            or key in self.record
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {**self.record.to_dict(), 'similarity_score': self.similarity_score, 'rank': self.rank}
+        if self.fusion_score is not None:
+            data['fusion_score'] = self.fusion_score
+        return data
@@ -1,166 +1,347 @@
 import tiktoken
-from typing import List, Dict, Any
+import json
+import os
+import re
+from typing import List, Dict, Any, Iterator, Tuple
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Sentence boundaries: whitespace following sentence-ending punctuation
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_WORD = re.compile(r'\S+')
+# Markdown ATX headings, as produced by the HTML extractor
+_HEADING = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t#]*$', re.MULTILINE)
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Encoding name -> byte length of every token id, built once per process
+_TOKEN_BYTES: Dict[str, np.ndarray] = {}
+
+def _token_byte_lengths(encoding: tiktoken.Encoding) -> np.ndarray:
+    """Byte length of every token id of an encoding, for locating tokens in the text without decoding them"""
+    lengths = _TOKEN_BYTES.get(encoding.name)
+    if lengths is not None:
+        return lengths
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    ranks = getattr(encoding, '_mergeable_ranks', None)
+    if ranks:
+        # The ranks map each token's bytes to its id, so no token needs decoding
+        lengths[np.fromiter(ranks.values(), dtype=np.int64, count=len(ranks))] = \
+            np.fromiter(map(len, ranks), dtype=np.int64, count=len(ranks))
+        for token, token_id in encoding._special_tokens.items():
+            lengths[token_id] = len(token.encode('utf-8'))
+    else:
+        for token_id in range(encoding.n_vocab):
+            try:
+                lengths[token_id] = len(encoding.decode_single_token_bytes(token_id))
+            except KeyError:
+                pass
+    _TOKEN_BYTES[encoding.name] = lengths
+    return lengths
+
 class TextChunker:
-    def __init__(self, max_tokens: int = 5000, overlap_tokens: int = 50):
+    def __init__(self, max_tokens: int = 5000, overlap_tokens: int = 50, section_tokens: int = 1000):
         """
         Initialize the text chunker.
-        
+
         Args:
             max_tokens: Maximum tokens per chunk
             overlap_tokens: Number of overlapping tokens between chunks
+            section_tokens: Size up to which JSON values and heading sections are packed
+                together; larger ones are split further
         """
         self.max_tokens = max_tokens
         self.overlap_tokens = overlap_tokens
+        self.section_tokens = section_tokens
         self.encoding = tiktoken.get_encoding("cl100k_base")  # GPT-4 encoding
-    
+        self._token_bytes = _token_byte_lengths(self.encoding)
+
     def _count_tokens(self, text: str) -> int:
         """Count the number of tokens in a text string"""
-        return len(self.encoding.encode(text))
-    
+        return len(self.encoding.encode(text, disallowed_special=()))
+
     def _split_by_sentences(self, text: str) -> List[str]:
         """Split text by sentences, preserving sentence boundaries"""
-        import re
-        
-        # Split by sentence endings but keep the delimiter
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
-    
+        return [text[start:end] for start, end in self._sentence_spans(text)]
+
+    @staticmethod
+    def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+        """(start, end) character spans of the sentences of a stripped text"""
+        spans = []
+        start = 0
+        for match in _SENTENCE_BREAK.finditer(text):
+            spans.append((start, match.start()))
+            start = match.end()
+        if start < len(text):
+            spans.append((start, len(text)))
+        return spans
+
+    def _encode(self, text: str) -> Tuple[List[int], np.ndarray]:
+        """Encode text once, returning its tokens and the character offset each token starts at"""
+        tokens = self.encoding.encode(text, disallowed_special=())
+        byte_offsets = np.zeros(len(tokens), dtype=np.int64)
+        np.cumsum(self._token_bytes[tokens[:-1]], out=byte_offsets[1:])
+        if text.isascii():
+            return tokens, byte_offsets
+        # Map byte offsets to character offsets; a token starting inside a character maps to that character
+        data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+        char_index = np.cumsum((data & 0xC0) != 0x80) - 1
+        return tokens, char_index[byte_offsets]
+
+    @staticmethod
+    def _token_ranges(offsets: np.ndarray, spans: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """First and past-the-end token index covering each character span"""
+        bounds = np.array(spans, dtype=np.int64).reshape(-1, 2)
+        first = np.searchsorted(offsets, bounds[:, 0], side='right') - 1
+        last = np.searchsorted(offsets, bounds[:, 1] - 1, side='right')
+        return first, last
+
     def chunk_text(self, text: str, source_url: str, content_type: str = 'text', metadata: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         Split text into chunks with enhanced metadata support.
-        
+
+        JSON content whose parsed value is passed as metadata['json_data'] is split along its
+        object and array paths, serialized compactly, and each chunk records its 'json_path'.
+        Markdown content (metadata['content_format'] == 'markdown', as extracted from HTML
+        pages) is split along heading sections, and each chunk records its 'section' heading
+        path. Everything else is split on sentence boundaries.
+
         Args:
             text: The text to chunk
             source_url: The source URL for reference
             content_type: Type of content (text, json, image, etc.)
             metadata: Additional metadata about the content
-            
+
         Returns:
             List of chunk dictionaries with enhanced metadata
         """
-        if not text or not text.strip():
+        metadata = metadata or {}
+        if content_type == 'json' and metadata.get('json_data') is not None:
+            chunks = self._chunk_json(metadata['json_data'], source_url)
+        elif not text or not text.strip():
             return []
-        
-        # Clean the text
-        text = text.strip()
-        
+        elif metadata.get('content_format') == 'markdown':
+            chunks = self._chunk_sections(text.strip(), source_url)
+        else:
+            chunks = self._chunk_plain(text.strip(), source_url)
+        logger.info(f"Split text from {source_url} into {len(chunks)} chunks")
+        return chunks
+
+    def _chunk_plain(self, text: str, source_url: str) -> List[Dict[str, Any]]:
+        """
+        Split stripped text on sentence boundaries. The text is tokenized once; a chunk is the
+        span from its first sentence to its last, and its token count is the number of page
+        tokens the span covers plus the lead tokens of its first word, read off the token
+        offsets instead of re-encoding each piece, so chunking is linear in the text size.
+        """
+
         # If text is already small enough, return as single chunk
-        token_count = self._count_tokens(text)
-        if token_count <= self.max_tokens:
+        tokens, offsets = self._encode(text)
+        if len(tokens) <= self.max_tokens:
             return [{
                 'text': text,
-                'tokens': token_count,
+                'tokens': len(tokens),
                 'url': source_url,
                 'chunk_id': 0
             }]
-        
+
         # Split into sentences for better chunking
-        sentences = self._split_by_sentences(text)
-        
+        sentences = self._sentence_spans(text)
+        first, last = (bounds.tolist() for bounds in self._token_ranges(offsets, sentences))
+        lead = [self._lead_tokens(text, offsets, start, f) for (start, _), f in zip(sentences, first)]
+
+        def size(i: int, j: int) -> int:
+            """Tokens of a chunk made of sentences i..j"""
+            return last[j] - first[i] + lead[i]
+
         chunks = []
-        current_chunk = []
-        current_tokens = 0
-        chunk_id = 0
-        
-        for sentence in sentences:
-            sentence_tokens = self._count_tokens(sentence)
-            
+        # The current chunk is sentences current..k-1 (None when empty)
+        current = None
+
+        def flush(end: int):
+            chunks.append(self._make_chunk(text, sentences[current][0], sentences[end - 1][1],
+                                           size(current, end - 1), source_url, len(chunks)))
+
+        for k, (start, end) in enumerate(sentences):
             # If single sentence exceeds max tokens, split it further
-            if sentence_tokens > self.max_tokens:
+            if size(k, k) > self.max_tokens:
                 # Save current chunk if it has content
-                if current_chunk:
-                    chunk_text = ' '.join(current_chunk)
-                    chunks.append({
-                        'text': chunk_text,
-                        'tokens': self._count_tokens(chunk_text),
-                        'url': source_url,
-                        'chunk_id': chunk_id
-                    })
-                    chunk_id += 1
-                    current_chunk = []
-                    current_tokens = 0
-                
-                # Split long sentence by words
-                words = sentence.split()
-                word_chunk = []
-                word_tokens = 0
-                
-                for word in words:
-                    word_token_count = self._count_tokens(word + ' ')
-                    
-                    if word_tokens + word_token_count > self.max_tokens and word_chunk:
-                        # Save word chunk
-                        chunk_text = ' '.join(word_chunk)
-                        chunks.append({
-                            'text': chunk_text,
-                            'tokens': self._count_tokens(chunk_text),
-                            'url': source_url,
-                            'chunk_id': chunk_id
-                        })
-                        chunk_id += 1
-                        word_chunk = []
-                        word_tokens = 0
-                    
-                    word_chunk.append(word)
-                    word_tokens += word_token_count
-                
-                # Save remaining words
-                if word_chunk:
-                    chunk_text = ' '.join(word_chunk)
-                    chunks.append({
-                        'text': chunk_text,
-                        'tokens': self._count_tokens(chunk_text),
-                        'url': source_url,
-                        'chunk_id': chunk_id
-                    })
-                    chunk_id += 1
-                
+                if current is not None:
+                    flush(k)
+                    current = None
+                chunks.extend(self._split_long_sentence(text, tokens, offsets, start, end, source_url, len(chunks)))
                 continue
-            
+
             # Check if adding this sentence would exceed the limit
-            if current_tokens + sentence_tokens > self.max_tokens and current_chunk:
-                # Save current chunk
-                chunk_text = ' '.join(current_chunk)
-                chunks.append({
-                    'text': chunk_text,
-                    'tokens': self._count_tokens(chunk_text),
-                    'url': source_url,
-                    'chunk_id': chunk_id
-                })
-                chunk_id += 1
-                
+            if current is not None and size(current, k) > self.max_tokens:
+                flush(k)
+
                 # Start new chunk with overlap
-                if self.overlap_tokens > 0 and len(current_chunk) > 1:
-                    # Keep last few sentences for overlap
-                    overlap_text = ' '.join(current_chunk[-2:])  # Last 2 sentences
-                    overlap_tokens = self._count_tokens(overlap_text)
-                    
-                    if overlap_tokens <= self.overlap_tokens:
-                        current_chunk = current_chunk[-2:]
-                        current_tokens = overlap_tokens
-                    else:
-                        current_chunk = [current_chunk[-1]]  # Just last sentence
-                        current_tokens = self._count_tokens(current_chunk[0])
+                if self.overlap_tokens > 0 and k - current > 1:
+                    # Keep last 2 sentences if they fit in the overlap, else just the last one
+                    current = k - 2 if size(k - 2, k - 1) <= self.overlap_tokens else k - 1
+                    # Overlap sentences that would push this sentence's chunk over the limit are dropped
+                    while current < k and size(current, k) > self.max_tokens:
+                        current += 1
                 else:
-                    current_chunk = []
-                    current_tokens = 0
-            
-            current_chunk.append(sentence)
-            current_tokens += sentence_tokens
-        
+                    current = None
+
+            if current is None:
+                current = k
+
         # Save final chunk
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            chunks.append({
-                'text': chunk_text,
-                'tokens': self._count_tokens(chunk_text),
-                'url': source_url,
-                'chunk_id': chunk_id
-            })
-        
-        logger.info(f"Split text from {source_url} into {len(chunks)} chunks")
+        if current is not None:
+            flush(len(sentences))
+        return chunks
+
+    def _pack(self, units: List[Tuple[Any, str, int]], separator: str, label_key: str, label,
+              source_url: str) -> List[Dict[str, Any]]:
+        """
+        Greedily pack consecutive (key, text, tokens) units into chunks of up to section_tokens.
+        Units over max_tokens are split on sentences. label(keys) names each chunk's units.
+        """
+        chunks: List[Dict[str, Any]] = []
+        group: List[Tuple[Any, str, int]] = []
+
+        def flush():
+            if group:
+                chunks.append({
+                    'text': separator.join(text for _, text, _ in group),
+                    'tokens': sum(tokens for _, _, tokens in group),
+                    'url': source_url,
+                    'chunk_id': len(chunks),
+                    label_key: label([key for key, _, _ in group])
+                })
+                group.clear()
+
+        for key, text, tokens in units:
+            if tokens > self.max_tokens:
+                flush()
+                for piece in self._chunk_plain(text, source_url):
+                    chunks.append({**piece, 'chunk_id': len(chunks), label_key: label([key])})
+                continue
+            if group and sum(t for _, _, t in group) + tokens > self.section_tokens:
+                flush()
+            group.append((key, text, tokens))
+        flush()
+        return chunks
+
+    @staticmethod
+    def _markdown_sections(text: str) -> List[Tuple[Tuple[str, ...], str]]:
+        """(heading path, text) of each heading section, plus the text before the first heading"""
+        headings = list(_HEADING.finditer(text))
+        sections = []
+        preamble = text[:headings[0].start()].strip() if headings else text
+        if preamble:
+            sections.append(((), preamble))
+        stack: List[Tuple[int, str]] = []
+        for i, match in enumerate(headings):
+            level = len(match.group(1))
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, match.group(2).strip()))
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            sections.append((tuple(title for _, title in stack), text[match.start():end].strip()))
+        return sections
+
+    def _chunk_sections(self, text: str, source_url: str) -> List[Dict[str, Any]]:
+        """Split markdown along heading sections; small neighbouring sections share a chunk"""
+        units = [(path, body, self._count_tokens(body)) for path, body in self._markdown_sections(text)]
+
+        def label(paths: List[Tuple[str, ...]]) -> str:
+            # The preamble has an empty path, so fall back to the first heading in the chunk
+            return ' > '.join(os.path.commonprefix(paths) or next((path for path in paths if path), ()))
+
+        return self._pack(units, '\n\n', 'section', label, source_url)
+
+    def _json_units(self, value: Any, path: Tuple[str, ...]) -> Iterator[Tuple[Tuple[str, ...], str, int]]:
+        """
+        Yield (path, text, tokens) for the largest subtrees of value that fit in section_tokens,
+        in document order. Each text is the subtree's path and compact serialization.
+        """
+        serialized = json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+        text = f"{''.join(path)}: {serialized}"
+        is_container = isinstance(value, (dict, list)) and len(value) > 0
+        # Far too long to fit: split without paying for an encode at every level of nesting
+        if not (is_container and len(text) > 16 * self.section_tokens):
+            tokens = self._count_tokens(text)
+            if tokens <= self.section_tokens or not is_container:
+                yield path, text, tokens
+                return
+        if isinstance(value, dict):
+            for key, child in value.items():
+                key = str(key)
+                step = f".{key}" if _IDENTIFIER.match(key) else f"[{json.dumps(key, ensure_ascii=False)}]"
+                yield from self._json_units(child, path + (step,))
+        else:
+            for index, child in enumerate(value):
+                yield from self._json_units(child, path + (f"[{index}]",))
+
+    def _chunk_json(self, data: Any, source_url: str) -> List[Dict[str, Any]]:
+        """Split a JSON value along its object and array paths"""
+
+        def label(paths: List[Tuple[str, ...]]) -> str:
+            return ''.join(os.path.commonprefix(paths))
+
+        return self._pack(list(self._json_units(data, ('$',))), '\n', 'json_path', label, source_url)
+
+    def _lead_tokens(self, text: str, offsets: np.ndarray, start: int, first: int) -> int:
+        """
+        Tokens the first word at start gains when a chunk begins with it: in the page it may
+        share a token with the whitespace before it, so it is encoded again on its own.
+
+        Args:
+            text: The page text
+            offsets: Start offset of each page token
+            start: Offset of the word
+            first: Index of the page token holding the word's first character
+        """
+        word_end = _WORD.match(text, start).end()
+        page_tokens = int(np.searchsorted(offsets, word_end, side='left')) - first
+        return self._count_tokens(text[start:word_end]) - page_tokens
+
+    @staticmethod
+    def _make_chunk(text: str, start: int, end: int, token_count: int, source_url: str,
+                    chunk_id: int) -> Dict[str, Any]:
+        """
+        Chunk of text[start:end]. token_count is the number of page tokens the span covers,
+        plus the lead tokens of its first word, which is what encoding the chunk gives.
+        """
+        return {
+            'text': text[start:end],
+            'tokens': token_count,
+            'url': source_url,
+            'chunk_id': chunk_id
+        }
+
+    def _split_long_sentence(self, text: str, tokens: List[int], offsets: np.ndarray, start: int, end: int,
+                             source_url: str, chunk_id: int) -> List[Dict[str, Any]]:
+        """
+        Split a sentence longer than max_tokens into runs of whole words that fit, packing
+        greedily on the page tokens each run's span covers. A single word longer than
+        max_tokens (e.g. minified JSON) is cut at token boundaries.
+        """
+        words = [match.span() for match in _WORD.finditer(text, start, end)]
+        first, last = self._token_ranges(offsets, words)
+        chunks = []
+        i = 0
+        while i < len(words):
+            lead = self._lead_tokens(text, offsets, words[i][0], int(first[i]))
+            if last[i] - first[i] + lead > self.max_tokens:
+                for piece_start in range(first[i], last[i], self.max_tokens):
+                    piece = tokens[piece_start:min(piece_start + self.max_tokens, last[i])]
+                    chunks.append({
+                        'text': self.encoding.decode(piece),
+                        'tokens': len(piece),
+                        'url': source_url,
+                        'chunk_id': chunk_id + len(chunks)
+                    })
+                i += 1
+                continue
+            # Words i..j-1 are the longest run whose span fits; an over-long word always ends a run
+            j = int(np.searchsorted(last, first[i] + self.max_tokens - lead, side='right'))
+            chunks.append(self._make_chunk(text, words[i][0], words[j - 1][1], int(last[j - 1] - first[i]) + lead,
+                                           source_url, chunk_id + len(chunks)))
+            i = j
         return chunks
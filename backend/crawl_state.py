@@ -0,0 +1,76 @@
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class CrawlStateStore:
+    def __init__(self, path: str = "crawl_state.sqlite3"):
+        """
+        What the last crawl of each site saw per page: the HTTP validators (ETag and
+        Last-Modified) for conditional requests, a hash of the extracted content, and the
+        title, content type and links needed to continue a crawl past a page that is not
+        fetched again.
+
+        Args:
+            path: SQLite database file ("" or ":memory:" keeps the state in memory)
+        """
+        self.path = path or ":memory:"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "domain TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT, content_hash TEXT, "
+            "title TEXT, content_type TEXT, links TEXT, PRIMARY KEY (domain, url))"
+        )
+        self._conn.commit()
+
+    def get_site(self, domain: str) -> Dict[str, Dict[str, Any]]:
+        """Return url -> page state for every page recorded for a domain"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, etag, last_modified, content_hash, title, content_type, links FROM pages WHERE domain = ?",
+                (domain,)
+            ).fetchall()
+        return {
+            url: {
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_hash': content_hash,
+                'title': title or '',
+                'content_type': content_type or 'text',
+                'links': json.loads(links) if links else {'internal': [], 'external': [], 'api': [], 'images': []}
+            }
+            for url, etag, last_modified, content_hash, title, content_type, links in rows
+        }
+
+    def put_pages(self, domain: str, pages: List[Dict[str, Any]]):
+        """Record the state of scraped pages, replacing what was stored for their URLs"""
+        rows = [
+            (domain, page['url'], page.get('etag'), page.get('last_modified'), page.get('content_hash'),
+             page.get('title', ''), page.get('content_type', 'text'), json.dumps(page.get('links') or {}))
+            for page in pages
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete_pages(self, domain: str, urls: List[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM pages WHERE domain = ? AND url = ?", [(domain, url) for url in urls])
+            self._conn.commit()
+
+    def delete_site(self, domain: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE domain = ?", (domain,))
+            self._conn.commit()
+        logger.info(f"Cleared crawl state of domain '{domain}'")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    def __init__(self, path: str = "embedding_cache.sqlite3", max_entries: int = 200_000, dtype: str = "float32"):
+        """
+        Persistent embedding cache keyed by model name and a hash of the normalized text.
+        Vectors are stored as packed float32 or float16 blobs, and the least recently used
+        entries are evicted once the cache grows beyond max_entries.
+
+        Args:
+            path: SQLite database file ("" or ":memory:" keeps the cache in memory)
+            max_entries: Maximum number of cached vectors
+            dtype: Storage precision, "float32" or "float16"
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be 'float32' or 'float16'")
+        self.path = path or ":memory:"
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            # WAL lets the API and the voice agent share the cache file
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def _key(self, model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\x00{self._normalize(text)}".encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up cached vectors; misses are returned as None in the same positions"""
+        keys = [self._key(model, text) for text in texts]
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, dtype, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=dtype).astype(np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+                self._conn.commit()
+        results = [found.get(key) for key in keys]
+        hits = sum(1 for result in results if result is not None)
+        self.stats['hits'] += hits
+        self.stats['misses'] += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store vectors for texts, evicting the least recently used entries if needed"""
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (self._key(model, text), self.dtype.name, np.asarray(embedding, dtype=self.dtype).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                self._conn.commit()
+                self._entries -= overflow
+                self.stats['evictions'] += overflow
+                logger.info(f"Evicted {overflow} least recently used embeddings from cache")
+
+    def clear(self):
+        """Remove every cached vector"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'entries': self._entries,
+            'max_entries': self.max_entries,
+            'dtype': self.dtype.name
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,69 +1,218 @@
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any
-from openai import OpenAI
+import random
+import time
+from typing import List, Dict, Any, Optional
+import tiktoken
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from backend.embedding_cache import EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
 class EmbeddingService:
-    def __init__(self):
-        """Initialize the embedding service with OpenAI client"""
+    def __init__(self, max_batch_tokens: int = 100_000, max_batch_size: int = 512, max_in_flight: int = 4,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 cache: Optional[EmbeddingCache] = None):
+        """
+        Initialize the embedding service with OpenAI client
+
+        Args:
+            max_batch_tokens: Token budget of a single embeddings request (API limit is 300k)
+            max_batch_size: Maximum number of texts in a single embeddings request (API limit is 2048)
+            max_in_flight: Maximum number of concurrent embeddings requests
+            max_retries: Retries for rate limits, timeouts, connection and server errors
+            backoff_base: Base delay in seconds for exponential backoff between retries
+            backoff_max: Upper bound in seconds for a single backoff delay
+            cache: Optional persistent cache consulted before calling the API
+        """
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
-        
-        self.client = OpenAI(api_key=self.api_key)
+
+        # Retries are handled here so they can respect the in-flight limit and be counted
+        self.client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
         self.model = "text-embedding-3-small"  # OpenAI's embedding model
-        
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.encoding = tiktoken.get_encoding("cl100k_base")  # Tokenizer used by the embedding model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._request_slots = asyncio.Semaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.cache = cache
+        self.metrics = {
+            'texts_embedded': 0,
+            'tokens_embedded': 0,
+            'batches_sent': 0,
+            'batches_in_flight': 0,
+            'peak_batches_in_flight': 0,
+            'retries': 0,
+            'last_call_tokens_per_sec': 0.0,
+            'last_call_seconds': 0.0
+        }
+
+    def _count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _build_batches(self, token_counts: List[int]) -> List[List[int]]:
+        """Group text positions into batches that fit the token budget and size limit"""
+        batches = []
+        current: List[int] = []
+        current_tokens = 0
+        for position, tokens in enumerate(token_counts):
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(position)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * (0.5 + random.random() / 2)
+
+    async def _embed_request(self, batch: List[str], batch_tokens: int) -> List[List[float]]:
+        """Send one embeddings request, retrying with backoff on rate limits and transient errors"""
+        attempt = 0
+        while True:
+            async with self._request_slots:
+                self.metrics['batches_in_flight'] += 1
+                self.metrics['peak_batches_in_flight'] = max(
+                    self.metrics['peak_batches_in_flight'], self.metrics['batches_in_flight']
+                )
+                try:
+                    response = await self.client.embeddings.create(
+                        model=self.model,
+                        input=batch
+                    )
+                    # Results carry their input index; sort defensively to preserve order
+                    data = sorted(response.data, key=lambda item: item.index)
+                    if len(data) != len(batch):
+                        raise ValueError(f"Expected {len(batch)} embeddings, received {len(data)}")
+                    self.metrics['batches_sent'] += 1
+                    self.metrics['texts_embedded'] += len(batch)
+                    self.metrics['tokens_embedded'] += batch_tokens
+                    return [item.embedding for item in data]
+                except RETRYABLE_ERRORS as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    error = e
+                finally:
+                    self.metrics['batches_in_flight'] -= 1
+            # Back off outside the semaphore so other batches can use the slot
+            delay = self._backoff_delay(attempt, error)
+            attempt += 1
+            self.metrics['retries'] += 1
+            logger.warning(f"Embedding batch failed ({type(error).__name__}), retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})")
+            await asyncio.sleep(delay)
+
+    async def embed_batch(self, texts: List[str], token_counts: Optional[List[int]] = None) -> List[Optional[List[float]]]:
         """
-        Generate embeddings for a list of texts using OpenAI's embedding model.
-        Processes in batches to handle large amounts of text.
-        
+        Generate embeddings for a list of texts using OpenAI's embedding model, keeping
+        one result per input position. Blank texts are not sent and come back as None,
+        so callers can drop exactly those inputs without misaligning the rest.
+        Cached vectors are reused; the remaining texts are grouped into batches by token
+        budget and the batches are sent concurrently, up to max_in_flight at a time.
+
         Args:
             texts: List of text strings to embed
-            
+            token_counts: Optional precomputed token counts per text (e.g. the chunker's counts)
+
         Returns:
-            List of embedding vectors (each is a list of floats)
+            List with an embedding vector, or None for a skipped blank text, per input
         """
-        if not texts:
-            return []
-        
+        if token_counts is not None and len(token_counts) != len(texts):
+            raise ValueError("Number of token counts must match number of texts")
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        positions = [i for i, text in enumerate(texts) if text.strip()]
+        if len(positions) < len(texts):
+            logger.warning(f"Skipping {len(texts) - len(positions)} blank texts")
+        if not positions:
+            return results
+
         try:
-            logger.info(f"Generating embeddings for {len(texts)} texts")
-            
-            # Filter out empty texts
-            non_empty_texts = [text.strip() for text in texts if text.strip()]
-            
-            if not non_empty_texts:
-                logger.warning("No non-empty texts to embed")
-                return []
-            
-            # Process in batches to avoid token limits (max ~300k tokens per request)
-            batch_size = 100  # Conservative batch size to stay under limits
-            all_embeddings = []
-            
-            for i in range(0, len(non_empty_texts), batch_size):
-                batch = non_empty_texts[i:i + batch_size]
-                logger.info(f"Processing batch {i//batch_size + 1}/{(len(non_empty_texts) + batch_size - 1)//batch_size}")
-                
-                # OpenAI embedding API call for batch
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch
+            logger.info(f"Generating embeddings for {len(positions)} texts")
+            stripped = {i: texts[i].strip() for i in positions}
+
+            if self.cache is not None:
+                cached = await asyncio.to_thread(self.cache.get_many, self.model, [stripped[i] for i in positions])
+                for i, embedding in zip(positions, cached):
+                    results[i] = embedding
+            missing = [i for i in positions if results[i] is None]
+            if len(missing) < len(positions):
+                logger.info(f"Embedding cache hits: {len(positions) - len(missing)}/{len(positions)}")
+            if not missing:
+                return results
+
+            counts = [token_counts[i] if token_counts is not None else self._count_tokens(stripped[i]) for i in missing]
+            batches = self._build_batches(counts)
+            logger.info(f"Embedding {sum(counts)} tokens in {len(batches)} batches ({self.max_in_flight} in flight)")
+
+            started = time.perf_counter()
+            # Each batch lists offsets into `missing`, so results land in their input slots
+            # whatever order the batches (and their retries) complete in
+            batch_results = await asyncio.gather(*[
+                self._embed_request([stripped[missing[k]] for k in batch], sum(counts[k] for k in batch))
+                for batch in batches
+            ])
+            elapsed = time.perf_counter() - started
+
+            for batch, batch_embeddings in zip(batches, batch_results):
+                for k, embedding in zip(batch, batch_embeddings):
+                    results[missing[k]] = embedding
+            if self.cache is not None:
+                await asyncio.to_thread(
+                    self.cache.put_many, self.model, [stripped[i] for i in missing], [results[i] for i in missing]
                 )
-                
-                # Extract embeddings from response
-                batch_embeddings = [data.embedding for data in response.data]
-                all_embeddings.extend(batch_embeddings)
-            
-            logger.info(f"Successfully generated {len(all_embeddings)} embeddings in batches")
-            return all_embeddings
-            
+
+            self.metrics['last_call_seconds'] = elapsed
+            self.metrics['last_call_tokens_per_sec'] = sum(counts) / elapsed if elapsed > 0 else 0.0
+            logger.info(f"Successfully generated {len(missing)} embeddings in {elapsed:.2f}s "
+                        f"({self.metrics['last_call_tokens_per_sec']:.0f} tokens/sec)")
+            return results
+
         except Exception as e:
             logger.error(f"Failed to generate embeddings: {str(e)}")
             raise Exception(f"Embedding generation failed: {str(e)}")
-    
+
+    async def generate_embeddings(self, texts: List[str], token_counts: Optional[List[int]] = None) -> List[List[float]]:
+        """
+        Generate embeddings for the non-blank texts in a list.
+        Blank texts are dropped, so the result can be shorter than the input; use
+        embed_batch when results must line up with other per-text data.
+
+        Args:
+            texts: List of text strings to embed
+            token_counts: Optional precomputed token counts per text
+
+        Returns:
+            List of embedding vectors (each is a list of floats)
+        """
+        embeddings = await self.embed_batch(texts, token_counts)
+        return [embedding for embedding in embeddings if embedding is not None]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return throughput, concurrency and cache metrics"""
+        return {
+            **self.metrics,
+            'max_in_flight': self.max_in_flight,
+            'cache': self.cache.get_stats() if self.cache is not None else None
+        }
+
     def get_embedding_dimension(self) -> int:
         """Get the dimension of the embedding vectors"""
         # text-embedding-3-small returns 1536-dimensional vectors
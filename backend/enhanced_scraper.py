@@ -1,20 +1,101 @@
 import asyncio
+import hashlib
 import logging
-import requests
 import json
 import base64
+import re
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-from typing import List, Dict, Any, Set, Optional
-from playwright.async_api import async_playwright
+from typing import List, Dict, Any, Set, Optional, Callable, Awaitable
 import trafilatura
+from backend.browser_pool import BrowserPool
+from backend.http_client import AsyncHttpClient, HttpError, HttpResponse
 
 logger = logging.getLogger(__name__)
 
+# Empty mount points left by client-side frameworks (React, Vue, Next.js, Nuxt, Angular)
+_SPA_ROOT_PATTERN = re.compile(
+    r'<div[^>]*\bid=["\'](root|app|__next|__nuxt|q-app)["\'][^>]*>\s*</div>'
+    r'|<app-root[^>]*>\s*</app-root>',
+    re.IGNORECASE
+)
+
+# Heavy page fields dropped from stored pages when content is not retained
+_PAGE_PAYLOAD_KEYS = {'content', 'raw_data', 'image_data'}
+
+# Statuses that mean a page no longer exists, as opposed to a failed fetch
+_GONE_STATUSES = (404, 410)
+
+class _HostThrottle:
+    """Per-host concurrency cap and politeness delay shared by crawl workers"""
+
+    def __init__(self, max_concurrency: int, delay: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_request_at = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            # Reserve the next request slot under the lock, then sleep outside it
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                now = loop.time()
+                wait = max(0.0, self._next_request_at - now)
+                self._next_request_at = max(now, self._next_request_at) + self.delay
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+
 class EnhancedWebScraper:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 8, per_host_concurrency: int = 4, politeness_delay: float = 0.5,
+                 browser_pool_size: int = 4, max_page_uses: int = 50,
+                 min_text_ratio: float = 0.005, min_static_chars: int = 500,
+                 http_client: Optional[AsyncHttpClient] = None):
+        """
+        Initialize the scraper.
+
+        Args:
+            max_concurrency: Maximum number of pages fetched at once across all hosts
+            per_host_concurrency: Maximum number of in-flight requests to a single host
+            politeness_delay: Minimum delay in seconds between request starts to the same host
+            browser_pool_size: Number of warm Playwright pages used for dynamic rendering
+            max_page_uses: Number of renders after which a pooled page is recycled
+            min_text_ratio: Extracted-text to HTML size ratio below which a page counts as client-rendered
+            min_static_chars: Extracted text length above which a page is never considered client-rendered
+            http_client: Shared async HTTP client for non-browser fetches (created with defaults if omitted)
+        """
         self.scraped_sites = {}
         self.site_structures = {}
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.politeness_delay = politeness_delay
+        self._host_throttles: Dict[str, _HostThrottle] = {}
+        # Caps in-flight page fetches across all crawls sharing this scraper
+        self._page_slots = asyncio.Semaphore(max_concurrency)
+        self.browser_pool = BrowserPool(size=browser_pool_size, max_uses_per_page=max_page_uses)
+        self.http = http_client or AsyncHttpClient(per_host_connections=per_host_concurrency)
+        self.min_text_ratio = min_text_ratio
+        self.min_static_chars = min_static_chars
+        # Remembered fetch path per host: 'static' or 'rendered'
+        self._host_fetch_modes: Dict[str, str] = {}
+
+    def _get_host_throttle(self, url: str) -> _HostThrottle:
+        """Return the throttle for the URL's host, creating it on first use"""
+        host = urlparse(url).netloc
+        throttle = self._host_throttles.get(host)
+        if throttle is None:
+            throttle = _HostThrottle(self.per_host_concurrency, self.politeness_delay)
+            self._host_throttles[host] = throttle
+        return throttle
         
     def _is_valid_url(self, url: str) -> bool:
         """Check if URL is valid and not a file download"""
@@ -73,11 +154,12 @@ class EnhancedWebScraper:
             logger.error(f"Error extracting links: {str(e)}")
             return {'internal': [], 'external': [], 'api': [], 'images': []}
     
-    async def _scrape_api_endpoint(self, url: str) -> Dict[str, Any]:
+    async def _scrape_api_endpoint(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """Scrape API endpoint and handle JSON data"""
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+            response = await self.http.get(url, headers=headers)
+            if response.status == 304:
+                return self._not_modified(url)
             
             content_type = response.headers.get('content-type', '').lower()
             
@@ -92,7 +174,8 @@ class EnhancedWebScraper:
                     'links': {'internal': [], 'external': [], 'api': [], 'images': []},
                     'content_type': 'json',
                     'raw_data': data,
-                    'success': True
+                    'success': True,
+                    **self._validators(response)
                 }
             else:
                 content = f"API Endpoint: {url}\nContent Type: {content_type}\nContent: {response.text}"
@@ -102,11 +185,14 @@ class EnhancedWebScraper:
                     'content': content,
                     'links': {'internal': [], 'external': [], 'api': [], 'images': []},
                     'content_type': 'text',
-                    'success': True
+                    'success': True,
+                    **self._validators(response)
                 }
                 
         except Exception as e:
             logger.error(f"Error scraping API endpoint {url}: {str(e)}")
+            if isinstance(e, HttpError) and e.status in _GONE_STATUSES:
+                return self._gone(url, e.status)
             return {
                 'url': url,
                 'title': '',
@@ -117,14 +203,15 @@ class EnhancedWebScraper:
                 'error': str(e)
             }
     
-    async def _scrape_image(self, url: str) -> Dict[str, Any]:
+    async def _scrape_image(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """Scrape image and extract metadata"""
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+            response = await self.http.get(url, headers=headers)
+            if response.status == 304:
+                return self._not_modified(url)
             
             content_type = response.headers.get('content-type', '')
-            content_length = response.headers.get('content-length', 'Unknown')
+            content_length = response.headers.get('content-length', len(response.content))
             image_data = base64.b64encode(response.content).decode('utf-8')
             
             content = f"Image URL: {url}\nContent Type: {content_type}\nSize: {content_length} bytes\nFilename: {urlparse(url).path.split('/')[-1]}"
@@ -136,11 +223,14 @@ class EnhancedWebScraper:
                 'links': {'internal': [], 'external': [], 'api': [], 'images': []},
                 'content_type': 'image',
                 'image_data': image_data,
-                'success': True
+                'success': True,
+                **self._validators(response)
             }
             
         except Exception as e:
             logger.error(f"Error scraping image {url}: {str(e)}")
+            if isinstance(e, HttpError) and e.status in _GONE_STATUSES:
+                return self._gone(url, e.status)
             return {
                 'url': url,
                 'title': '',
@@ -152,46 +242,60 @@ class EnhancedWebScraper:
             }
     
     async def _scrape_with_playwright(self, url: str) -> Dict[str, Any]:
-        """Scrape dynamic content using Playwright"""
+        """Scrape dynamic content using a page leased from the shared browser pool"""
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                page = await browser.new_page()
-                
+            async with self.browser_pool.lease() as page:
                 await page.goto(url, wait_until="networkidle")
                 content = await page.content()
                 title = await page.title()
-                
-                await browser.close()
-                
-                main_content = trafilatura.extract(content) or ""
-                links = self._extract_links(content, url)
-                
-                return {
-                    'url': url,
-                    'title': title,
-                    'content': main_content,
-                    'links': links,
-                    'content_type': 'text',
-                    'success': True
-                }
+            
+            main_content, links = await asyncio.to_thread(self._parse_html, content, url)
+            
+            return {
+                'url': url,
+                'title': title,
+                'content': main_content,
+                'links': links,
+                'content_type': 'text',
+                'content_format': 'markdown',
+                'success': True
+            }
         except Exception as e:
             # Suppress Playwright error output in terminal
             logger.debug(f"Playwright error for {url}: {str(e)}")
             return None
     
-    def _scrape_with_requests(self, url: str) -> Dict[str, Any]:
-        """Scrape static content using requests"""
+    def _parse_html(self, html_content: str, url: str):
+        """
+        Extract the main text and links from HTML (CPU-bound, run off the event loop).
+        The text is markdown so that its headings survive for section-aware chunking.
+        """
+        main_content = trafilatura.extract(html_content, output_format='markdown') or ""
+        links = self._extract_links(html_content, url)
+        return main_content, links
+
+    def _parse_static_html(self, html_content: str, url: str):
+        """Parse statically fetched HTML and evaluate the client-rendering heuristics"""
+        soup = BeautifulSoup(html_content, 'html.parser')
+        title = soup.title.string if soup.title else ""
+        main_content, links = self._parse_html(html_content, url)
+        return title, main_content, links, self._needs_render(html_content, main_content)
+
+    async def _scrape_static(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Scrape static content over the shared async HTTP client.
+        The returned page carries a 'render_reason' entry that is set when the static
+        HTML looks client-rendered and should be rendered in a browser instead.
+        """
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+            response = await self.http.get(url, headers=headers)
+            if response.status == 304:
+                return self._not_modified(url)
             
             html_content = response.text
-            soup = BeautifulSoup(html_content, 'html.parser')
-            title = soup.title.string if soup.title else ""
-            
-            main_content = trafilatura.extract(html_content) or ""
-            links = self._extract_links(html_content, url)
+            title, main_content, links, render_reason = await asyncio.to_thread(
+                self._parse_static_html, html_content, url
+            )
             
             return {
                 'url': url,
@@ -199,38 +303,189 @@ class EnhancedWebScraper:
                 'content': main_content,
                 'links': links,
                 'content_type': 'text',
-                'success': True
+                'content_format': 'markdown',
+                'success': True,
+                'render_reason': render_reason,
+                **self._validators(response)
             }
         except Exception as e:
-            logger.error(f"Requests error for {url}: {str(e)}")
+            logger.error(f"Static fetch error for {url}: {str(e)}")
+            if isinstance(e, HttpError) and e.status in _GONE_STATUSES:
+                return self._gone(url, e.status)
+            return None
+
+    def _needs_render(self, html_content: str, main_content: str) -> Optional[str]:
+        """
+        Decide whether statically fetched HTML looks client-rendered.
+
+        Returns:
+            A short reason when the page should be rendered in a browser, otherwise None
+        """
+        if not main_content.strip():
+            return 'empty extract'
+        if _SPA_ROOT_PATTERN.search(html_content):
+            return 'empty SPA root'
+        text_ratio = len(main_content) / max(len(html_content), 1)
+        if text_ratio < self.min_text_ratio and len(main_content) < self.min_static_chars:
+            return f'text-to-markup ratio {text_ratio:.4f}'
+        return None
+
+    async def _scrape_html_page(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch an HTML page statically first and escalate to a headless render only when
+        the static HTML looks client-rendered. The decision is remembered per host so later
+        pages on the same host go straight to the chosen path. With conditional request
+        headers, a page the server reports as not modified is neither fetched nor rendered.
+        """
+        host = urlparse(url).netloc
+        mode = self._host_fetch_modes.get(host)
+        result = None
+        probe: Optional[HttpResponse] = None
+
+        if mode == 'rendered' and headers:
+            try:
+                probe = await self.http.get(url, headers=headers, raise_for_status=False)
+            except Exception as e:
+                logger.debug(f"Conditional request for {url} failed: {str(e)}")
+            if probe is not None and probe.status == 304:
+                return self._not_modified(url)
+            if probe is not None and probe.status in _GONE_STATUSES:
+                return self._gone(url, probe.status)
+
+        if mode != 'rendered':
+            result = await self._scrape_static(url, headers)
+            if result and (result.get('not_modified') or result.get('gone')):
+                return result
+            reason = result.pop('render_reason', None) if result else None
+            if result:
+                result['fetch_method'] = 'static'
+            if result and not reason:
+                if mode is None:
+                    logger.info(f"Using static fetching for host {host}")
+                    self._host_fetch_modes[host] = 'static'
+                return result
+            # Hosts known to be server-rendered only escalate pages that extracted nothing
+            if mode == 'static' and reason != 'empty extract':
+                return result
+            if reason:
+                logger.info(f"Escalating {url} to headless rendering ({reason})")
+
+        try:
+            rendered = await self._scrape_with_playwright(url)
+        except Exception as e:
+            logger.warning(f"Playwright failed for {url}: {str(e)}")
+            rendered = None
+        if rendered and rendered.get('content'):
+            if mode is None:
+                logger.info(f"Using headless rendering for host {host}")
+                self._host_fetch_modes[host] = 'rendered'
+            rendered['fetch_method'] = 'rendered'
+            if probe is not None:
+                rendered.update(self._validators(probe))
+            return rendered
+
+        if mode == 'rendered':
+            result = await self._scrape_static(url)
+            if result:
+                result.pop('render_reason', None)
+                result['fetch_method'] = 'static'
+        return result
+
+    @staticmethod
+    def _not_modified(url: str) -> Dict[str, Any]:
+        """Result of a conditional request the server answered with 304 Not Modified"""
+        return {'url': url, 'success': True, 'not_modified': True}
+
+    @staticmethod
+    def _gone(url: str, status: int) -> Dict[str, Any]:
+        """Failed page the server answered with 404 or 410, which re-crawls treat as removed"""
+        return {
+            'url': url,
+            'title': '',
+            'content': '',
+            'links': {'internal': [], 'external': [], 'api': [], 'images': []},
+            'content_type': 'text',
+            'success': False,
+            'gone': True,
+            'status': status,
+            'error': f"HTTP {status}"
+        }
+
+    @staticmethod
+    def _validators(response: HttpResponse) -> Dict[str, Optional[str]]:
+        """HTTP validators of a response, sent back on the next crawl as conditional request headers"""
+        return {'etag': response.headers.get('etag'), 'last_modified': response.headers.get('last-modified')}
+
+    @staticmethod
+    def _conditional_headers(known: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+        if not known:
             return None
+        headers = {}
+        if known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+        return headers or None
 
-    async def _scrape_single_page(self, url: str) -> Dict[str, Any]:
+    @staticmethod
+    def _content_hash(page: Dict[str, Any]) -> str:
+        """Hash of everything of a page that ends up in its chunks: the content and its image and API links"""
+        links = page.get('links') or {}
+        digest = hashlib.sha256(page.get('content', '').encode('utf-8'))
+        digest.update(json.dumps([links.get('images', []), links.get('api', [])]).encode('utf-8'))
+        return digest.hexdigest()
+
+    async def _scrape_single_page(self, url: str, known: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Scrape a single page and determine the method to use based on the URL type.
-        Chooses between Playwright for dynamic content, requests for static content,
-        or specific handlers for API endpoints and images.
+        Scrape a single page and mark it 'unchanged' when it matches what the previous crawl saw.
+
+        Args:
+            url: Page to scrape
+            known: State of the page from the previous crawl (see CrawlStateStore). Its
+                validators are sent as conditional request headers; a page the server reports
+                as not modified is rebuilt from this state without its content.
+        """
+        page = await self._fetch_page(url, self._conditional_headers(known))
+        if not page.get('success', False):
+            return page
+        if page.get('not_modified'):
+            return {
+                'url': url,
+                'title': known['title'],
+                'content': '',
+                'links': known['links'],
+                'content_type': known['content_type'],
+                'etag': known.get('etag'),
+                'last_modified': known.get('last_modified'),
+                'content_hash': known.get('content_hash'),
+                'fetch_method': 'not_modified',
+                'success': True,
+                'not_modified': True,
+                'unchanged': True
+            }
+        page['content_hash'] = self._content_hash(page)
+        page['unchanged'] = bool(known) and known.get('content_hash') == page['content_hash']
+        return page
+
+    async def _fetch_page(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Fetch a single page and determine the method to use based on the URL type.
+        HTML pages are fetched statically and only rendered with Playwright when they look
+        client-rendered; API endpoints and images use their specific handlers.
         """
         logger.info(f"Scraping: {url}")
         
         if self._is_api_endpoint(url):
-            return await self._scrape_api_endpoint(url)
+            return await self._scrape_api_endpoint(url, headers)
         elif self._is_image_url(url):
-            return await self._scrape_image(url)
-        
-        try:
-            result = await self._scrape_with_playwright(url)
-            if result and result.get('content'):
-                return result
-        except Exception as e:
-            logger.warning(f"Playwright failed for {url}: {str(e)}")
+            return await self._scrape_image(url, headers)
         
         try:
-            result = self._scrape_with_requests(url)
-            if result and result.get('content'):
+            result = await self._scrape_html_page(url, headers)
+            if result and (result.get('content') or result.get('not_modified') or result.get('gone')):
                 return result
         except Exception as e:
-            logger.warning(f"Requests failed for {url}: {str(e)}")
+            logger.warning(f"Scraping failed for {url}: {str(e)}")
         
         return {
             'url': url,
@@ -242,17 +497,116 @@ class EnhancedWebScraper:
             'error': 'Failed to scrape with both methods'
         }
 
-    async def scrape_website(self, start_url: str, max_depth: int = 2) -> Dict[str, Any]:
+    def _record_page(self, page_data: Dict[str, Any], depth: int, max_depth: int, site_structure: Dict[str, Any]) -> List[str]:
+        """
+        Add a scraped page to the site structure statistics.
+
+        Returns:
+            The internal links that should be crawled at the next depth
+        """
+        current_url = page_data['url']
+        content_type = page_data.get('content_type', 'text')
+        site_structure['content_types'].add(content_type)
+        site_structure['total_pages'] += 1
+
+        if depth not in site_structure['depth_distribution']:
+            site_structure['depth_distribution'][depth] = 0
+        site_structure['depth_distribution'][depth] += 1
+
+        site_structure['sitemap'].append({
+            'url': current_url,
+            'title': page_data.get('title', ''),
+            'depth': depth,
+            'content_type': content_type,
+            'fetch_method': page_data.get('fetch_method', 'static'),
+            'success': page_data.get('success', False)
+        })
+
+        if not page_data.get('success', False) or depth >= max_depth:
+            return []
+
+        links = page_data.get('links', {})
+        site_structure['total_internal_links'] += len(links.get('internal', []))
+        site_structure['total_external_links'] += len(links.get('external', []))
+        site_structure['total_api_endpoints'] += len(links.get('api', []))
+        site_structure['total_images'] += len(links.get('images', []))
+
+        for ext_link in links.get('external', []):
+            domain = urlparse(ext_link).netloc
+            site_structure['external_domains'].add(domain)
+
+        site_structure['api_endpoints'].extend(links.get('api', []))
+        site_structure['image_urls'].extend(links.get('images', []))
+        return links.get('internal', [])
+
+    async def _crawl_level(self, frontier: List[str], depth: int, concurrency: int,
+                           on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                           retain_content: bool = True,
+                           known_pages: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Scrape every URL of one BFS level with a bounded pool of workers.
+        Results are returned in frontier order regardless of completion order;
+        on_page is awaited for each page as soon as it has been scraped.
+        Without retain_content the returned pages keep only their metadata and links.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(frontier)
+        queue: asyncio.Queue = asyncio.Queue()
+        for position, url in enumerate(frontier):
+            queue.put_nowait((position, url))
+
+        async def worker():
+            while True:
+                try:
+                    position, url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                logger.info(f"Scraping {url} at depth {depth}")
+                async with self._page_slots, self._get_host_throttle(url):
+                    page_data = await self._scrape_single_page(url, (known_pages or {}).get(url))
+                page_data['depth'] = depth
+                if retain_content:
+                    results[position] = page_data
+                else:
+                    results[position] = {k: v for k, v in page_data.items() if k not in _PAGE_PAYLOAD_KEYS}
+                if on_page is not None:
+                    await on_page(page_data)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(frontier)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return results
+
+    async def scrape_website(self, start_url: str, max_depth: int = 2, concurrency: Optional[int] = None,
+                             on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                             retain_content: bool = True,
+                             known_pages: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Scrape website with enhanced structure analysis.
         This function is used to scrape a website starting from a given URL, 
         it manages the depth of scraping and collects various statistics about the site structure, 
         including internal and external links, API endpoints, images, and content types.
-        It uses a breadth-first search approach to explore the site, ensuring that it does not exceed the max depth.
+        It crawls breadth-first, one depth level at a time, so every page is reached at its
+        shallowest depth. Pages of a level are fetched by a bounded pool of concurrent workers,
+        subject to the per-host concurrency cap and politeness delay.
+
+        Args:
+            start_url: URL to start crawling from
+            max_depth: Maximum link depth to follow from the start URL
+            concurrency: Number of concurrent workers (defaults to max_concurrency, 1 crawls sequentially)
+            on_page: Optional coroutine function awaited with each page as soon as it is scraped
+            retain_content: Keep page content in the returned and stored pages; streaming callers
+                that consume pages through on_page can disable this to bound memory
+            known_pages: Re-crawl: url -> page state from the previous crawl (see CrawlStateStore).
+                Known pages are requested conditionally, pages matching that state are marked
+                'unchanged', and pages not modified on the server keep their previously stored
+                content in scraped_sites
         """
+        concurrency = max(1, concurrency or self.max_concurrency)
         scraped_pages = []
         visited_urls = set()
-        urls_to_scrape = [(start_url, 0)]
         
         site_structure = {
             'domain': urlparse(start_url).netloc,
@@ -269,63 +623,39 @@ class EnhancedWebScraper:
             'depth_distribution': {},
             'sitemap': []
         }
-        
-        while urls_to_scrape:
-            current_url, depth = urls_to_scrape.pop(0)
-            
-            if current_url in visited_urls or depth > max_depth:
-                continue
-            
-            visited_urls.add(current_url)
-            logger.info(f"Scraping {current_url} at depth {depth}")
-            
-            page_data = await self._scrape_single_page(current_url)
-            page_data['depth'] = depth
-            scraped_pages.append(page_data)
-            
-            content_type = page_data.get('content_type', 'text')
-            site_structure['content_types'].add(content_type)
-            site_structure['total_pages'] += 1
-            
-            if depth not in site_structure['depth_distribution']:
-                site_structure['depth_distribution'][depth] = 0
-            site_structure['depth_distribution'][depth] += 1
-            
-            site_structure['sitemap'].append({
-                'url': current_url,
-                'title': page_data.get('title', ''),
-                'depth': depth,
-                'content_type': content_type,
-                'success': page_data.get('success', False)
-            })
-            
-            if page_data.get('success', False) and depth < max_depth:
-                links = page_data.get('links', {})
-                
-                for link in links.get('internal', []):
+
+        frontier = [start_url]
+        depth = 0
+        while frontier and depth <= max_depth:
+            level_urls = []
+            for url in frontier:
+                if url not in visited_urls:
+                    visited_urls.add(url)
+                    level_urls.append(url)
+
+            next_frontier = []
+            for page_data in await self._crawl_level(level_urls, depth, concurrency, on_page, retain_content,
+                                                     known_pages):
+                scraped_pages.append(page_data)
+                for link in self._record_page(page_data, depth, max_depth, site_structure):
                     if link not in visited_urls:
-                        urls_to_scrape.append((link, depth + 1))
-                
-                site_structure['total_internal_links'] += len(links.get('internal', []))
-                site_structure['total_external_links'] += len(links.get('external', []))
-                site_structure['total_api_endpoints'] += len(links.get('api', []))
-                site_structure['total_images'] += len(links.get('images', []))
-                
-                for ext_link in links.get('external', []):
-                    domain = urlparse(ext_link).netloc
-                    site_structure['external_domains'].add(domain)
-                
-                site_structure['api_endpoints'].extend(links.get('api', []))
-                site_structure['image_urls'].extend(links.get('images', []))
-            
-            await asyncio.sleep(0.5)
+                        next_frontier.append(link)
+
+            frontier = next_frontier
+            depth += 1
         
         site_structure['content_types'] = list(site_structure['content_types'])
         site_structure['external_domains'] = list(site_structure['external_domains'])
         
         domain = urlparse(start_url).netloc
+        stored_pages = scraped_pages
+        if known_pages and domain in self.scraped_sites:
+            previous = {page['url']: page for page in self.scraped_sites[domain]['pages']}
+            stored_pages = [{**previous[page['url']], 'depth': page['depth']}
+                            if page.get('not_modified') and page['url'] in previous else page
+                            for page in scraped_pages]
         self.scraped_sites[domain] = {
-            'pages': scraped_pages,
+            'pages': stored_pages,
             'structure': site_structure,
             'scraped_at': asyncio.get_event_loop().time()
         }
@@ -338,6 +668,19 @@ class EnhancedWebScraper:
             'success': True
         }
 
+    async def close(self):
+        """Release long-lived resources such as the browser pool and HTTP session"""
+        await self.browser_pool.close()
+        await self.http.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return runtime statistics for the scraper's shared resources"""
+        return {
+            'browser_pool': self.browser_pool.get_stats(),
+            'http': self.http.get_stats(),
+            'host_fetch_modes': dict(self._host_fetch_modes)
+        }
+
     def get_all_scraped_sites(self) -> Dict[str, Any]:
         """
         Get information about all scraped sites, including the total number of sites, the number of pages scraped for each site,
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import random
+from typing import Any, Dict, Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HttpError(Exception):
+    """Raised when a request finishes with an error status"""
+
+    def __init__(self, status: int, url: str, message: str = ''):
+        super().__init__(f"HTTP {status} for {url}{': ' + message if message else ''}")
+        self.status = status
+        self.url = url
+
+
+class HttpResponse:
+    """Fully read response body with the parts of the response the scraper needs"""
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes, encoding: str):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = body
+        self.encoding = encoding
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class AsyncHttpClient:
+    def __init__(self, total_connections: int = 100, per_host_connections: int = 8, timeout: float = 10.0,
+                 connect_timeout: float = 5.0, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, keepalive_timeout: float = 30.0,
+                 user_agent: str = "Mozilla/5.0 (compatible; WebsiteChatBot/1.0)"):
+        """
+        Initialize the shared async HTTP client. The underlying session is created lazily
+        inside the running event loop and reused for every request.
+
+        Args:
+            total_connections: Maximum number of pooled connections across all hosts
+            per_host_connections: Maximum number of pooled connections to a single host
+            timeout: Total timeout in seconds for a single request attempt
+            connect_timeout: Timeout in seconds for establishing a connection
+            max_retries: Number of retries for connection errors, timeouts and retryable statuses
+            backoff_base: Base delay in seconds for exponential backoff between retries
+            backoff_max: Upper bound in seconds for a single backoff delay
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            user_agent: User-Agent header sent with every request
+        """
+        self.total_connections = total_connections
+        self.per_host_connections = per_host_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.keepalive_timeout = keepalive_timeout
+        self.default_headers = {
+            'User-Agent': user_agent,
+            'Accept-Encoding': 'gzip, deflate'
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'failures': 0,
+            'bytes_received': 0
+        }
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.total_connections,
+                limit_per_host=self.per_host_connections,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=self.default_headers,
+                auto_decompress=True
+            )
+        return self._session
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * (0.5 + random.random() / 2)
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None, raise_for_status: bool = True) -> HttpResponse:
+        """
+        Perform a GET request with retry and exponential backoff.
+
+        Args:
+            url: URL to fetch
+            headers: Extra request headers
+            raise_for_status: Raise HttpError for 4xx/5xx responses
+
+        Returns:
+            The fully read response
+        """
+        session = await self._get_session()
+        attempt = 0
+        while True:
+            self.stats['requests'] += 1
+            retry_after = None
+            try:
+                async with session.get(url, headers=headers) as response:
+                    body = await response.read()
+                    result = HttpResponse(
+                        url=str(response.url),
+                        status=response.status,
+                        headers={k.lower(): v for k, v in response.headers.items()},
+                        body=body,
+                        encoding=response.get_encoding()
+                    )
+                    reason = response.reason or ''
+                self.stats['bytes_received'] += len(body)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                if result.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    if raise_for_status and result.status >= 400:
+                        self.stats['failures'] += 1
+                        raise HttpError(result.status, url, reason)
+                    return result
+                error = HttpError(result.status, url, reason)
+                retry_after = result.headers.get('retry-after')
+
+            if attempt >= self.max_retries:
+                self.stats['failures'] += 1
+                raise error
+            delay = self._backoff_delay(attempt, retry_after)
+            attempt += 1
+            self.stats['retries'] += 1
+            logger.debug(f"Retrying {url} in {delay:.2f}s after error: {str(error)} (attempt {attempt}/{self.max_retries})")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        """Close the pooled session and its connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return request counters"""
+        return dict(self.stats)
@@ -0,0 +1,421 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+from backend.enhanced_scraper import EnhancedWebScraper
+from backend.chunker import TextChunker
+from backend.chunk_pool import ChunkingPool, ChunkRequest
+from backend.chunk_dedup import ChunkDeduplicator
+from backend.crawl_state import CrawlStateStore
+from backend.embeddings import EmbeddingService
+from backend.sharded_store import ShardedVectorStore
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORE_PATH_PREFIX = "vector_store_data"
+
+# Marks the end of a stage's output on the queue feeding the next stage
+_END_OF_STREAM = object()
+
+class IngestionError(Exception):
+    """Raised when a scrape cannot be turned into indexed content"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class IngestionPipeline:
+    def __init__(self, scraper: EnhancedWebScraper, chunker: TextChunker,
+                 embedding_service: EmbeddingService, vector_store: ShardedVectorStore,
+                 page_queue_size: int = 16, chunk_queue_size: int = 256,
+                 index_queue_size: int = 4, embed_batch_size: int = 64, save_every_batches: int = 20,
+                 chunk_pool: Optional[ChunkingPool] = None, dedup_threshold: Optional[float] = 0.85,
+                 crawl_state: Optional[CrawlStateStore] = None):
+        """
+        Crawl -> chunk -> embed -> index pipeline shared by the /scrape route and background jobs.
+
+        Args:
+            scraper: Scraper used for crawling
+            chunker: Chunker used to split pages
+            embedding_service: Service used to embed chunks
+            vector_store: Store the embedded chunks are indexed in
+            page_queue_size: Streaming mode: scraped pages buffered between crawl and chunk stages
+            chunk_queue_size: Streaming mode: chunks buffered between chunk and embed stages
+            index_queue_size: Streaming mode: embedded batches buffered between embed and index stages
+            embed_batch_size: Streaming mode: number of chunks sent to the embedding stage at once
+            save_every_batches: Streaming mode: persist the vector store after this many indexed batches
+            chunk_pool: Pool that chunks pages off the event loop (default: an in-process pool over chunker)
+            dedup_threshold: Similarity from which a chunk is dropped as a near-duplicate of an earlier
+                chunk of the same scrape before embedding (None keeps every chunk). Chunks are not
+                compared with those already indexed, so a re-crawl embeds the repeated
+                navigation and footer text of the pages it re-chunks again
+            crawl_state: Per-page validators and content hashes recorded by every scrape and used
+                by re-crawls (without it, re-crawls index every page again)
+        """
+        self.scraper = scraper
+        self.chunker = chunker
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.page_queue_size = page_queue_size
+        self.chunk_queue_size = chunk_queue_size
+        self.index_queue_size = index_queue_size
+        self.embed_batch_size = embed_batch_size
+        self.save_every_batches = save_every_batches
+        self.chunk_pool = chunk_pool or ChunkingPool(chunker, workers=0)
+        self.dedup_threshold = dedup_threshold
+        self.crawl_state = crawl_state
+
+    def _chunk_request(self, page: Dict[str, Any], domain: str) -> Optional[ChunkRequest]:
+        """chunk_text arguments for one scraped page, or None if it has nothing (new) to chunk"""
+        if not page.get('success', False) or not page.get('content') or page.get('unchanged'):
+            return None
+        content_type = page.get('content_type', 'text')
+        metadata = {
+            'source_domain': domain,
+            'title': page.get('title', ''),
+            'depth': page.get('depth', 0),
+            'page_url': page['url']
+        }
+        if content_type == 'json' and 'raw_data' in page:
+            metadata['json_keys'] = list(page['raw_data'].keys()) if isinstance(page['raw_data'], dict) else []
+            # Lets the chunker split the payload along its key paths
+            metadata['json_data'] = page['raw_data']
+        elif content_type == 'image':
+            metadata['image_filename'] = page.get('title', '')
+        if page.get('content_format'):
+            metadata['content_format'] = page['content_format']
+
+        # Append image and API links to the content if present
+        links = page.get('links', {})
+        extra_info = ""
+        if links.get('images'):
+            extra_info += "\nImage links found on this page:\n" + "\n".join(links['images'])
+        if links.get('api'):
+            extra_info += "\nAPI links found on this page:\n" + "\n".join(links['api'])
+        content_with_links = page['content'] + extra_info
+
+        logger.debug(f"Chunking page with metadata: { {k: v for k, v in metadata.items() if k != 'json_data'} }")
+        return content_with_links, page['url'], content_type, metadata
+
+    async def chunk_pages(self, pages: List[Dict[str, Any]], domain: str) -> List[Dict[str, Any]]:
+        """Split scraped pages into chunks carrying the page metadata, in page order"""
+        requests = [request for request in (self._chunk_request(page, domain) for page in pages) if request is not None]
+        all_chunks = []
+        for request, chunks in zip(requests, await self.chunk_pool.chunk_many(requests)):
+            # The vector store indexes chunks by domain and content type for deletion and filtering
+            for chunk in chunks:
+                chunk['source_domain'] = domain
+                chunk['content_type'] = request[2]
+            all_chunks.extend(chunks)
+        return all_chunks
+
+    def _known_pages(self, domain: str, recrawl: bool) -> Dict[str, Dict[str, Any]]:
+        """State of the previous crawl of a domain for a re-crawl, or {} for a full crawl"""
+        if not recrawl or self.crawl_state is None:
+            return {}
+        if domain not in self.vector_store.get_domains():
+            logger.info(f"Nothing indexed for {domain} yet, crawling it in full")
+            return {}
+        return self.crawl_state.get_site(domain)
+
+    @staticmethod
+    def _changed_known_urls(pages: List[Dict[str, Any]], known: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Pages indexed by the previous crawl that were fetched again with new content"""
+        return [page['url'] for page in pages
+                if page['url'] in known and page.get('success', False) and not page.get('unchanged')]
+
+    @staticmethod
+    def _removed_known_urls(pages: List[Dict[str, Any]], known: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Pages indexed by the previous crawl that are gone: the server answered 404 or 410, or
+        the crawl did not reach them and every page that used to link to them was fetched
+        again without that link (or is gone itself). Pages behind failed fetches, or only
+        linked from pages this crawl did not reach, keep their chunks and crawl state.
+        """
+        fetched = {page['url']: page for page in pages}
+        removed = {url for url in known if fetched.get(url, {}).get('gone')}
+        linked = {link for page in pages if page.get('success', False)
+                  for link in (page.get('links') or {}).get('internal', [])}
+        parents: Dict[str, List[str]] = {}
+        for parent, state in known.items():
+            for link in state['links'].get('internal', []):
+                if link != parent:
+                    parents.setdefault(link, []).append(parent)
+        # Removing a page can leave its own children unlinked, so repeat until nothing changes
+        pending = [url for url in known if url not in fetched and url not in linked and parents.get(url)]
+        while True:
+            unlinked = [url for url in pending
+                        if all(parent in removed or fetched.get(parent, {}).get('success', False)
+                               for parent in parents[url])]
+            if not unlinked:
+                break
+            removed.update(unlinked)
+            pending = [url for url in pending if url not in removed]
+        return [url for url in known if url in removed]
+
+    def _record_crawl_state(self, domain: str, pages: List[Dict[str, Any]], removed_urls: List[str]):
+        if self.crawl_state is None:
+            return
+        self.crawl_state.put_pages(domain, [page for page in pages if page.get('success', False)
+                                            and page.get('content_hash') and not page.get('not_modified')])
+        if removed_urls:
+            self.crawl_state.delete_pages(domain, removed_urls)
+
+    def _new_deduplicator(self) -> Optional[ChunkDeduplicator]:
+        return ChunkDeduplicator(self.dedup_threshold) if self.dedup_threshold is not None else None
+
+    @staticmethod
+    def _deduplicate(chunks: List[Dict[str, Any]], deduplicator: Optional[ChunkDeduplicator],
+                     progress: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Drop near-duplicate chunks and report the scrape's dedup counters in progress"""
+        if deduplicator is None:
+            return chunks
+        unique = deduplicator.filter(chunks)
+        progress['chunks_deduplicated'] = deduplicator.stats['duplicates']
+        progress['dedup_ratio'] = round(deduplicator.ratio, 4)
+        return unique
+
+    async def _embed_chunks(self, chunks: List[Dict[str, Any]], progress: Dict[str, Any]):
+        """
+        Embed chunks and drop the ones the embedding service skipped.
+
+        Returns:
+            Tuple of (embeddings, chunks) with matching lengths and order
+        """
+        embeddings = await self.embedding_service.embed_batch(
+            [chunk['text'] for chunk in chunks], [chunk['tokens'] for chunk in chunks]
+        )
+        kept = [(embedding, chunk) for embedding, chunk in zip(embeddings, chunks) if embedding is not None]
+        skipped = len(chunks) - len(kept)
+        if skipped:
+            logger.warning(f"Dropping {skipped} chunks that produced no embedding")
+            progress['chunks_skipped'] = progress.get('chunks_skipped', 0) + skipped
+        return [embedding for embedding, _ in kept], [chunk for _, chunk in kept]
+
+    async def run(self, url: str, max_depth: int = 2, concurrency: Optional[int] = None,
+                  progress: Optional[Dict[str, Any]] = None, streaming: bool = False,
+                  recrawl: bool = False) -> Dict[str, Any]:
+        """
+        Scrape a website and index its content.
+
+        A re-crawl requests the pages seen by the previous crawl of the site conditionally
+        (If-None-Match / If-Modified-Since) and skips the pages that are not modified or whose
+        content hash is unchanged. Only the chunks of changed pages are replaced, and pages
+        that are gone (404/410, or no longer linked from their re-fetched parents) are
+        deleted, so a refresh costs in proportion to what changed. Pages that could not be
+        fetched keep what was indexed for them. Near-duplicates are only dropped among the
+        re-chunked pages, not against the chunks already indexed.
+
+        Args:
+            url: URL to start crawling from
+            max_depth: Maximum link depth to follow
+            concurrency: Number of concurrent crawl workers
+            progress: Optional dict updated in place with the current stage and counters
+            streaming: Run crawl, chunk, embed and index as concurrent stages (see run_streaming)
+            recrawl: Only re-index what changed since the previous crawl of the site
+
+        Returns:
+            Dictionary with pages_scraped, pages_unchanged, pages_removed, chunks_created,
+            chunks_deduplicated, dedup_ratio and embeddings_stored
+        """
+        if progress is None:
+            progress = {}
+        if streaming:
+            return await self.run_streaming(url, max_depth, concurrency, progress, recrawl)
+        progress.update({'stage': 'crawling', 'pages_fetched': 0, 'pages_unchanged': 0, 'pages_removed': 0,
+                         'chunks_created': 0, 'chunks_deduplicated': 0, 'dedup_ratio': 0.0, 'embeddings_stored': 0})
+        domain = urlparse(url).netloc
+        known = self._known_pages(domain, recrawl)
+
+        async def on_page(page: Dict[str, Any]):
+            progress['pages_fetched'] += 1
+            if page.get('unchanged'):
+                progress['pages_unchanged'] += 1
+
+        logger.info(f"Starting {'re-crawl' if known else 'scrape'} for {url} with depth {max_depth}")
+        scrape_result = await self.scraper.scrape_website(url, max_depth, concurrency, on_page=on_page,
+                                                          known_pages=known)
+        if not scrape_result.get('success') or not scrape_result.get('pages'):
+            raise IngestionError("No content could be scraped from the website", status_code=400)
+        scraped_pages = scrape_result['pages']
+        removed = self._removed_known_urls(scraped_pages, known)
+        progress['pages_removed'] = len(removed)
+
+        progress['stage'] = 'chunking'
+        all_chunks = await self.chunk_pages(scraped_pages, domain)
+        progress['chunks_created'] = len(all_chunks)
+        if not all_chunks and not known:
+            raise IngestionError("No content chunks could be created from the scraped pages", status_code=400)
+
+        embeddings, chunks = [], []
+        if all_chunks:
+            progress['stage'] = 'deduplicating'
+            unique_chunks = self._deduplicate(all_chunks, self._new_deduplicator(), progress)
+
+            progress['stage'] = 'embedding'
+            embeddings, chunks = await self._embed_chunks(unique_chunks, progress)
+            if not embeddings:
+                raise IngestionError("Failed to generate embeddings")
+
+        progress['stage'] = 'indexing'
+        # Replace the chunks of changed pages and drop those of removed pages
+        self.vector_store.delete_urls(domain, self._changed_known_urls(scraped_pages, known) + removed)
+        if embeddings:
+            self.vector_store.add_embeddings(embeddings, chunks)
+        progress['embeddings_stored'] = len(embeddings)
+        # Save vector store to disk for voice agent
+        self.vector_store.save_to_disk(VECTOR_STORE_PATH_PREFIX)
+        self._record_crawl_state(domain, scraped_pages, removed)
+        progress['stage'] = 'done'
+        logger.info(f"Successfully processed {len(scraped_pages)} pages ({progress['pages_unchanged']} unchanged, "
+                    f"{len(removed)} removed), created {len(all_chunks)} chunks "
+                    f"({progress['chunks_deduplicated']} near-duplicates dropped) and saved vector store to disk")
+
+        return {
+            'pages_scraped': len(scraped_pages),
+            'pages_unchanged': progress['pages_unchanged'],
+            'pages_removed': len(removed),
+            'chunks_created': len(all_chunks),
+            'chunks_deduplicated': progress['chunks_deduplicated'],
+            'dedup_ratio': progress['dedup_ratio'],
+            'embeddings_stored': len(embeddings)
+        }
+
+    async def run_streaming(self, url: str, max_depth: int = 2, concurrency: Optional[int] = None,
+                            progress: Optional[Dict[str, Any]] = None, recrawl: bool = False) -> Dict[str, Any]:
+        """
+        Scrape a website and index its content with crawl, chunk, embed and index running as
+        concurrent stages connected by bounded queues. A full queue blocks the stage feeding it,
+        so peak memory is bounded by the queue sizes, and pages become searchable as soon as
+        their batch has been indexed. Near-duplicates are dropped before they are queued for
+        embedding; duplicates of chunks that were already indexed add their URLs to those
+        chunks' metadata once the crawl is done. A re-crawl (see run) replaces the chunks of
+        each changed page just before its new chunks are queued, and deletes removed pages at
+        the end.
+
+        Args:
+            url: URL to start crawling from
+            max_depth: Maximum link depth to follow
+            concurrency: Number of concurrent crawl workers
+            progress: Optional dict updated in place with the current stage and counters
+            recrawl: Only re-index what changed since the previous crawl of the site
+
+        Returns:
+            Dictionary with pages_scraped, pages_unchanged, pages_removed, chunks_created,
+            chunks_deduplicated, dedup_ratio and embeddings_stored
+        """
+        if progress is None:
+            progress = {}
+        progress.update({'stage': 'streaming', 'pages_fetched': 0, 'pages_unchanged': 0, 'pages_removed': 0,
+                         'chunks_created': 0, 'chunks_deduplicated': 0, 'dedup_ratio': 0.0, 'embeddings_stored': 0})
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=self.page_queue_size)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.chunk_queue_size)
+        index_queue: asyncio.Queue = asyncio.Queue(maxsize=self.index_queue_size)
+        domain = urlparse(url).netloc
+        totals: Dict[str, Any] = {'pages': [], 'chunks_deleted': 0}
+        deduplicator = self._new_deduplicator()
+        known = self._known_pages(domain, recrawl)
+
+        async def on_page(page: Dict[str, Any]):
+            progress['pages_fetched'] += 1
+            if page.get('unchanged'):
+                progress['pages_unchanged'] += 1
+                return
+            await page_queue.put(page)
+
+        # A failing stage makes gather() raise, which cancels the others, so the
+        # end-of-stream marker is only sent on normal completion
+        async def crawl_stage():
+            scrape_result = await self.scraper.scrape_website(
+                url, max_depth, concurrency, on_page=on_page, retain_content=False, known_pages=known
+            )
+            totals['pages'] = scrape_result.get('pages', [])
+            await page_queue.put(_END_OF_STREAM)
+
+        async def chunk_stage():
+            finished = False
+            while not finished:
+                # Chunk every page already waiting together, so the pool can spread them over workers
+                pages = [await page_queue.get()]
+                while not page_queue.empty() and len(pages) < self.page_queue_size:
+                    pages.append(page_queue.get_nowait())
+                if pages[-1] is _END_OF_STREAM:
+                    pages.pop()
+                    finished = True
+                chunks = await self.chunk_pages(pages, domain)
+                # Old chunks of changed pages go before their replacements are queued
+                totals['chunks_deleted'] += self.vector_store.delete_urls(domain, self._changed_known_urls(pages, known))
+                progress['chunks_created'] += len(chunks)
+                for chunk in self._deduplicate(chunks, deduplicator, progress):
+                    await chunk_queue.put(chunk)
+            await chunk_queue.put(_END_OF_STREAM)
+
+        async def embed_stage():
+            batch: List[Dict[str, Any]] = []
+            while True:
+                chunk = await chunk_queue.get()
+                if chunk is not _END_OF_STREAM:
+                    batch.append(chunk)
+                # Flush full batches, and partial ones whenever the chunk stage falls behind
+                if batch and (chunk is _END_OF_STREAM or len(batch) >= self.embed_batch_size or chunk_queue.empty()):
+                    embedded = await self._embed_chunks(batch, progress)
+                    if embedded[0]:
+                        await index_queue.put(embedded)
+                    batch = []
+                if chunk is _END_OF_STREAM:
+                    break
+            await index_queue.put(_END_OF_STREAM)
+
+        async def index_stage():
+            batches_since_save = 0
+            while (item := await index_queue.get()) is not _END_OF_STREAM:
+                embeddings, chunks = item
+                vector_ids = self.vector_store.add_embeddings(embeddings, chunks)
+                if deduplicator is not None:
+                    deduplicator.mark_indexed(chunks, vector_ids)
+                progress['embeddings_stored'] += len(embeddings)
+                batches_since_save += 1
+                if batches_since_save >= self.save_every_batches:
+                    self.vector_store.save_to_disk(VECTOR_STORE_PATH_PREFIX)
+                    batches_since_save = 0
+            if batches_since_save:
+                self.vector_store.save_to_disk(VECTOR_STORE_PATH_PREFIX)
+
+        logger.info(f"Starting streaming {'re-crawl' if known else 'scrape'} for {url} with depth {max_depth}")
+        stages = [asyncio.create_task(stage()) for stage in (crawl_stage, chunk_stage, embed_stage, index_stage)]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for task in stages:
+                task.cancel()
+
+        if not totals['pages']:
+            raise IngestionError("No content could be scraped from the website", status_code=400)
+        if not progress['chunks_created'] and not known:
+            raise IngestionError("No content chunks could be created from the scraped pages", status_code=400)
+        removed = self._removed_known_urls(totals['pages'], known)
+        progress['pages_removed'] = len(removed)
+        totals['chunks_deleted'] += self.vector_store.delete_urls(domain, removed)
+        if totals['chunks_deleted']:
+            # Covers pages whose old chunks were deleted but that produced no new batch to save
+            self.vector_store.save_to_disk(VECTOR_STORE_PATH_PREFIX)
+        self._record_crawl_state(domain, totals['pages'], removed)
+        if deduplicator is not None:
+            # Every chunk is saved by now, so these go straight to the metadata database
+            for update_domain, updates in deduplicator.late_source_urls().items():
+                self.vector_store.update_extra(update_domain, updates)
+        progress['stage'] = 'done'
+        logger.info(f"Streamed {len(totals['pages'])} pages ({progress['pages_unchanged']} unchanged, "
+                    f"{len(removed)} removed) into {progress['chunks_created']} chunks "
+                    f"({progress['chunks_deduplicated']} near-duplicates dropped) and saved vector store to disk")
+
+        return {
+            'pages_scraped': len(totals['pages']),
+            'pages_unchanged': progress['pages_unchanged'],
+            'pages_removed': len(removed),
+            'chunks_created': progress['chunks_created'],
+            'chunks_deduplicated': progress['chunks_deduplicated'],
+            'dedup_ratio': progress['dedup_ratio'],
+            'embeddings_stored': progress['embeddings_stored']
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from backend.ingest import IngestionPipeline
+
+logger = logging.getLogger(__name__)
+
+class ScrapeJob:
+    """A queued or running scrape with its progress counters"""
+
+    def __init__(self, url: str, max_depth: int, options: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.max_depth = max_depth
+        self.options = options
+        self.status = 'queued'
+        self.progress: Dict[str, Any] = {
+            'stage': 'queued',
+            'pages_fetched': 0,
+            'chunks_created': 0,
+            'embeddings_stored': 0
+        }
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'url': self.url,
+            'max_depth': self.max_depth,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ScrapeJobManager:
+    def __init__(self, pipeline: IngestionPipeline, num_workers: int = 2, max_finished_jobs: int = 100):
+        """
+        Initialize the job manager. Workers are started lazily on the first submitted job.
+
+        Args:
+            pipeline: Ingestion pipeline used to run each job
+            num_workers: Number of jobs that may run at the same time
+            max_finished_jobs: Number of finished jobs kept for status polling
+        """
+        self.pipeline = pipeline
+        self.num_workers = num_workers
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: "OrderedDict[str, ScrapeJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.num_workers:
+            self._workers.append(asyncio.create_task(self._worker(len(self._workers))))
+
+    def _prune_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def submit(self, url: str, max_depth: int = 2, **options) -> ScrapeJob:
+        """Queue a scrape job and return it; extra options are passed to the pipeline"""
+        self._ensure_workers()
+        job = ScrapeJob(url, max_depth, options)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._prune_finished()
+        logger.info(f"Queued scrape job {job.id} for {url} ({self._queue.qsize()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[ScrapeJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            True if the job was cancelled, False if it does not exist or already finished
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_requested = True
+        if job.status == 'queued':
+            job.status = 'cancelled'
+            job.progress['stage'] = 'cancelled'
+            job.finished_at = time.time()
+        elif job._task is not None:
+            job._task.cancel()
+        logger.info(f"Cancellation requested for scrape job {job_id}")
+        return True
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.cancel_requested:
+                    continue
+                await self._run_job(job, worker_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: ScrapeJob, worker_id: int):
+        job.status = 'running'
+        job.started_at = time.time()
+        logger.info(f"Worker {worker_id} started scrape job {job.id} for {job.url}")
+        job._task = asyncio.create_task(
+            self.pipeline.run(job.url, job.max_depth, progress=job.progress, **job.options)
+        )
+        try:
+            job.result = await job._task
+            job.status = 'completed'
+        except asyncio.CancelledError:
+            if not job.cancel_requested:
+                # The worker itself is being cancelled (shutdown)
+                job._task.cancel()
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+                raise
+            job.status = 'cancelled'
+            job.progress['stage'] = 'cancelled'
+        except Exception as e:
+            logger.error(f"Scrape job {job.id} failed: {str(e)}")
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job._task = None
+            job.finished_at = job.finished_at or time.time()
+        logger.info(f"Scrape job {job.id} finished with status '{job.status}'")
+
+    async def shutdown(self):
+        """Cancel running jobs and stop the workers"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -0,0 +1,152 @@
+import logging
+import math
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Words plus codes such as "AB-1234", "E_1023" or "v2.1"; codes are also indexed by their parts
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART_PATTERN = re.compile(r"[-_./]")
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if _PART_PATTERN.search(token):
+            tokens.extend(part for part in _PART_PATTERN.split(token) if part)
+    return tokens
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_deleted_fraction: float = 0.2):
+        """
+        In-memory BM25 inverted index over chunk text, keyed by the vector store's chunk ids.
+        Each posting list is a pair of compact typed arrays (uint32 ids, uint16 term
+        frequencies) that grow in place and are scored as numpy views without copying.
+        Deleted ids are masked out and purged from the postings once they pile up.
+
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+            max_deleted_fraction: Fraction of deleted documents that triggers a postings purge
+        """
+        self.k1 = k1
+        self.b = b
+        self.max_deleted_fraction = max_deleted_fraction
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Document lengths by id; 0 marks an id that is not (or no longer) indexed
+        self._doc_len = np.zeros(1024, dtype=np.uint32)
+        self._live_docs = 0
+        self._deleted_docs = 0
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return self._live_docs
+
+    def add(self, doc_id: int, text: str):
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        if doc_id >= len(self._doc_len):
+            grown = np.zeros(max(doc_id + 1, 2 * len(self._doc_len)), dtype=np.uint32)
+            grown[:len(self._doc_len)] = self._doc_len
+            self._doc_len = grown
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = (array('I'), array('H'))
+            postings[0].append(doc_id)
+            postings[1].append(min(count, 65535))
+        self._doc_len[doc_id] = len(tokens)
+        self._live_docs += 1
+        self._total_len += len(tokens)
+
+    def add_many(self, docs: Iterable[Tuple[int, str]]):
+        for doc_id, text in docs:
+            self.add(doc_id, text)
+
+    def remove_many(self, doc_ids: Iterable[int]):
+        for doc_id in doc_ids:
+            if doc_id < len(self._doc_len) and self._doc_len[doc_id]:
+                self._total_len -= int(self._doc_len[doc_id])
+                self._doc_len[doc_id] = 0
+                self._live_docs -= 1
+                self._deleted_docs += 1
+        if self._deleted_docs > self.max_deleted_fraction * max(self._live_docs, 1):
+            self._purge()
+
+    def _purge(self):
+        """Drop postings of deleted documents"""
+        live = self._doc_len > 0
+        for token in list(self._postings):
+            ids, tfs = self._postings[token]
+            ids_view = np.frombuffer(ids, dtype=np.uint32)
+            keep = live[ids_view]
+            if keep.all():
+                continue
+            if not keep.any():
+                del self._postings[token]
+                continue
+            self._postings[token] = (array('I', ids_view[keep].tobytes()),
+                                     array('H', np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()))
+        logger.info(f"Purged {self._deleted_docs} deleted documents from the lexical index")
+        self._deleted_docs = 0
+
+    def search(self, query: str, top_k: int = 10, allowed: Optional[Set[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score documents containing any query term.
+
+        Args:
+            query: Query text
+            top_k: Number of documents to return
+            allowed: Optional set of ids to restrict the search to
+
+        Returns:
+            Tuple of (ids, scores) arrays, best first
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if not self._live_docs:
+            return empty
+        avg_len = self._total_len / self._live_docs
+        doc_parts, score_parts = [], []
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            ids = np.frombuffer(postings[0], dtype=np.uint32)
+            lengths = self._doc_len[ids]
+            live = lengths > 0
+            df = int(live.sum())
+            if not df:
+                continue
+            ids, lengths = ids[live], lengths[live].astype(np.float32)
+            tfs = np.frombuffer(postings[1], dtype=np.uint16)[live].astype(np.float32)
+            idf = math.log(1 + (self._live_docs - df + 0.5) / (df + 0.5))
+            doc_parts.append(ids)
+            score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / avg_len)))
+        if not doc_parts:
+            return empty
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts)).astype(np.float32)
+        docs = docs.astype(np.int64)
+        if allowed is not None:
+            mask = np.fromiter((doc in allowed for doc in docs.tolist()), dtype=bool, count=len(docs))
+            docs, scores = docs[mask], scores[mask]
+        if len(docs) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            docs, scores = docs[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        return docs[order], scores[order]
+
+    def get_stats(self) -> Dict[str, int]:
+        postings_bytes = sum(ids.itemsize * len(ids) + tfs.itemsize * len(tfs) for ids, tfs in self._postings.values())
+        return {
+            'documents': self._live_docs,
+            'terms': len(self._postings),
+            'postings_bytes': postings_bytes
+        }
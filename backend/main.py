@@ -17,6 +17,8 @@ if sys.platform.startswith('win'):
 from backend.routes.scrape import router as scrape_router
 from backend.routes.chat import router as chat_router
 from backend.routes.voice import router as voice_router
+from backend.routes.jobs import router as jobs_router
+from backend.services import scraper, job_manager, embedding_service, query_batcher, chunk_pool
 
 # Suppress asyncio NotImplementedError tracebacks for Playwright on Windows
 from backend.suppress_asyncio_tracebacks import *
@@ -44,12 +46,30 @@ app.add_middleware(
 app.include_router(scrape_router)
 app.include_router(chat_router)
 app.include_router(voice_router)
+app.include_router(jobs_router)
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {"message": "Website Chat API is running", "status": "healthy"}
 
+@app.get("/stats")
+async def stats():
+    """Runtime statistics for long-lived service resources"""
+    return {
+        "scraper": scraper.get_stats(),
+        "chunking": chunk_pool.get_stats(),
+        "embeddings": embedding_service.get_stats(),
+        "retrieval": query_batcher.get_stats()
+    }
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Release long-lived resources held by the service singletons"""
+    await job_manager.shutdown()
+    await scraper.close()
+    chunk_pool.close()
+
 # You can add additional utility endpoints here if needed (e.g., /status, /sites, /structure/{domain}, /execute)
 
 # Load environment variables from .env at startup
@@ -1,20 +1,55 @@
 from pydantic import BaseModel, HttpUrl
-from typing import List
+from typing import Any, Dict, List, Optional
 
 class ScrapeRequest(BaseModel):
     url: HttpUrl
     max_depth: int = 2
+    concurrency: Optional[int] = None
+    background: bool = False
+    streaming: bool = False
+    # Only re-index pages that changed since the previous crawl of the site
+    recrawl: bool = False
 
 class ScrapeResponse(BaseModel):
     success: bool
     message: str
     pages_scraped: int
+    pages_unchanged: int = 0
+    pages_removed: int = 0
     chunks_created: int
+    # Near-duplicate chunks dropped before embedding, and their share of chunks_created
+    chunks_deduplicated: int = 0
+    dedup_ratio: float = 0.0
     embeddings_stored: int
 
+class ScrapeJobResponse(BaseModel):
+    success: bool
+    job_id: str
+    status: str
+    message: str
+
+class ScrapeJobStatus(BaseModel):
+    job_id: str
+    url: str
+    max_depth: int
+    status: str
+    progress: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
 class ChatRequest(BaseModel):
     question: str
     top_k: int = 5
+    # Minimum similarity (cosine, higher is better) a chunk needs to be used as context
+    min_score: Optional[float] = None
+    # Restrict retrieval to one scraped site and/or content type (text, json, image)
+    domain: Optional[str] = None
+    content_type: Optional[str] = None
+    # Fuse keyword (BM25) matches with the semantic results; helps with names, SKUs and error codes
+    hybrid: bool = True
 
 class ChatResponse(BaseModel):
     success: bool
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from backend.chunk_records import SearchHit
+from backend.sharded_store import ShardedVectorStore
+from backend.vector_store import LexicalIndexBuild
+
+logger = logging.getLogger(__name__)
+
+# Queries share a batch when they share top_k, filters and the hybrid/dense mode
+_BatchKey = Tuple[int, Optional[str], Optional[str], bool]
+
+class _PendingQuery:
+    __slots__ = ('embedding', 'text', 'min_score', 'future')
+
+    def __init__(self, embedding: List[float], text: Optional[str], min_score: Optional[float],
+                 future: asyncio.Future):
+        self.embedding = embedding
+        self.text = text
+        self.min_score = min_score
+        self.future = future
+
+
+class QueryBatcher:
+    def __init__(self, vector_store: ShardedVectorStore, window_ms: float = 2.0, max_batch_size: int = 64):
+        """
+        Coalesce retrievals that arrive within a few milliseconds of each other into one
+        ShardedVectorStore.search_batch call. The search runs on the event loop, like the unbatched
+        search it replaces, so it never overlaps with ingestion writing to the store.
+
+        Args:
+            vector_store: Store to search
+            window_ms: How long the first query of a batch waits for others (0 disables batching)
+            max_batch_size: A batch is flushed as soon as it holds this many queries
+        """
+        self.vector_store = vector_store
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        # Queries only share a search when they share top_k, filters and the hybrid/dense mode: the
+        # depth of the candidate lists follows top_k, and hybrid fusion scores depend on that depth
+        self._pending: Dict[_BatchKey, List[_PendingQuery]] = {}
+        self._timers: Dict[_BatchKey, asyncio.TimerHandle] = {}
+        # Lexical index builds running in worker threads
+        self._lexical_tasks: Dict[LexicalIndexBuild, asyncio.Task] = {}
+        self.stats = {'queries': 0, 'batches': 0, 'largest_batch': 0}
+
+    async def search(self, query_embedding: List[float], top_k: int = 5, content_type_filter: Optional[str] = None,
+                     domain_filter: Optional[str] = None, min_score: Optional[float] = None,
+                     query_text: Optional[str] = None) -> List[SearchHit]:
+        """Same contract as VectorStore.search, batched with concurrent callers"""
+        self.stats['queries'] += 1
+        if query_text is not None:
+            await self._prepare_lexical_indexes()
+        if self.window <= 0:
+            self._record_batch(1)
+            return self.vector_store.search(query_embedding, top_k, content_type_filter, domain_filter, min_score, query_text)
+        loop = asyncio.get_running_loop()
+        key = (top_k, content_type_filter, domain_filter, query_text is not None)
+        pending = self._pending.setdefault(key, [])
+        pending.append(_PendingQuery(query_embedding, query_text, min_score, loop.create_future()))
+        future = pending[-1].future
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    async def _prepare_lexical_indexes(self):
+        """
+        Build the BM25 indexes that a load left unbuilt in worker threads, so that the first
+        hybrid searches do not tokenize every stored chunk on the event loop
+        """
+        builds = self.vector_store.begin_lexical_builds()
+        for build in builds:
+            if build not in self._lexical_tasks:
+                self._lexical_tasks[build] = asyncio.ensure_future(self._build_lexical_index(build))
+        if builds:
+            await asyncio.gather(*(asyncio.shield(self._lexical_tasks[build]) for build in builds))
+
+    async def _build_lexical_index(self, build: LexicalIndexBuild):
+        try:
+            await asyncio.to_thread(build.run)
+            build.install()
+        except Exception as e:
+            # The search then builds the index itself
+            logger.error(f"Building the lexical index failed: {str(e)}")
+        finally:
+            self._lexical_tasks.pop(build, None)
+
+    def _record_batch(self, size: int):
+        self.stats['batches'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], size)
+
+    def _flush(self, key: _BatchKey):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            self._record_batch(len(batch))
+            self._run_batch(key, batch)
+
+    def _run_batch(self, key: _BatchKey, batch: List[_PendingQuery]):
+        top_k, content_type_filter, domain_filter, hybrid = key
+        # Search once with each query's own cutoff
+        try:
+            results = self.vector_store.search_batch(
+                [query.embedding for query in batch], top_k,
+                content_type_filter, domain_filter, [query.min_score for query in batch],
+                [query.text for query in batch] if hybrid else None
+            )
+        except Exception as e:
+            logger.error(f"Batched search of {len(batch)} queries failed: {str(e)}")
+            for query in batch:
+                if not query.future.done():
+                    query.future.set_exception(e)
+            return
+        for query, hits in zip(batch, results):
+            if not query.future.done():
+                query.future.set_result(hits)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'mean_batch_size': self.stats['queries'] / self.stats['batches'] if self.stats['batches'] else 0.0,
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size
+        }
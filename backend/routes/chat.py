@@ -3,7 +3,7 @@ Chat endpoints for answering questions based on website content.
 """
 from fastapi import APIRouter, HTTPException
 from backend.models import ChatRequest, ChatResponse
-from backend.services import embedding_service, vector_store, chat_service
+from backend.services import embedding_service, vector_store, chat_service, query_batcher
 from backend.services import scraper
 import logging
 
@@ -20,8 +20,17 @@ async def chat_with_content(request: ChatRequest):
                 status_code=400, 
                 detail="No content available. Please scrape a website first using the /scrape endpoint."
             )
-        question_embedding = await embedding_service.generate_embeddings([request.question])
-        relevant_chunks = vector_store.search(question_embedding[0], top_k=request.top_k)
+        question_embedding = (await embedding_service.embed_batch([request.question]))[0]
+        if question_embedding is None:
+            raise HTTPException(status_code=400, detail="Question must not be empty")
+        relevant_chunks = await query_batcher.search(
+            question_embedding,
+            top_k=request.top_k,
+            content_type_filter=request.content_type,
+            domain_filter=request.domain,
+            min_score=request.min_score,
+            query_text=request.question if request.hybrid else None
+        )
         if not relevant_chunks:
             return ChatResponse(
                 success=False,
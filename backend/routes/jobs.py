@@ -0,0 +1,34 @@
+"""
+Job endpoints for polling and cancelling background scrape jobs.
+"""
+from fastapi import APIRouter, HTTPException
+from typing import List
+from backend.models import ScrapeJobStatus
+from backend.services import job_manager
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/jobs", response_model=List[ScrapeJobStatus])
+async def list_jobs():
+    """List queued, running and recently finished scrape jobs."""
+    return job_manager.list_jobs()
+
+@router.get("/jobs/{job_id}", response_model=ScrapeJobStatus)
+async def get_job(job_id: str):
+    """Report the status and progress of a scrape job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
+
+@router.post("/jobs/{job_id}/cancel", response_model=ScrapeJobStatus)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running scrape job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' has already finished")
+    return job.to_dict()
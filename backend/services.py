@@ -1,20 +1,38 @@
 """
 Service singletons for use across routers.
 """
+import os
 from backend.enhanced_scraper import EnhancedWebScraper
 from backend.embeddings import EmbeddingService
+from backend.embedding_cache import EmbeddingCache
 from backend.chunker import TextChunker
-from backend.vector_store import VectorStore
+from backend.chunk_pool import ChunkingPool
+from backend.crawl_state import CrawlStateStore
+from backend.sharded_store import ShardedVectorStore
 from backend.chat_service import ChatService
 from backend.livekit_service import LiveKitService
+from backend.ingest import IngestionPipeline
+from backend.jobs import ScrapeJobManager
+from backend.query_batcher import QueryBatcher
 import backend.simple_voice_agent as simple_voice_agent
 
 scraper = EnhancedWebScraper()
 chunker = TextChunker()
-embedding_service = EmbeddingService()
-vector_store = VectorStore()
+# CHUNK_WORKERS=0 chunks on a thread of the API process instead of a process pool
+chunk_pool = ChunkingPool(chunker, workers=int(os.environ["CHUNK_WORKERS"]) if "CHUNK_WORKERS" in os.environ else None)
+embedding_cache = EmbeddingCache(
+    os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200_000))
+)
+embedding_service = EmbeddingService(cache=embedding_cache)
+vector_store = ShardedVectorStore(index_type=os.getenv("VECTOR_INDEX_TYPE", "flat"), metric=os.getenv("VECTOR_METRIC", "cosine"))
+query_batcher = QueryBatcher(vector_store, window_ms=float(os.getenv("QUERY_BATCH_WINDOW_MS", 2.0)))
+crawl_state = CrawlStateStore(os.getenv("CRAWL_STATE_PATH", "crawl_state.sqlite3"))
 chat_service = ChatService()
 livekit_service = LiveKitService()
+ingestion_pipeline = IngestionPipeline(scraper, chunker, embedding_service, vector_store, chunk_pool=chunk_pool,
+                                       crawl_state=crawl_state)
+job_manager = ScrapeJobManager(ingestion_pipeline, num_workers=int(os.getenv("SCRAPE_JOB_WORKERS", 2)))
 
 # Set services for voice agent
 simple_voice_agent.set_services(vector_store, embedding_service)
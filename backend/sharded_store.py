@@ -0,0 +1,370 @@
+import hashlib
+import heapq
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, List, Optional, Set, Union
+import numpy as np
+from backend.chunk_records import SearchHit, chunk_domain
+from backend.vector_store import LexicalIndexBuild, VectorStore, fuse_hybrid, query_cutoffs, METADATA_FILE, MANIFEST_FILE, _DATA_FILE_PATTERN, _atomic_write, read_manifest
+
+logger = logging.getLogger(__name__)
+
+SHARDS_MANIFEST_FILE = 'shards.json'
+SHARDS_DIR = 'shards'
+
+def read_shards_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """Return the shard manifest of a sharded store directory, or None if there is none"""
+    try:
+        with open(os.path.join(path, SHARDS_MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def shard_dir_name(domain: str) -> str:
+    """Filesystem-safe, collision-free directory name for a domain's shard"""
+    readable = re.sub(r'[^A-Za-z0-9._-]', '_', domain)[:64] or 'default'
+    return f"{readable}-{hashlib.sha1(domain.encode()).hexdigest()[:8]}"
+
+class ShardedVectorStore:
+    def __init__(self, search_workers: Optional[int] = None, **shard_config):
+        """
+        Vector store partitioned into one VectorStore shard per domain, each with its own
+        index, vectors and persistence directory. Adding or deleting a site only touches its
+        shard, domain-scoped queries search a single shard, and unscoped queries fan out to
+        all shards on a thread pool (FAISS releases the GIL while searching) and merge the
+        per-shard top-k lists with a heap.
+
+        Args:
+            search_workers: Threads used to search shards in parallel (defaults to the CPU count, at most 8)
+            **shard_config: VectorStore arguments for new shards (index_type, metric, ...);
+                loaded shards keep the configuration they were saved with
+        """
+        self.shard_config = shard_config
+        # Validate the configuration up front rather than on the first add
+        VectorStore(**shard_config)
+        self.shards: Dict[str, VectorStore] = {}
+        self.search_workers = search_workers or min(os.cpu_count() or 1, 8)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._persist_lock = threading.Lock()
+        # Shard generations as last written to or read from the shard manifest
+        self._shard_generations: Dict[str, int] = {}
+        self.generation = 0
+        self.last_load_seconds = 0.0
+
+    def _new_shard(self) -> VectorStore:
+        return VectorStore(**self.shard_config)
+
+    def _map_shards(self, function, shards: List[VectorStore]) -> List[Any]:
+        """Run function on each shard, in parallel when there is more than one"""
+        if len(shards) <= 1:
+            return [function(shard) for shard in shards]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.search_workers, thread_name_prefix="vector-shard")
+        return list(self._executor.map(function, shards))
+
+    def add_embeddings(self, embeddings: List[List[float]], chunks: List[Dict[str, Any]]):
+        """
+        Add embeddings and their corresponding chunks to the shards of their domains.
+
+        Args:
+            embeddings: List of embedding vectors
+            chunks: List of chunk metadata corresponding to embeddings
+
+        Returns:
+            The vector ids assigned to the chunks, in order; ids are unique within a domain
+        """
+        if len(embeddings) != len(chunks):
+            raise ValueError("Number of embeddings must match number of chunks")
+        ids: List[int] = [0] * len(chunks)
+        by_domain: Dict[str, List[int]] = {}
+        for i, chunk in enumerate(chunks):
+            by_domain.setdefault(chunk_domain(chunk), []).append(i)
+        for domain, positions in by_domain.items():
+            shard = self.shards.get(domain)
+            if shard is None:
+                shard = self.shards[domain] = self._new_shard()
+                logger.info(f"Created vector store shard for domain '{domain}'")
+            shard_ids = shard.add_embeddings([embeddings[i] for i in positions], [chunks[i] for i in positions])
+            for position, vector_id in zip(positions, shard_ids):
+                ids[position] = vector_id
+        return ids
+
+    def update_extra(self, domain: str, updates: Dict[int, Dict[str, Any]]):
+        """Merge fields into the extra metadata of chunks of a domain (see VectorStore.update_extra)"""
+        shard = self.shards.get(domain)
+        if shard is not None:
+            shard.update_extra(updates)
+
+    def search(self, query_embedding: List[float], top_k: int = 10, content_type_filter: str = None, domain_filter: str = None,
+               min_score: Optional[float] = None, query_text: Optional[str] = None) -> List[SearchHit]:
+        """Same contract as VectorStore.search, over all shards or only the domain_filter shard"""
+        query_texts = [query_text] if query_text is not None else None
+        return self.search_batch([query_embedding], top_k, content_type_filter, domain_filter, min_score, query_texts)[0]
+
+    def search_batch(self, query_embeddings: Any, top_k: int = 10, content_type_filter: str = None,
+                     domain_filter: str = None, min_score: Union[None, float, List[Optional[float]]] = None,
+                     query_texts: Optional[List[str]] = None) -> List[List[SearchHit]]:
+        """
+        Same contract as VectorStore.search_batch. Each shard returns its own top_k per query
+        and the lists are merged by score, so dense results equal those of a single index.
+        Fusion scores depend only on ranks within a list, so they cannot be compared across
+        shards: hybrid searches instead merge the shards' dense candidates by similarity and
+        their BM25 matches by BM25 score, and fuse the two merged lists once.
+        vector_id values are only unique within a domain.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        count = len(queries) if queries.ndim == 2 else 1
+        if domain_filter is not None:
+            shard = self.shards.get(domain_filter)
+            if shard is None:
+                return [[] for _ in range(count)]
+            return shard.search_batch(queries, top_k, content_type_filter, None, min_score, query_texts)
+        shards = [shard for shard in self.shards.values() if not shard.is_empty()]
+        if not shards:
+            logger.warning("Vector store is empty")
+            return [[] for _ in range(count)]
+        if len(shards) == 1:
+            return shards[0].search_batch(queries, top_k, content_type_filter, None, min_score, query_texts)
+        if query_texts is not None:
+            return self._hybrid_search_batch(shards, queries, top_k, content_type_filter, min_score, query_texts)
+
+        per_shard = self._map_shards(
+            lambda shard: shard.search_batch(queries, top_k, content_type_filter, None, min_score), shards
+        )
+        results = []
+        for query_hits in zip(*per_shard):
+            merged = islice(heapq.merge(*query_hits, key=lambda hit: -hit.similarity_score), top_k)
+            results.append([SearchHit(hit.record, hit.similarity_score, rank)
+                            for rank, hit in enumerate(merged, start=1)])
+        return results
+
+    def _hybrid_search_batch(self, shards: List[VectorStore], queries: np.ndarray, top_k: int,
+                             content_type_filter: Optional[str], min_score: Union[None, float, List[Optional[float]]],
+                             query_texts: List[str]) -> List[List[SearchHit]]:
+        per_shard = self._map_shards(
+            lambda shard: shard.hybrid_candidates(queries, query_texts, top_k, content_type_filter), shards
+        )
+        fetch_k = VectorStore.hybrid_fetch_k(top_k)
+        settings = shards[0]
+        selected = []
+        for query, cutoff in enumerate(query_cutoffs(min_score, len(query_texts))):
+            # Candidates are keyed by (shard position, vector id)
+            dense = heapq.merge(*([((s, i), score) for i, score in candidates[query][0]]
+                                  for s, candidates in enumerate(per_shard)), key=lambda item: -item[1])
+            lexical = heapq.merge(*([((s, i), bm25, score) for i, bm25, score in candidates[query][1]]
+                                    for s, candidates in enumerate(per_shard)), key=lambda item: -item[1])
+            selected.append(fuse_hybrid(list(islice(dense, fetch_k)), list(islice(lexical, fetch_k)),
+                                        settings.rrf_k, top_k, cutoff, settings.lexical_min_score))
+
+        wanted: Dict[int, Set[int]] = {}
+        for hits in selected:
+            for (s, chunk_id), _, _ in hits:
+                wanted.setdefault(s, set()).add(chunk_id)
+        records = {s: shards[s].get_records(sorted(ids)) for s, ids in wanted.items()}
+        results = []
+        for hits in selected:
+            query_hits = []
+            for (s, chunk_id), score, fusion in hits:
+                if chunk_id in records[s]:
+                    query_hits.append(SearchHit(records[s][chunk_id], score, len(query_hits) + 1, fusion))
+            results.append(query_hits)
+        return results
+
+    def begin_lexical_builds(self) -> List[LexicalIndexBuild]:
+        """Pending builds of the shard BM25 indexes that a load left unbuilt (see VectorStore.begin_lexical_build)"""
+        return [build for build in (shard.begin_lexical_build() for shard in self.shards.values()) if build is not None]
+
+    def clear_store(self):
+        """Clear all data from the vector store"""
+        for shard in self.shards.values():
+            shard.clear_store()
+        self.shards = {}
+        self._shard_generations = {}
+        logger.info("Sharded vector store cleared")
+
+    def get_size(self) -> int:
+        """Get the number of stored chunks"""
+        return sum(shard.get_size() for shard in self.shards.values())
+
+    def is_empty(self) -> bool:
+        """Check if the vector store is empty"""
+        return all(shard.is_empty() for shard in self.shards.values())
+
+    def get_structure_info(self) -> dict:
+        """Return structure information about the stored chunks."""
+        content_types: Dict[str, int] = {}
+        for shard in self.shards.values():
+            for ctype, ids in shard.content_type_ids.items():
+                content_types[ctype] = content_types.get(ctype, 0) + len(ids)
+        return {
+            'total_chunks': self.get_size(),
+            'content_types': content_types,
+            'domains': {domain: shard.get_size() for domain, shard in self.shards.items()},
+            'shards': len(self.shards)
+        }
+
+    def get_domains(self) -> List[str]:
+        """Return the domains that have chunks in the store"""
+        return sorted(domain for domain, shard in self.shards.items() if not shard.is_empty())
+
+    def delete_urls(self, domain: str, urls: List[str]) -> int:
+        """Delete the chunks of the given pages of a domain (see VectorStore.delete_urls)"""
+        shard = self.shards.get(domain)
+        return shard.delete_urls(urls) if shard is not None else 0
+
+    def delete_site(self, domain: str):
+        """
+        Delete a domain by dropping its shard. Its files are removed on the next save.
+
+        Args:
+            domain: The domain to delete from the store.
+        """
+        shard = self.shards.pop(domain, None)
+        if shard is None:
+            logger.info(f"No chunks found for domain '{domain}' to delete.")
+            return
+        count = shard.get_size()
+        shard.wait_for_compaction()
+        shard.clear_store()
+        logger.info(f"Deleted {count} chunks for domain '{domain}' from vector store.")
+
+    def wait_for_compaction(self):
+        """Block until running background compactions of all shards have finished"""
+        for shard in self.shards.values():
+            shard.wait_for_compaction()
+
+    def save_to_disk(self, path: str):
+        """
+        Persist every shard in its own directory under <path>/shards, then replace the
+        shard manifest naming them. Shards save incrementally (see VectorStore.save_to_disk),
+        so an unchanged shard costs one manifest read. Directories of dropped shards are
+        removed once the manifest no longer names them.
+        """
+        shards_path = os.path.join(path, SHARDS_DIR)
+        os.makedirs(shards_path, exist_ok=True)
+        with self._persist_lock:
+            entries = {}
+            for domain, shard in self.shards.items():
+                name = shard_dir_name(domain)
+                shard.save_to_disk(os.path.join(shards_path, name))
+                entries[domain] = {'dir': name, 'generation': shard.generation}
+            previous = read_shards_manifest(path)
+            generations = {domain: entry['generation'] for domain, entry in entries.items()}
+            if previous is not None and generations == {d: e['generation'] for d, e in previous['shards'].items()}:
+                self.generation = previous['generation']
+            else:
+                self.generation = max(self.generation, (previous or {}).get('generation', 0)) + 1
+                manifest = {'generation': self.generation, 'shards': entries}
+
+                def write(tmp_path: str):
+                    with open(tmp_path, "w") as f:
+                        json.dump(manifest, f)
+                _atomic_write(os.path.join(path, SHARDS_MANIFEST_FILE), write)
+            self._shard_generations = generations
+            referenced = {entry['dir'] for entry in entries.values()}
+            for name in os.listdir(shards_path):
+                if name not in referenced:
+                    shutil.rmtree(os.path.join(shards_path, name), ignore_errors=True)
+        logger.info(f"Sharded vector store saved to {path} (generation {self.generation}, {len(entries)} shards)")
+
+    def _load_shard(self, path: str, domain: str, entry: Dict[str, Any]) -> VectorStore:
+        shard = self._new_shard()
+        shard.load_from_disk(os.path.join(path, SHARDS_DIR, entry['dir']))
+        self._shard_generations[domain] = shard.generation
+        return shard
+
+    def _migrate_unsharded(self, path: str):
+        """Split a single-index store (any older layout) into per-domain shards"""
+        store = self._new_shard()
+        store.load_from_disk(path)
+        logger.info(f"Splitting vector store at {path} into {len(store.domain_ids)} per-domain shards")
+        ids, vectors = store._stored_vectors()
+        rows = {chunk_id: row for row, chunk_id in enumerate(ids.tolist())}
+        self.shard_config = {**self.shard_config, 'index_type': store.index_type, 'metric': store.metric}
+        for domain, domain_ids in store.domain_ids.items():
+            domain_ids = sorted(domain_ids)
+            records = store.get_records(domain_ids)
+            self.add_embeddings(vectors[[rows[i] for i in domain_ids]], [records[i].to_dict() for i in domain_ids])
+        store.clear_store()
+        self.save_to_disk(path)
+        for name in os.listdir(path):
+            if _DATA_FILE_PATTERN.match(name) or name == MANIFEST_FILE or name.startswith(METADATA_FILE):
+                os.remove(os.path.join(path, name))
+
+    def load_from_disk(self, path: str, read_only: bool = False):
+        """
+        Load every shard named by the shard manifest at path. A store saved before sharding
+        is split into shards and rewritten on first load.
+
+        Args:
+            path: Store directory
+            read_only: Load as a reader of a store another process writes: a store saved
+                before sharding is left for the writer to split, and nothing is loaded until
+                the shard manifest exists
+        """
+        started = time.perf_counter()
+        try:
+            self.clear_store()
+            manifest = read_shards_manifest(path)
+            if manifest is None:
+                if read_manifest(path) is None and not os.path.exists(f"{path}_chunks.pkl"):
+                    logger.info(f"No vector store found at {path}")
+                    return
+                if read_only:
+                    logger.info(f"Vector store at {path} is not sharded yet; waiting for its writer to split it")
+                    return
+                self._migrate_unsharded(path)
+            else:
+                for domain, entry in manifest['shards'].items():
+                    self.shards[domain] = self._load_shard(path, domain, entry)
+                self.generation = manifest['generation']
+            self.last_load_seconds = time.perf_counter() - started
+            logger.info(f"Loaded {len(self.shards)} vector store shards with {self.get_size()} chunks from {path} "
+                        f"(generation {self.generation}) in {self.last_load_seconds:.3f}s")
+        except Exception as e:
+            logger.error(f"Failed to load sharded vector store from disk: {e}")
+            self.clear_store()
+
+    def refresh_from_disk(self, path: str) -> str:
+        """
+        Bring a read-only copy up to date with what another process saved. Only the shard
+        manifest is read when nothing changed; otherwise only shards whose generation moved
+        are refreshed, new shards are loaded and dropped shards are released.
+
+        Returns:
+            'unchanged', 'incremental' or 'reloaded' (the most expensive outcome of any shard)
+        """
+        manifest = read_shards_manifest(path)
+        if manifest is None:
+            # Without a shard manifest there is nothing a reader can load (see load_from_disk)
+            if self.shards:
+                self.load_from_disk(path, read_only=True)
+                return 'reloaded'
+            return 'unchanged'
+        if manifest['generation'] == self.generation:
+            return 'unchanged'
+        outcomes = set()
+        for domain in set(self.shards) - set(manifest['shards']):
+            self.shards.pop(domain).clear_store()
+            self._shard_generations.pop(domain, None)
+            outcomes.add('incremental')
+        for domain, entry in manifest['shards'].items():
+            shard = self.shards.get(domain)
+            if shard is None:
+                self.shards[domain] = self._load_shard(path, domain, entry)
+                outcomes.add('reloaded')
+            elif self._shard_generations.get(domain) != entry['generation']:
+                outcomes.add(shard.refresh_from_disk(os.path.join(path, SHARDS_DIR, entry['dir'])))
+                self._shard_generations[domain] = shard.generation
+        self.generation = manifest['generation']
+        for outcome in ('reloaded', 'incremental'):
+            if outcome in outcomes:
+                return outcome
+        return 'unchanged'
@@ -6,55 +6,85 @@ import asyncio
 import logging
 import os
 import json
+import time
 from typing import Dict, Any, List, Optional
 from livekit import api, rtc
 from livekit.agents import Agent, AgentSession, JobContext, function_tool
 from livekit.plugins import openai, silero
-from backend.vector_store import VectorStore
+from backend.sharded_store import ShardedVectorStore
 from backend.embeddings import EmbeddingService
+from backend.embedding_cache import EmbeddingCache
 
-# Use the shared services set by set_services
+# Use the shared services set by set_services, or the ones loaded on the first lookup
 vector_store = None
 embedding_service = None
+# True when the store is the API's live instance, which is always current and must not be reloaded
+shared_vector_store = False
 
 VECTOR_STORE_PATH_PREFIX = os.getenv("VECTOR_STORE_PATH_PREFIX", "vector_store_data")
 
+# Per-turn retrieval counters; reload_seconds_skipped estimates the disk loads avoided
+retrieval_stats = {
+    'turns': 0,
+    'unchanged': 0,
+    'incremental': 0,
+    'reloaded': 0,
+    'reload_seconds_skipped': 0.0
+}
+
 def set_services(vs, es):
-    global vector_store, embedding_service
+    global vector_store, embedding_service, shared_vector_store
     vector_store = vs
     embedding_service = es
-
-# Load from disk if not set
-if vector_store is None:
-    vector_store = VectorStore()
-    vector_store.load_from_disk(VECTOR_STORE_PATH_PREFIX)
-if embedding_service is None:
-    embedding_service = EmbeddingService()
+    shared_vector_store = True
 
 logger = logging.getLogger(__name__)
 
+def _ensure_services():
+    """Load the store from disk and create the embedding service if set_services was not called"""
+    global vector_store, embedding_service
+    if vector_store is None:
+        vector_store = ShardedVectorStore()
+        vector_store.load_from_disk(VECTOR_STORE_PATH_PREFIX, read_only=True)
+    if embedding_service is None:
+        embedding_service = EmbeddingService(cache=EmbeddingCache(os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")))
+
+def refresh_vector_store():
+    """Pick up data the API saved since the last turn, reading only the manifest if there is none"""
+    retrieval_stats['turns'] += 1
+    if shared_vector_store:
+        return
+    started = time.perf_counter()
+    outcome = vector_store.refresh_from_disk(VECTOR_STORE_PATH_PREFIX)
+    retrieval_stats[outcome] += 1
+    if outcome == 'unchanged':
+        skipped = max(vector_store.last_load_seconds - (time.perf_counter() - started), 0.0)
+        retrieval_stats['reload_seconds_skipped'] += skipped
+        logger.info(f"Vector store unchanged (generation {vector_store.generation}); skipped a "
+                    f"{vector_store.last_load_seconds * 1000:.1f}ms reload "
+                    f"({retrieval_stats['reload_seconds_skipped']:.2f}s over {retrieval_stats['turns']} turns)")
+
 async def get_website_context(question: str, top_k: int = 5):
-    # Always reload the vector store from disk to get the latest data
-    global vector_store
-    vector_store.load_from_disk(VECTOR_STORE_PATH_PREFIX)
     logger.info(f"get_website_context called with question: {question}")
     print(f"get_website_context called with question: {question}")
-    if not vector_store:
-        logger.error("Vector store is not set. Did you call set_services?")
-        return "No website content is currently available."
-    if not embedding_service:
-        logger.error("Embedding service is not set. Did you call set_services?")
-        return "No website content is currently available."
-    if vector_store.is_empty():
-        logger.warning("Vector store is empty.")
-        return "No website content is currently available."
     try:
-        question_embedding = await embedding_service.generate_embeddings([question])
-        logger.info(f"Generated embedding for question: {question} -> {question_embedding}")
-        if not question_embedding:
+        _ensure_services()
+        refresh_vector_store()
+        if not vector_store:
+            logger.error("Vector store is not set. Did you call set_services?")
+            return "No website content is currently available."
+        if not embedding_service:
+            logger.error("Embedding service is not set. Did you call set_services?")
+            return "No website content is currently available."
+        if vector_store.is_empty():
+            logger.warning("Vector store is empty.")
+            return "No website content is currently available."
+        question_embedding = (await embedding_service.embed_batch([question]))[0]
+        if question_embedding is None:
             logger.warning("Failed to generate embeddings for the question.")
             return "Unable to process your question."
-        relevant_chunks = vector_store.search(question_embedding[0], top_k=top_k)
+        logger.info(f"Generated embedding for question: {question}")
+        relevant_chunks = vector_store.search(question_embedding, top_k=top_k)
         logger.info(f"Relevant chunks found: {relevant_chunks}")
         if not relevant_chunks:
             logger.info("No relevant content found for the question.")
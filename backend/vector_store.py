@@ -1,24 +1,593 @@
 import numpy as np
 import faiss
+import json
 import logging
+import os
 import pickle
-from typing import List, Dict, Any, Optional
+import re
+import threading
+import time
+from typing import List, Dict, Any, Hashable, Optional, Set, Tuple, Union
+from backend.chunk_metadata import ChunkMetadataStore
+from backend.chunk_records import ChunkRecord, SearchHit, chunk_domain
+from backend.lexical_index import BM25Index
 
 logger = logging.getLogger(__name__)
 
+INDEX_TYPES = ('flat', 'hnsw', 'ivfpq', 'ivfsq')
+# 'cosine': inner product over L2-normalized vectors; 'l2': Euclidean distance on raw vectors
+METRICS = ('cosine', 'l2')
+
+# On-disk layout version written to the manifest; version 1 was the <prefix>_*.faiss/.pkl files,
+# version 2 a single snapshot without segments
+FORMAT_VERSION = 3
+MANIFEST_FILE = 'manifest.json'
+METADATA_FILE = 'metadata.sqlite3'
+# Stored vectors scored per step of an exact scan, bounding the temporary score matrix
+_SCAN_BLOCK_ROWS = 65536
+# Data files a store directory may contain; anything matching that no manifest names is garbage
+_DATA_FILE_PATTERN = re.compile(r'^(vectors|ids|index|segment|tombstones)-\d+\.(f32|i64|faiss)(\.tmp)?$')
+
+def _atomic_write(path: str, write):
+    """Write a file through a temporary name so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+# Per-query hybrid candidates: dense (key, similarity) and BM25 (key, bm25 score, similarity), best first
+HybridCandidates = Tuple[List[Tuple[Hashable, float]], List[Tuple[Hashable, float, float]]]
+
+def fuse_hybrid(dense: List[Tuple[Hashable, float]], lexical: List[Tuple[Hashable, float, float]], rrf_k: int,
+                top_k: int, min_score: Optional[float] = None,
+                lexical_min_score: Optional[float] = None) -> List[Tuple[Hashable, float, float]]:
+    """
+    Reciprocal rank fusion of a dense and a BM25 candidate list.
+
+    min_score applies to the similarity of every fused hit. A lexical match only bypasses it
+    when its BM25 score reaches lexical_min_score, so sharing a common word with the query
+    is not enough to pass the similarity gate.
+
+    Returns:
+        Up to top_k (key, similarity, fusion score) tuples, best first
+    """
+    fused: Dict[Hashable, float] = {}
+    similarity: Dict[Hashable, float] = {}
+    strong: Set[Hashable] = set()
+    for rank, (key, score) in enumerate(dense, start=1):
+        fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+        similarity[key] = score
+    for rank, (key, bm25, score) in enumerate(lexical, start=1):
+        fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+        similarity[key] = score
+        if lexical_min_score is not None and bm25 >= lexical_min_score:
+            strong.add(key)
+    chosen = [key for key in sorted(fused, key=fused.get, reverse=True)
+              if min_score is None or similarity[key] >= min_score or key in strong][:top_k]
+    return [(key, similarity[key], fused[key]) for key in chosen]
+
+def query_cutoffs(min_score: Union[None, float, List[Optional[float]]], count: int) -> List[Optional[float]]:
+    """Expand a min_score argument (one cutoff, or one per query) to a list of per-query cutoffs"""
+    if isinstance(min_score, (list, tuple)):
+        if len(min_score) != count:
+            raise ValueError("Number of min_score values must match number of query embeddings")
+        return list(min_score)
+    return [min_score] * count
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """Return the manifest of a store directory, or None if there is none"""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+class LexicalIndexBuild:
+    """
+    A BM25 index build over the chunks a VectorStore held when the build began. run() reads
+    only that snapshot and the metadata database, so it can run in a worker thread; writes
+    made to the store in the meantime are queued and replayed by install().
+    """
+
+    def __init__(self, store: 'VectorStore'):
+        self.store = store
+        self.live_ids = set(store._rows)
+        self.unsaved = [(chunk_id, record.text) for chunk_id, record in store._records.items()]
+        self.metadata = store._metadata
+        # (added (id, text) pairs, removed ids) of each write made since the build began
+        self.backlog: List[Tuple[List[Tuple[int, str]], Set[int]]] = []
+        self.index: Optional[BM25Index] = None
+
+    def run(self):
+        started = time.perf_counter()
+        lexical = BM25Index()
+        unsaved_ids = {chunk_id for chunk_id, _ in self.unsaved}
+        if self.metadata is not None:
+            for rows in self.metadata.iter_texts():
+                lexical.add_many((chunk_id, text) for chunk_id, text in rows
+                                 if chunk_id in self.live_ids and chunk_id not in unsaved_ids)
+        lexical.add_many(self.unsaved)
+        self.index = lexical
+        logger.info(f"Built lexical index over {len(lexical)} chunks in {time.perf_counter() - started:.2f}s")
+
+    def install(self):
+        """Replay the queued writes and make the index the store's, unless the store was cleared or reloaded since"""
+        if self.index is None or self.store._lexical_build is not self:
+            return
+        for added, removed in self.backlog:
+            self.index.add_many(added)
+            self.index.remove_many(removed)
+        self.store._lexical, self.store._lexical_build = self.index, None
+
+
 class VectorStore:
-    def __init__(self):
-        """Initialize FAISS vector store"""
+    def __init__(self, index_type: str = 'flat', hnsw_m: int = 32, ef_construction: int = 200, ef_search: int = 64,
+                 nlist: int = 1024, nprobe: int = 16, pq_m: int = 96, sq_type: str = '8bit', min_train_size: int = 10_000,
+                 max_segments: int = 8, metric: str = 'cosine', exact_filter_size: int = 4096, rrf_k: int = 60,
+                 lexical_min_score: Optional[float] = None):
+        """
+        Initialize FAISS vector store
+
+        Args:
+            index_type: 'flat' (exact), 'hnsw', 'ivfpq' (IVF with product quantization) or 'ivfsq' (IVF with scalar quantization)
+            hnsw_m: HNSW graph degree
+            ef_construction: HNSW build-time candidate list size
+            ef_search: HNSW query-time candidate list size
+            nlist: Maximum number of IVF clusters (reduced for small corpora)
+            nprobe: Number of IVF clusters visited per query
+            pq_m: Number of PQ sub-quantizers (must divide the dimension)
+            sq_type: Scalar quantizer type for 'ivfsq' ('8bit', '6bit', '4bit' or 'fp16')
+            min_train_size: Number of vectors needed before an IVF index is trained;
+                until then searches scan the stored vectors exactly
+            max_segments: Number of append-only segments on disk that triggers a background compaction
+            metric: 'cosine' or 'l2'; loaded stores keep the metric they were built with
+            exact_filter_size: Filtered searches matching at most this many chunks scan their
+                vectors exactly instead of searching the index with an id selector
+            rrf_k: Reciprocal rank fusion constant for hybrid dense + BM25 searches
+            lexical_min_score: BM25 score from which a hybrid match is kept even when its
+                similarity is below min_score (None: min_score applies to every hit)
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}")
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}")
+        # FAISS index keyed by stable 64-bit chunk ids rather than insertion position. Flat stores
+        # and IVF stores that are not trained yet have none: they scan the stored vectors
         self.index: Optional[faiss.Index] = None
-        self.chunks: List[Dict[str, Any]] = []
+        # Records not yet written to the metadata database; saved records are read from it on demand
+        self._records: Dict[int, ChunkRecord] = {}
+        self._metadata: Optional[ChunkMetadataStore] = None
+        self._path: Optional[str] = None
+        self._deleted_since_save: Set[int] = set()
+        self.generation = 0
+        # Base snapshot and segment generations the in-memory state was loaded from or saved as
+        self._loaded_base: Optional[Dict[str, Any]] = None
+        self._loaded_segments: List[int] = []
+        self.last_load_seconds = 0.0
+        self.max_segments = max_segments
+        # True when the index was rebuilt since the last snapshot, so segments alone cannot describe it
+        self._snapshot_stale = True
+        self._persist_lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        # Files a running compaction is writing, which no manifest names yet
+        self._compaction_files: Set[str] = set()
+        # Embeddings of the loaded base snapshot, memory-mapped read-only; deleted rows are only marked dead
+        self._base_vectors = np.empty((0, 1536), dtype=np.float32)
+        self._base_ids = np.empty(0, dtype=np.int64)
+        self._base_live = np.empty(0, dtype=bool)
+        self._base_dead = 0
+        # Embeddings added since, as rows of one owned float32 matrix grown by doubling
+        self._tail_vectors = np.empty((0, 1536), dtype=np.float32)
+        self._tail_ids = np.empty(0, dtype=np.int64)
+        self._tail_size = 0
+        # Chunk id -> row: base rows first, then tail rows numbered on from the base count
+        self._rows: Dict[int, int] = {}
+        self.domain_ids: Dict[str, Set[int]] = {}
+        self.content_type_ids: Dict[str, Set[int]] = {}
+        self._next_id = 0
+        # Ids removed from an index type without remove support (HNSW); filtered out at search time
+        self._deleted_ids: Set[int] = set()
+        # Id bitmaps of (domain, content_type) filters, dropped whenever ids are added or removed
+        self._filter_bitmaps: Dict[Tuple[Optional[str], Optional[str]], Tuple[np.ndarray, int]] = {}
+        self.exact_filter_size = exact_filter_size
+        # BM25 index over chunk text, kept up to date on writes; None after a load until the first
+        # hybrid search needs it, so loading never reads the text of every chunk
+        self._lexical: Optional[BM25Index] = BM25Index()
+        self._lexical_build: Optional[LexicalIndexBuild] = None
+        self.rrf_k = rrf_k
+        self.lexical_min_score = lexical_min_score
         self.dimension = 1536  # OpenAI text-embedding-3-small dimension
-        
+        self.index_type = index_type
+        self.metric = metric
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.sq_type = sq_type
+        self.min_train_size = min_train_size
+        # False while an IVF store still searches its stored vectors exactly
+        self.trained = index_type in ('flat', 'hnsw')
+        # Fraction of tombstoned ids in an HNSW index that triggers a rebuild
+        self.max_deleted_fraction = 0.2
+
+    def _build_index(self, index_type: str, train_vectors: Optional[np.ndarray] = None) -> faiss.Index:
+        """Create an empty FAISS index of the given type, training it on train_vectors if needed"""
+        faiss_metric = faiss.METRIC_INNER_PRODUCT if self.metric == 'cosine' else faiss.METRIC_L2
+        if index_type == 'flat':
+            return faiss.IndexFlat(self.dimension, faiss_metric)
+        if index_type == 'hnsw':
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss_metric)
+            index.hnsw.efConstruction = self.ef_construction
+            index.hnsw.efSearch = self.ef_search
+            return index
+        # IVF variants: roughly 39 training points per cluster keeps k-means well conditioned
+        nlist = max(1, min(self.nlist, len(train_vectors) // 39))
+        quantizer = faiss.IndexFlat(self.dimension, faiss_metric)
+        if index_type == 'ivfpq':
+            index = faiss.IndexIVFPQ(quantizer, self.dimension, nlist, self.pq_m, 8, faiss_metric)
+        else:
+            qtype = getattr(faiss.ScalarQuantizer, f"QT_{self.sq_type}")
+            index = faiss.IndexIVFScalarQuantizer(quantizer, self.dimension, nlist, qtype, faiss_metric)
+        index.train(train_vectors)
+        index.nprobe = min(self.nprobe, nlist)
+        return index
+
+    def _prepare_vectors(self, vectors: Any) -> np.ndarray:
+        """Convert to a fresh float32 matrix, L2-normalized in cosine mode"""
+        array = np.array(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if self.metric == 'cosine':
+            faiss.normalize_L2(array)
+        return array
+
+    def _exact_scores(self, query: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """
+        Similarity of a prepared query to stored vectors, computed exactly from the matrix so
+        scores do not depend on the index's quantization. Higher is better: cosine similarity,
+        or 1 - d²/2 in l2 mode (which equals cosine similarity for unit-length embeddings).
+        """
+        vectors = self._row_vectors(np.array([self._rows[chunk_id] for chunk_id in ids.tolist()], dtype=np.int64))
+        if self.metric == 'cosine':
+            return vectors @ query
+        return 1.0 - 0.5 * np.square(vectors - query).sum(axis=1)
+
+    def _exact_scores_batch(self, queries: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Exact scores of an (n, k) id matrix against n prepared queries; -inf where there is no vector"""
+        rows = np.fromiter((self._rows.get(chunk_id, -1) for chunk_id in ids.ravel().tolist()),
+                           dtype=np.int64, count=ids.size).reshape(ids.shape)
+        valid = rows >= 0
+        vectors = self._row_vectors(np.where(valid, rows, 0).ravel()).reshape(*ids.shape, self.dimension)
+        if self.metric == 'cosine':
+            scores = np.einsum('nkd,nd->nk', vectors, queries)
+        else:
+            scores = 1.0 - 0.5 * np.square(vectors - queries[:, None, :]).sum(axis=2)
+        scores[~valid] = -np.inf
+        return scores
+
     def _create_index(self):
-        """Create a new FAISS index"""
-        # Use L2 (Euclidean) distance for similarity
-        self.index = faiss.IndexFlatL2(self.dimension)
-        logger.info(f"Created FAISS index with dimension {self.dimension}")
-    
+        """
+        Create a new FAISS index. A flat index would only duplicate the stored vectors, so flat
+        stores scan those instead, as do IVF stores until they have enough vectors to train.
+        """
+        if self.index_type == 'hnsw':
+            self.index = self._with_ids(self._build_index('hnsw'))
+            logger.info(f"Created FAISS {self.index_type} index with dimension {self.dimension}")
+        else:
+            self.index = None
+            self.trained = self.index_type == 'flat'
+        self._deleted_ids = set()
+        self._snapshot_stale = True
+
+    def _scans_vectors(self) -> bool:
+        """True when searches scan the stored vectors rather than a FAISS index"""
+        return self.index_type == 'flat' or not self.trained
+
+    @staticmethod
+    def _with_ids(index: faiss.Index) -> faiss.Index:
+        """Make an index addressable by chunk id. IVF indexes store ids natively (and an id map
+        around them would go out of sync on removal); flat and HNSW indexes need an IndexIDMap2."""
+        if isinstance(index, faiss.IndexIVF):
+            return index
+        return faiss.IndexIDMap2(index)
+
+    def _base_index(self) -> Optional[faiss.Index]:
+        """The index doing the search, unwrapped from any id map"""
+        if isinstance(self.index, faiss.IndexIDMap):
+            return faiss.downcast_index(self.index.index)
+        return self.index
+
+    def _stored_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the ids and vectors of all live chunks. The vectors are a view when they all sit
+        in the base or all in the tail, and a copy otherwise.
+        """
+        tail_ids, tail = self._tail_ids[:self._tail_size], self._tail_vectors[:self._tail_size]
+        if not len(self._base_ids):
+            return tail_ids.copy(), tail
+        if not self._tail_size and not self._base_dead:
+            return self._base_ids.copy(), self._base_vectors
+        live = self._base_live
+        return (np.concatenate([self._base_ids[live], tail_ids]),
+                np.concatenate([self._base_vectors[live], tail]))
+
+    def _row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Copy the vectors of the given rows out of the base and the tail"""
+        base_count = len(self._base_ids)
+        in_base = rows < base_count
+        if in_base.all():
+            return self._base_vectors[rows]
+        if not in_base.any():
+            return self._tail_vectors[rows - base_count]
+        vectors = np.empty((len(rows), self.dimension), dtype=np.float32)
+        vectors[in_base] = self._base_vectors[rows[in_base]]
+        vectors[~in_base] = self._tail_vectors[rows[~in_base] - base_count]
+        return vectors
+
+    def _map_base(self, path: str, base: Dict[str, Any]):
+        """Use the vector and id files of a base snapshot as the base rows, with an empty tail"""
+        count = base['count']
+        if count:
+            self._base_vectors = np.memmap(os.path.join(path, base['vectors']), dtype=np.float32, mode='r',
+                                           shape=(count, self.dimension))
+        else:
+            self._base_vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._base_ids = np.fromfile(os.path.join(path, base['ids']), dtype=np.int64)
+        self._base_live = np.ones(count, dtype=bool)
+        self._base_dead = 0
+        self._tail_vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._tail_ids = np.empty(0, dtype=np.int64)
+        self._tail_size = 0
+        self._rows = dict(zip(self._base_ids.tolist(), range(count)))
+
+    def _append_vectors(self, ids: np.ndarray, vectors: np.ndarray):
+        """Add rows to the tail; the memory-mapped base is never copied"""
+        size = self._tail_size
+        needed = size + len(ids)
+        if needed > len(self._tail_vectors):
+            capacity = max(needed, 2 * len(self._tail_vectors), 1024)
+            grown = np.empty((capacity, self.dimension), dtype=np.float32)
+            grown[:size] = self._tail_vectors[:size]
+            grown_ids = np.empty(capacity, dtype=np.int64)
+            grown_ids[:size] = self._tail_ids[:size]
+            self._tail_vectors, self._tail_ids = grown, grown_ids
+        self._tail_vectors[size:needed] = vectors
+        self._tail_ids[size:needed] = ids
+        first_row = len(self._base_ids) + size
+        for offset, chunk_id in enumerate(ids.tolist()):
+            self._rows[chunk_id] = first_row + offset
+        self._tail_size = needed
+
+    def _drop_vectors(self, ids: Set[int]):
+        """
+        Remove rows in O(k): base rows are marked dead, and a tail row is replaced by the
+        last tail row
+        """
+        base_count = len(self._base_ids)
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id)
+            if row < base_count:
+                self._base_live[row] = False
+                self._base_dead += 1
+                continue
+            last = self._tail_size - 1
+            if row - base_count != last:
+                moved_id = int(self._tail_ids[last])
+                self._tail_vectors[row - base_count] = self._tail_vectors[last]
+                self._tail_ids[row - base_count] = moved_id
+                self._rows[moved_id] = row
+            self._tail_size = last
+
+    def get_vector(self, chunk_id: int) -> np.ndarray:
+        """Return the stored embedding of a chunk"""
+        row = self._rows[chunk_id]
+        base_count = len(self._base_ids)
+        return self._base_vectors[row] if row < base_count else self._tail_vectors[row - base_count]
+
+    def get_records(self, ids: List[int]) -> Dict[int, ChunkRecord]:
+        """Return the records of live chunk ids, reading saved ones from the metadata database"""
+        found = {chunk_id: self._records[chunk_id] for chunk_id in ids if chunk_id in self._records}
+        missing = [chunk_id for chunk_id in ids if chunk_id not in found and chunk_id in self._rows]
+        if missing and self._metadata is not None:
+            found.update(self._metadata.get_many(missing))
+        return found
+
+    def _index_record(self, chunk_id: int, domain: str, content_type: Optional[str]):
+        self._filter_bitmaps.clear()
+        self.domain_ids.setdefault(domain, set()).add(chunk_id)
+        self.content_type_ids.setdefault(content_type or 'unknown', set()).add(chunk_id)
+
+    def _forget_ids(self, ids: Set[int]):
+        """Drop ids from the records, the attribute indexes and the vector matrix"""
+        for chunk_id in ids:
+            if self._records.pop(chunk_id, None) is None:
+                self._deleted_since_save.add(chunk_id)
+        self._unindex_ids(ids)
+        self._drop_vectors(ids)
+
+    def _unindex_ids(self, ids: Set[int]):
+        self._filter_bitmaps.clear()
+        self._lexical_remove(ids)
+        for index in (self.domain_ids, self.content_type_ids):
+            for key in list(index):
+                index[key] -= ids
+                if not index[key]:
+                    del index[key]
+
+    def _rebuild_index(self):
+        """Rebuild the index from the live chunks' vectors"""
+        if not self._rows:
+            self.index = None
+            self._deleted_ids = set()
+            return
+        self._create_index()
+        if self.index_type in ('ivfpq', 'ivfsq') and len(self._rows) >= self.min_train_size:
+            # Below the training size (or 256 vectors for ivfpq) the store keeps scanning its vectors
+            self.train_index()
+        elif self.index is not None:
+            ids, vectors = self._stored_vectors()
+            self.index.add_with_ids(vectors, ids)
+
+    def train_index(self) -> bool:
+        """
+        Train the configured IVF index on the stored vectors and move them into it.
+        Called automatically once min_train_size vectors exist.
+
+        Returns:
+            True if the IVF index was trained; otherwise searches keep scanning the stored vectors
+        """
+        if self.index_type not in ('ivfpq', 'ivfsq'):
+            return False
+        ids, vectors = self._stored_vectors()
+        if len(vectors) == 0:
+            logger.warning("No vectors available to train the index")
+            return False
+        if self.index_type == 'ivfpq' and len(vectors) < 256:
+            # 8-bit PQ codebooks need at least 256 training points
+            logger.warning(f"Not enough vectors ({len(vectors)}) to train an ivfpq index yet")
+            return False
+        started = time.perf_counter()
+        index = self._with_ids(self._build_index(self.index_type, vectors))
+        index.add_with_ids(vectors, ids)
+        self.index = index
+        self._deleted_ids = set()
+        self.trained = True
+        self._snapshot_stale = True
+        logger.info(f"Trained {self.index_type} index on {len(vectors)} vectors in {time.perf_counter() - started:.2f}s")
+        return True
+
+    def set_search_params(self, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+        """Tune query-time accuracy/latency trade-offs (HNSW efSearch, IVF nprobe)"""
+        if ef_search is not None:
+            self.ef_search = ef_search
+        if nprobe is not None:
+            self.nprobe = nprobe
+        self._apply_search_params(self._base_index())
+
+    def _apply_search_params(self, index: Optional[faiss.Index]):
+        if index is None:
+            return
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.ef_search
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = min(self.nprobe, index.nlist)
+
+    def _search_params(self, selector: Optional[faiss.IDSelector]) -> Optional[faiss.SearchParameters]:
+        """Search parameters of the right type for the wrapped index, carrying an id selector"""
+        if selector is None:
+            return None
+        base = self._base_index()
+        if isinstance(base, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=min(self.nprobe, base.nlist))
+        if isinstance(base, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def _live_selector(self) -> Optional[faiss.IDSelector]:
+        """Selector excluding tombstoned ids, or None when there are none"""
+        if not self._deleted_ids:
+            return None
+        deleted = np.fromiter(self._deleted_ids, dtype=np.int64, count=len(self._deleted_ids))
+        return faiss.IDSelectorNot(faiss.IDSelectorBatch(deleted))
+
+    def _filter_ids(self, domain: Optional[str], content_type: Optional[str]) -> Optional[Set[int]]:
+        """Live ids matching the filters, or None when there are no filters"""
+        sets = []
+        if domain is not None:
+            sets.append(self.domain_ids.get(domain, set()))
+        if content_type is not None:
+            sets.append(self.content_type_ids.get(content_type, set()))
+        if not sets:
+            return None
+        return set.intersection(*sets) if len(sets) > 1 else sets[0]
+
+    def _filter_bitmap(self, domain: Optional[str], content_type: Optional[str], ids: Set[int]) -> Tuple[np.ndarray, int]:
+        """Packed bitmap over the id space for a filter and its size in bits, cached until ids change"""
+        key = (domain, content_type)
+        if key not in self._filter_bitmaps:
+            mask = np.zeros(self._next_id, dtype=bool)
+            mask[np.fromiter(ids, dtype=np.int64, count=len(ids))] = True
+            self._filter_bitmaps[key] = (np.packbits(mask, bitorder='little'), self._next_id)
+        return self._filter_bitmaps[key]
+
+    def _filter_selector(self, domain: Optional[str], content_type: Optional[str], ids: Set[int]) -> faiss.IDSelector:
+        """Bitmap selector over the id space for a filter"""
+        bitmap, size = self._filter_bitmap(domain, content_type, ids)
+        selector = faiss.IDSelectorBitmap(size, faiss.swig_ptr(bitmap))
+        # The selector only points at the bitmap; keep the array alive as long as the selector
+        selector.referenced_bitmap = bitmap
+        return selector
+
+    def _candidate_ids(self, queries: np.ndarray, top_k: int, domain: Optional[str] = None,
+                       content_type: Optional[str] = None) -> np.ndarray:
+        """
+        Ids of the top_k index neighbours of each prepared query, -1 where there are fewer.
+        Filters are applied inside the search: small filtered sets are scanned exactly, larger
+        ones are searched through the index with a bitmap id selector.
+        """
+        allowed = self._filter_ids(domain, content_type)
+        if allowed is not None:
+            if not allowed:
+                return np.full((len(queries), top_k), -1, dtype=np.int64)
+            top_k = min(top_k, len(allowed))
+            if len(allowed) <= self.exact_filter_size:
+                candidates = np.fromiter(allowed, dtype=np.int64, count=len(allowed))
+                scores = np.stack([self._exact_scores(query, candidates) for query in queries])
+                best = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+                return candidates[best]
+        if self._scans_vectors():
+            return self._scan_vectors(queries, top_k, domain, content_type, allowed)
+        if allowed is None:
+            _, ids = self.index.search(queries, top_k, params=self._search_params(self._live_selector()))
+            return ids
+        # Tombstoned ids are never in the domain/content-type sets, so the filter excludes them too
+        selector = self._filter_selector(domain, content_type, allowed)
+        _, ids = self.index.search(queries, top_k, params=self._search_params(selector))
+        return ids
+
+    def _scan_vectors(self, queries: np.ndarray, top_k: int, domain: Optional[str], content_type: Optional[str],
+                      allowed: Optional[Set[int]]) -> np.ndarray:
+        """
+        Exact top_k ids of each prepared query over the stored vectors, -1 where there are
+        fewer. The mapped base is scored in blocks straight from the page cache; dead rows and
+        rows outside the filter are skipped.
+        """
+        base_count = len(self._base_ids)
+        id_mask = None
+        if allowed is not None:
+            bitmap, size = self._filter_bitmap(domain, content_type, allowed)
+            id_mask = np.unpackbits(bitmap, count=size, bitorder='little').view(bool)
+        blocks = []
+        for start in range(0, base_count, _SCAN_BLOCK_ROWS):
+            rows = slice(start, min(start + _SCAN_BLOCK_ROWS, base_count))
+            if id_mask is not None:
+                mask = id_mask[self._base_ids[rows]]
+            else:
+                mask = self._base_live[rows] if self._base_dead else None
+            blocks.append((self._base_ids[rows], self._base_vectors[rows], mask))
+        if self._tail_size:
+            tail_ids = self._tail_ids[:self._tail_size]
+            blocks.append((tail_ids, self._tail_vectors[:self._tail_size], id_mask[tail_ids] if id_mask is not None else None))
+
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for ids, vectors, mask in blocks:
+            scores = queries @ vectors.T
+            if self.metric == 'l2':
+                # Same order as the negated squared distance: the query norm is a constant
+                scores = 2 * scores - np.einsum('ij,ij->i', vectors, vectors)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_ids = np.concatenate([best_ids, np.broadcast_to(ids, scores.shape)], axis=1)
+            if best_scores.shape[1] > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+        found = np.full((len(queries), top_k), -1, dtype=np.int64)
+        width = best_ids.shape[1]
+        found[:, :width] = np.where(np.isfinite(best_scores), best_ids, -1)
+        return found
+
     def add_embeddings(self, embeddings: List[List[float]], chunks: List[Dict[str, Any]]):
         """
         Add embeddings and their corresponding chunks to the vector store.
@@ -26,34 +595,95 @@ class VectorStore:
         Args:
             embeddings: List of embedding vectors
             chunks: List of chunk metadata corresponding to embeddings
+
+        Returns:
+            The vector ids assigned to the chunks, in order
         """
         if len(embeddings) != len(chunks):
             raise ValueError("Number of embeddings must match number of chunks")
         
-        if not embeddings:
+        if len(embeddings) == 0:
             logger.warning("No embeddings to add")
-            return
+            return []
         
         # Create index if it doesn't exist
-        if self.index is None:
+        if self.index is None and not self._scans_vectors():
             self._create_index()
         
-        # Convert embeddings to numpy array
-        embeddings_array = np.array(embeddings, dtype=np.float32)
+        # Convert embeddings to numpy array, normalizing once here for cosine similarity
+        embeddings_array = self._prepare_vectors(embeddings)
+        if len(embeddings_array) != len(chunks):
+            raise ValueError(f"Embeddings must have dimension {self.dimension}")
+        ids = np.arange(self._next_id, self._next_id + len(chunks), dtype=np.int64)
+        self._next_id += len(chunks)
         
-        # Attach embeddings to chunks before storing
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk['embedding'] = embedding
+        # Keep compact records for the metadata and the vectors in the shared matrix
+        for chunk_id, chunk in zip(ids.tolist(), chunks):
+            record = ChunkRecord(chunk_id, chunk)
+            self._records[chunk_id] = record
+            self._index_record(chunk_id, record.source_domain, record.content_type)
+        self._lexical_add([(chunk_id, self._records[chunk_id].text) for chunk_id in ids.tolist()])
+        self._append_vectors(ids, embeddings_array)
         
         # Add to FAISS index
-        self.index.add(embeddings_array)
-        
-        # Store chunk metadata
-        self.chunks.extend(chunks)
+        if self.index is not None:
+            self.index.add_with_ids(embeddings_array, ids)
+
+        if not self.trained and len(self._rows) >= self.min_train_size:
+            self.train_index()
         
-        logger.info(f"Added {len(embeddings)} embeddings to vector store. Total: {len(self.chunks)}")
+        logger.info(f"Added {len(embeddings)} embeddings to vector store. Total: {len(self._rows)}")
+        return ids.tolist()
+
+    def update_extra(self, updates: Dict[int, Dict[str, Any]]):
+        """
+        Merge fields into the extra metadata of live chunks. Saved records are rewritten in
+        the metadata database right away; unsaved ones are written by the next save.
+
+        Args:
+            updates: vector id -> fields to set
+        """
+        records = self.get_records(list(updates))
+        for chunk_id, record in records.items():
+            record.extra = {**(record.extra or {}), **updates[chunk_id]}
+        saved = [record for chunk_id, record in records.items() if chunk_id not in self._records]
+        if saved:
+            self._metadata.put_many(saved)
     
-    def search(self, query_embedding: List[float], top_k: int = 10, content_type_filter: str = None, domain_filter: str = None) -> List[Dict[str, Any]]:
+    def _lexical_add(self, docs: List[Tuple[int, str]]):
+        if self._lexical is not None:
+            self._lexical.add_many(docs)
+        elif self._lexical_build is not None:
+            self._lexical_build.backlog.append((docs, set()))
+
+    def _lexical_remove(self, ids: Set[int]):
+        if self._lexical is not None:
+            self._lexical.remove_many(ids)
+        elif self._lexical_build is not None:
+            self._lexical_build.backlog.append(([], set(ids)))
+
+    def begin_lexical_build(self) -> Optional[LexicalIndexBuild]:
+        """
+        The pending build of the BM25 index, started here if the index is not built (None if
+        it is). Call this and the build's install() on the thread that writes to the store;
+        its run() can go to a worker thread.
+        """
+        if self._lexical is not None:
+            return None
+        if self._lexical_build is None:
+            self._lexical_build = LexicalIndexBuild(self)
+        return self._lexical_build
+
+    def lexical_index(self) -> BM25Index:
+        """The BM25 index over chunk text, built here from the stored records if no build installed it yet"""
+        if self._lexical is None:
+            self._lexical_build = build = LexicalIndexBuild(self)
+            build.run()
+            build.install()
+        return self._lexical
+
+    def search(self, query_embedding: List[float], top_k: int = 10, content_type_filter: str = None, domain_filter: str = None,
+               min_score: Optional[float] = None, query_text: Optional[str] = None) -> List[SearchHit]:
         """
         Search for similar chunks with enhanced filtering options.
         
@@ -62,136 +692,693 @@ class VectorStore:
             top_k: Number of top results to return
             content_type_filter: Filter by content type (text, json, image)
             domain_filter: Filter by specific domain
+            min_score: Drop hits whose similarity_score is below this value
+            query_text: If given, fuse BM25 matches on this text with the dense results (hybrid search)
             
         Returns:
-            List of chunks with similarity scores
+            List of search hits exposing the chunk fields plus similarity_score (higher is
+            more similar) and rank, best first
+        """
+        query_texts = [query_text] if query_text is not None else None
+        return self.search_batch([query_embedding], top_k, content_type_filter, domain_filter, min_score, query_texts)[0]
+
+    @staticmethod
+    def hybrid_fetch_k(top_k: int) -> int:
+        """Depth of the dense and BM25 candidate lists fused for a hybrid top_k"""
+        return max(4 * top_k, 20)
+
+    def _dense_candidates(self, queries: np.ndarray, top_k: int, domain: Optional[str],
+                          content_type: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(n, k) ids and exact similarities of prepared queries, best first; padding scores -inf"""
+        ids = self._candidate_ids(queries, min(top_k, len(self._rows)), domain, content_type)
+        scores = self._exact_scores_batch(queries, ids)
+        order = np.argsort(-scores, axis=1, kind='stable')
+        return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def hybrid_candidates(self, query_embeddings: Any, query_texts: List[str], top_k: int,
+                          content_type_filter: str = None, domain_filter: str = None) -> List[HybridCandidates]:
+        """
+        The dense and BM25 candidate lists that a hybrid search fuses, hybrid_fetch_k(top_k)
+        deep each. Lexical matches carry their exact similarity too, so lists of several
+        stores can be merged and fused together.
+
+        Returns:
+            Per query, (dense [(id, similarity)], lexical [(id, bm25 score, similarity)])
+        """
+        queries = self._prepare_vectors(query_embeddings)
+        if len(query_texts) != len(queries):
+            raise ValueError("Number of query texts must match number of query embeddings")
+        if len(self._rows) == 0:
+            return [([], []) for _ in range(len(queries))]
+        fetch_k = self.hybrid_fetch_k(top_k)
+        ids, scores = self._dense_candidates(queries, fetch_k, domain_filter, content_type_filter)
+        lexical = self.lexical_index()
+        allowed = self._filter_ids(domain_filter, content_type_filter)
+        candidates = []
+        for query, text, query_ids, query_scores in zip(queries, query_texts, ids, scores):
+            valid = np.isfinite(query_scores)
+            dense = list(zip(query_ids[valid].tolist(), query_scores[valid].tolist()))
+            lexical_ids, bm25 = lexical.search(text, fetch_k, allowed)
+            similarity = self._exact_scores(query, lexical_ids).tolist()
+            candidates.append((dense, list(zip(lexical_ids.tolist(), bm25.tolist(), similarity))))
+        return candidates
+
+    def search_batch(self, query_embeddings: Any, top_k: int = 10, content_type_filter: str = None,
+                     domain_filter: str = None, min_score: Union[None, float, List[Optional[float]]] = None,
+                     query_texts: Optional[List[str]] = None) -> List[List[SearchHit]]:
         """
-        if self.index is None or len(self.chunks) == 0:
+        Search for several queries with one FAISS call. Rescoring, ordering and the score
+        cutoff are done on (n, k) arrays, and the metadata of all hits is read in one lookup.
+
+        With query_texts, each query is a hybrid search: a deeper dense candidate list and the
+        BM25 matches of its text are merged by reciprocal rank fusion (see fuse_hybrid).
+        similarity_score stays the exact dense similarity and fusion_score gives the fused order.
+
+        Args:
+            query_embeddings: (n, dimension) matrix or list of query vectors
+            top_k: Number of top results to return per query
+            content_type_filter: Filter by content type (text, json, image)
+            domain_filter: Filter by specific domain
+            min_score: Drop hits whose similarity_score is below this value; a list gives one
+                cutoff per query
+            query_texts: Optional query text per query, enabling hybrid search
+
+        Returns:
+            One list of search hits per query, in query order
+        """
+        queries = self._prepare_vectors(query_embeddings)
+        if query_texts is not None and len(query_texts) != len(queries):
+            raise ValueError("Number of query texts must match number of query embeddings")
+        cutoffs = query_cutoffs(min_score, len(queries))
+        if len(self._rows) == 0:
             logger.warning("Vector store is empty")
-            return []
-        
-        # Convert query to numpy array
-        query_array = np.array([query_embedding], dtype=np.float32)
-        
-        # Search in FAISS index
-        top_k = min(top_k, len(self.chunks))  # Don't search for more than available
-        distances, indices = self.index.search(query_array, top_k)
-        
-        # Prepare results with similarity scores
+            return [[] for _ in range(len(queries))]
+
+        # Per query: (id, similarity, fusion score or None) tuples, best first
+        selected: List[List[Tuple[int, float, Optional[float]]]] = []
+        if query_texts is None:
+            # Search in FAISS index, restricted to the filtered ids if any, and rescore exactly
+            ids, scores = self._dense_candidates(queries, top_k, domain_filter, content_type_filter)
+            for query_ids, query_scores, cutoff in zip(ids, scores, cutoffs):
+                keep = np.isfinite(query_scores)
+                if cutoff is not None:
+                    keep &= query_scores >= cutoff
+                selected.append([(i, score, None) for i, score in zip(query_ids[keep].tolist(), query_scores[keep].tolist())])
+        else:
+            candidates = self.hybrid_candidates(queries, query_texts, top_k, content_type_filter, domain_filter)
+            for (dense, lexical), cutoff in zip(candidates, cutoffs):
+                selected.append(fuse_hybrid(dense, lexical, self.rrf_k, top_k, cutoff, self.lexical_min_score))
+
+        # Metadata is only read for the hits
+        records = self.get_records(sorted({chunk_id for hits in selected for chunk_id, _, _ in hits}))
         results = []
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(self.chunks):  # Ensure valid index
-                chunk = self.chunks[idx].copy()
-                chunk['similarity_score'] = float(distance)  # Lower distance = higher similarity
-                chunk['rank'] = i + 1
-                results.append(chunk)
+        for query_selected in selected:
+            hits = []
+            for chunk_id, score, fusion in query_selected:
+                if chunk_id in records:
+                    hits.append(SearchHit(records[chunk_id], score, len(hits) + 1, fusion))
+            results.append(hits)
         
-        logger.info(f"Found {len(results)} similar chunks")
+        logger.info(f"Found {sum(len(hits) for hits in results)} similar chunks for {len(results)} queries")
         return results
-    
+
     def clear_store(self):
         """Clear all data from the vector store"""
         self.index = None
-        self.chunks = []
+        self._records = {}
+        if self._metadata is not None:
+            self._metadata.close()
+        # With no metadata database attached, the next save writes a full snapshot
+        self._metadata = None
+        self._path = None
+        self._deleted_since_save = set()
+        self._snapshot_stale = True
+        self._base_vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._base_ids = np.empty(0, dtype=np.int64)
+        self._base_live = np.empty(0, dtype=bool)
+        self._base_dead = 0
+        self._tail_vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._tail_ids = np.empty(0, dtype=np.int64)
+        self._tail_size = 0
+        self._rows = {}
+        self.domain_ids = {}
+        self.content_type_ids = {}
+        self._filter_bitmaps = {}
+        self._lexical = BM25Index()
+        self._lexical_build = None
+        self._deleted_ids = set()
+        self.trained = self.index_type in ('flat', 'hnsw')
         logger.info("Vector store cleared")
     
     def get_size(self) -> int:
         """Get the number of stored chunks"""
-        return len(self.chunks)
+        return len(self._rows)
     
     def is_empty(self) -> bool:
         """Check if the vector store is empty"""
-        return len(self.chunks) == 0
+        return len(self._rows) == 0
     
-    def save_to_disk(self, path_prefix: str):
-        """Save the FAISS index and chunks to disk"""
-        if self.index is not None:
-            faiss.write_index(self.index, f"{path_prefix}_index.faiss")
-        with open(f"{path_prefix}_chunks.pkl", "wb") as f:
-            pickle.dump(self.chunks, f)
-        logger.info(f"Vector store saved to {path_prefix}_index.faiss and {path_prefix}_chunks.pkl")
+    def _index_config(self) -> Dict[str, Any]:
+        return {
+            'index_type': self.index_type,
+            'metric': self.metric,
+            'trained': self.trained,
+            'hnsw_m': self.hnsw_m,
+            'ef_construction': self.ef_construction,
+            'ef_search': self.ef_search,
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+            'pq_m': self.pq_m,
+            'sq_type': self.sq_type,
+            'min_train_size': self.min_train_size,
+            'next_id': self._next_id,
+            'deleted_ids': sorted(self._deleted_ids)
+        }
+
+    def _attach_metadata(self, path: str):
+        """Write every live record into the metadata database at path and read from it from now on"""
+        records = self.get_records(list(self._rows))
+        metadata = ChunkMetadataStore(os.path.join(path, METADATA_FILE))
+        metadata.clear()
+        metadata.put_many(records.values())
+        if self._metadata is not None:
+            self._metadata.close()
+        self._metadata = metadata
+        self._path = os.path.abspath(path)
+
+    @staticmethod
+    def _write_manifest(path: str, manifest: Dict[str, Any]):
+        def write(tmp_path: str):
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+        _atomic_write(os.path.join(path, MANIFEST_FILE), write)
+
+    def _remove_unreferenced(self, path: str, manifest: Dict[str, Any]):
+        """
+        Delete data files the manifest does not name: superseded snapshots, merged segments and
+        leftovers of interrupted writes. Files of a running compaction are left alone. Processes
+        that mapped old files keep them until they reload.
+        """
+        referenced = {name for name in manifest['base'].values() if isinstance(name, str)}
+        for segment in manifest['segments']:
+            referenced.update(name for name in segment.values() if isinstance(name, str))
+        for name in os.listdir(path):
+            if name.endswith('.tmp'):
+                in_flight = name[:-len('.tmp')] in self._compaction_files
+            else:
+                in_flight = name in self._compaction_files
+            if _DATA_FILE_PATTERN.match(name) and name not in referenced and not in_flight:
+                try:
+                    os.remove(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _base_files(generation: int) -> Dict[str, str]:
+        """Names of the files of the base snapshot of a generation"""
+        return {'vectors': f"vectors-{generation}.f32", 'ids': f"ids-{generation}.i64", 'index': f"index-{generation}.faiss"}
+
+    def _write_base(self, path: str, generation: int, ids: np.ndarray, vectors: np.ndarray,
+                    index_bytes: Optional[np.ndarray]) -> Dict[str, Any]:
+        """Write the files of a base snapshot and return its manifest entry"""
+        files = self._base_files(generation)
+        base = {'count': len(ids), 'vectors': files['vectors'], 'ids': files['ids']}
+        _atomic_write(os.path.join(path, base['vectors']), np.ascontiguousarray(vectors).tofile)
+        _atomic_write(os.path.join(path, base['ids']), ids.tofile)
+        if index_bytes is not None:
+            base['index'] = files['index']
+            _atomic_write(os.path.join(path, base['index']), index_bytes.tofile)
+        return base
+
+    def _save_snapshot(self, path: str, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Write the whole store as a new base snapshot with no segments"""
+        if self._metadata is None or self._path != os.path.abspath(path):
+            self._attach_metadata(path)
+        else:
+            self._metadata.put_many(self._records.values())
+            self._metadata.delete_many(self._deleted_since_save)
+        generation = max(self.generation, (previous or {}).get('generation', 0)) + 1
+        ids, vectors = self._stored_vectors()
+        index_bytes = faiss.serialize_index(self.index) if self.index is not None else None
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'generation': generation,
+            'dimension': self.dimension,
+            'base': self._write_base(path, generation, ids, vectors, index_bytes),
+            'segments': [],
+            'metadata': METADATA_FILE,
+            'config': self._index_config()
+        }
+        self._write_manifest(path, manifest)
+        self._snapshot_stale = False
+        # The new files hold exactly the live rows, so they replace the base and the owned tail
+        self._map_base(path, manifest['base'])
+        self._remove_unreferenced(path, manifest)
+        logger.info(f"Vector store snapshot saved to {path} (generation {generation}, {len(ids)} vectors)")
+        return manifest
+
+    def _save_segment(self, path: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Append the vectors added and the ids deleted since the last save as a new segment"""
+        new_ids = list(self._records)
+        deleted = sorted(self._deleted_since_save)
+        if not new_ids and not deleted and manifest['config'] == self._index_config():
+            return manifest
+        generation = max(self.generation, manifest['generation']) + 1
+        # Metadata rows go in before the manifest names their vectors, and are deleted only after
+        # the manifest stops naming them, so a crash in between leaves at worst unused rows
+        self._metadata.put_many(self._records.values())
+        segment: Dict[str, Any] = {'generation': generation, 'count': len(new_ids)}
+        if new_ids:
+            rows = np.array([self._rows[chunk_id] for chunk_id in new_ids], dtype=np.int64)
+            segment['vectors'] = f"segment-{generation}.f32"
+            segment['ids'] = f"segment-{generation}.i64"
+            _atomic_write(os.path.join(path, segment['vectors']), self._row_vectors(rows).tofile)
+            _atomic_write(os.path.join(path, segment['ids']), np.array(new_ids, dtype=np.int64).tofile)
+        if deleted:
+            segment['tombstones'] = f"tombstones-{generation}.i64"
+            _atomic_write(os.path.join(path, segment['tombstones']), np.array(deleted, dtype=np.int64).tofile)
+        manifest = {**manifest, 'generation': generation, 'config': self._index_config()}
+        if new_ids or deleted:
+            manifest['segments'] = manifest['segments'] + [segment]
+        self._write_manifest(path, manifest)
+        self._metadata.delete_many(deleted)
+        logger.info(f"Vector store segment saved to {path} (generation {generation}, "
+                    f"{len(new_ids)} added, {len(deleted)} deleted)")
+        return manifest
+
+    def save_to_disk(self, path: str):
+        """
+        Persist the store in the directory at path. The first save, and any save after the
+        index was rebuilt, writes a base snapshot: a float32 vector file and its row ids, the
+        FAISS index and a manifest naming them. Later saves only append a small segment with
+        the vectors added and the ids deleted since, so save cost follows the size of the
+        change. Chunk records live in SQLite. Every file is written under a temporary name
+        and renamed, and the manifest is replaced last, so a crash mid-save leaves the
+        previous state readable. Segments are merged into a new base in the background once
+        there are max_segments of them.
+        """
+        os.makedirs(path, exist_ok=True)
+        with self._persist_lock:
+            manifest = read_manifest(path)
+            if (manifest is None or manifest.get('format_version') != FORMAT_VERSION or self._snapshot_stale
+                    or self._metadata is None or self._path != os.path.abspath(path)):
+                manifest = self._save_snapshot(path, manifest)
+            else:
+                manifest = self._save_segment(path, manifest)
+            self._records = {}
+            self._deleted_since_save = set()
+            self.generation = manifest['generation']
+            self._loaded_base = manifest['base']
+            self._loaded_segments = [segment['generation'] for segment in manifest['segments']]
+        if len(manifest['segments']) >= self.max_segments:
+            self.compact(path)
+
+    def compact(self, path: str, background: bool = True):
+        """
+        Merge the segments on disk into a new base snapshot. The current state is copied under
+        the persistence lock and written out without it; segments saved meanwhile are kept.
+        """
+        with self._persist_lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            manifest = read_manifest(path)
+            if (manifest is None or not manifest.get('segments') or self._records or self._deleted_since_save
+                    or self._path != os.path.abspath(path)):
+                # Only the saved state can be compacted: it is exactly what the manifest describes
+                return
+            ids, vectors = self._stored_vectors()
+            snapshot = {
+                'base': manifest['base'],
+                'generation': manifest['generation'],
+                'merged': {segment['generation'] for segment in manifest['segments']},
+                'ids': ids,
+                # The mapped base is read-only; only vectors in the owned tail can change meanwhile
+                'vectors': vectors.copy() if np.may_share_memory(vectors, self._tail_vectors) else vectors,
+                'index': faiss.serialize_index(self.index) if self.index is not None else None
+            }
+            self._compaction_files = set(self._base_files(snapshot['generation']).values())
+
+        def run():
+            started = time.perf_counter()
+            try:
+                base = self._write_base(path, snapshot['generation'], snapshot['ids'], snapshot['vectors'],
+                                        snapshot['index'])
+            except Exception:
+                with self._persist_lock:
+                    self._compaction_files = set()
+                raise
+            with self._persist_lock:
+                self._compaction_files = set()
+                current = read_manifest(path)
+                if current is None or current['base'] != snapshot['base']:
+                    # A full snapshot replaced the base meanwhile; this compaction is obsolete
+                    logger.info("Discarding compaction superseded by a newer snapshot")
+                    if current is not None:
+                        self._remove_unreferenced(path, current)
+                    return
+                manifest = {
+                    **current,
+                    'generation': current['generation'] + 1,
+                    'base': base,
+                    'segments': [s for s in current['segments'] if s['generation'] not in snapshot['merged']]
+                }
+                self._write_manifest(path, manifest)
+                self.generation = max(self.generation, manifest['generation'])
+                self._loaded_base = manifest['base']
+                self._loaded_segments = [segment['generation'] for segment in manifest['segments']]
+                self._remove_unreferenced(path, manifest)
+            logger.info(f"Compacted {len(snapshot['merged'])} segments into a base of {len(snapshot['ids'])} vectors "
+                        f"in {time.perf_counter() - started:.2f}s")
+
+        if background:
+            self._compaction = threading.Thread(target=run, name="vector-store-compaction")
+            self._compaction.start()
+        else:
+            run()
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        if self._compaction is not None:
+            self._compaction.join()
+
+    def _apply_segment(self, path: str, segment: Dict[str, Any]) -> Tuple[List[int], Set[int]]:
+        """
+        Replay a segment: add its vectors to the index, then remove its tombstoned ids.
+
+        Returns:
+            Tuple of (ids added, ids removed)
+        """
+        added: List[int] = []
+        live: Set[int] = set()
+        if 'ids' in segment:
+            ids = np.fromfile(os.path.join(path, segment['ids']), dtype=np.int64)
+            vectors = np.fromfile(os.path.join(path, segment['vectors']), dtype=np.float32).reshape(-1, self.dimension)
+            if self.index is None and not self._scans_vectors():
+                self._create_index()
+            self._append_vectors(ids, vectors)
+            if self.index is not None:
+                self.index.add_with_ids(vectors, ids)
+            added = ids.tolist()
+        if 'tombstones' in segment:
+            tombstones = np.fromfile(os.path.join(path, segment['tombstones']), dtype=np.int64)
+            live = {chunk_id for chunk_id in tombstones.tolist() if chunk_id in self._rows}
+            if live:
+                self._drop_vectors(live)
+                if not self._rows:
+                    self.index = None
+                else:
+                    self._remove_ids(np.fromiter(live, dtype=np.int64, count=len(live)))
+        self._loaded_segments.append(segment['generation'])
+        return added, live
+
+    def _load_snapshot(self, path: str, manifest: Dict[str, Any]):
+        if manifest.get('format_version', 0) > FORMAT_VERSION:
+            raise ValueError(f"Vector store format {manifest['format_version']} is newer than supported ({FORMAT_VERSION})")
+        if manifest['format_version'] == 2:
+            manifest = {**manifest, 'base': {'count': manifest['count'], **manifest['files']}, 'segments': []}
+        config = dict(manifest['config'])
+        self._next_id = config.pop('next_id', 0)
+        self._deleted_ids = set(config.pop('deleted_ids', []))
+        # Stores written before the metric was configurable use L2
+        self.metric = config.pop('metric', 'l2')
+        for key, value in config.items():
+            setattr(self, key, value)
+        self.dimension = manifest.get('dimension', self.dimension)
+        self.generation = manifest['generation']
+        base = manifest['base']
+
+        # Read-only mapping: pages are shared through the OS page cache and never copied
+        self._map_base(path, base)
+        # Older snapshots of flat and untrained stores carry a flat index; the mapped vectors replace it
+        if 'index' in base and not self._scans_vectors():
+            self.index = faiss.read_index(os.path.join(path, base['index']))
+        self._snapshot_stale = False
+        self._loaded_base = base
+        self._loaded_segments = []
+        for segment in manifest['segments']:
+            self._apply_segment(path, segment)
+        if not self.trained and len(self._rows) >= self.min_train_size:
+            self.train_index()
+
+        self._metadata = ChunkMetadataStore(os.path.join(path, manifest.get('metadata', METADATA_FILE)))
+        self._path = os.path.abspath(path)
+        for chunk_id, domain, content_type in self._metadata.iter_keys():
+            if chunk_id in self._rows:
+                self._index_record(chunk_id, domain, content_type)
+
+    def _load_chunks(self, chunks: Any, path_prefix: str) -> bool:
+        """
+        Populate records and vectors from a format 1 chunks pickle.
 
-    def load_from_disk(self, path_prefix: str):
-        """Load the FAISS index and chunks from disk"""
+        Returns:
+            True if the chunks came from an older layout whose index has to be rebuilt
+        """
+        if isinstance(chunks, list) and (not chunks or isinstance(chunks[0], ChunkRecord)):
+            vectors = np.load(f"{path_prefix}_vectors.npy") if chunks else np.empty((0, self.dimension), dtype=np.float32)
+            ids = np.array([record.id for record in chunks], dtype=np.int64)
+            self._records = {record.id: record for record in chunks}
+            self._append_vectors(ids, vectors)
+            return False
+        if isinstance(chunks, list):
+            # Stores saved before stable ids used positional chunks and a plain flat index
+            logger.info("Migrating positional vector store to stable chunk ids")
+            chunks = dict(enumerate(chunks))
+            self._next_id = len(chunks)
+        # Chunk dicts carrying their own embedding lists
+        logger.info("Migrating chunk embeddings into the columnar vector matrix")
+        ids = np.fromiter(chunks.keys(), dtype=np.int64, count=len(chunks))
+        vectors = np.array([chunk['embedding'] for chunk in chunks.values()], dtype=np.float32)
+        self._records = {chunk_id: ChunkRecord(chunk_id, chunk) for chunk_id, chunk in chunks.items()}
+        self._append_vectors(ids, vectors.reshape(-1, self.dimension))
+        return True
+
+    def _migrate_legacy(self, path_prefix: str):
+        """Load a format 1 store (<prefix>_index.faiss, <prefix>_chunks.pkl) and rewrite it as a snapshot"""
+        self.index = faiss.read_index(f"{path_prefix}_index.faiss")
+        with open(f"{path_prefix}_chunks.pkl", "rb") as f:
+            chunks = pickle.load(f)
+        config_path = f"{path_prefix}_config.json"
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+        self._next_id = config.pop('next_id', 0)
+        self._deleted_ids = set(config.pop('deleted_ids', []))
+        self.metric = config.pop('metric', 'l2')
+        for key, value in config.items():
+            setattr(self, key, value)
+        legacy_positional = isinstance(chunks, list) and chunks and isinstance(chunks[0], dict)
+        if self._load_chunks(chunks, path_prefix):
+            if legacy_positional:
+                self.index_type = config.get('index_type', 'flat')
+                self.trained = self.index_type in ('flat', 'hnsw')
+            self._rebuild_index()
+        elif self._scans_vectors():
+            self.index = None
+        for chunk_id, record in self._records.items():
+            self._index_record(chunk_id, record.source_domain, record.content_type)
+        logger.info(f"Migrating vector store {path_prefix}_* to the format {FORMAT_VERSION} layout in {path_prefix}/")
+        self.save_to_disk(path_prefix)
+
+    def load_from_disk(self, path: str):
+        """
+        Load the store in the directory at path: the base snapshot with its segments replayed
+        on top. Base vectors are memory-mapped and chunk records are read lazily, so loading
+        does not scale with the size of the text. Stores in the older <path>_* file layout
+        are migrated on first load.
+        """
+        started = time.perf_counter()
         try:
-            self.index = faiss.read_index(f"{path_prefix}_index.faiss")
-            with open(f"{path_prefix}_chunks.pkl", "rb") as f:
-                self.chunks = pickle.load(f)
-            logger.info(f"Vector store loaded from {path_prefix}_index.faiss and {path_prefix}_chunks.pkl")
-            logger.info(f"Loaded vector store with {len(self.chunks)} chunks")
+            self.clear_store()
+            manifest = read_manifest(path)
+            if manifest is not None:
+                self._load_snapshot(path, manifest)
+            elif os.path.exists(f"{path}_chunks.pkl"):
+                self._migrate_legacy(path)
+            else:
+                logger.info(f"No vector store found at {path}")
+                return
+            self._apply_search_params(self._base_index())
+            self._lexical = None
+            self.last_load_seconds = time.perf_counter() - started
+            logger.info(f"Loaded {self.index_type} vector store with {len(self._rows)} chunks from {path} "
+                        f"(generation {self.generation}) in {self.last_load_seconds:.3f}s")
         except Exception as e:
             logger.error(f"Failed to load vector store from disk: {e}")
-            self.index = None
-            self.chunks = []
+            self.clear_store()
+
+    def refresh_from_disk(self, path: str) -> str:
+        """
+        Bring a read-only copy of the store up to date with what another process saved.
+        Only the manifest is read when nothing changed; segments appended to the same base
+        are replayed incrementally; a new base (snapshot or compaction) means a full load, as
+        does a segment that a compaction deleted between reading the manifest and replaying it.
+
+        Returns:
+            'unchanged', 'incremental' or 'reloaded'
+        """
+        manifest = read_manifest(path)
+        if manifest is None:
+            if self._loaded_base is None and not os.path.exists(f"{path}_chunks.pkl"):
+                return 'unchanged'
+        elif (manifest['generation'] == self.generation and self._path == os.path.abspath(path)):
+            return 'unchanged'
+        elif (manifest.get('format_version') == FORMAT_VERSION and self._path == os.path.abspath(path)
+              and manifest['base'] == self._loaded_base
+              and [s['generation'] for s in manifest['segments'][:len(self._loaded_segments)]] == self._loaded_segments):
+            started = time.perf_counter()
+            added: List[int] = []
+            try:
+                for segment in manifest['segments'][len(self._loaded_segments):]:
+                    segment_added, removed = self._apply_segment(path, segment)
+                    added.extend(segment_added)
+                    self._unindex_ids(removed)
+            except OSError as e:
+                # The segments applied so far are discarded by the full load
+                logger.info(f"Incremental refresh of {path} failed ({e}), reloading")
+                self.load_from_disk(path)
+                return 'reloaded'
+            live_added = [i for i in added if i in self._rows]
+            for chunk_id, domain, content_type in self._metadata.get_keys(live_added):
+                self._index_record(chunk_id, domain, content_type)
+            if self._lexical is not None or self._lexical_build is not None:
+                self._lexical_add([(i, record.text) for i, record in self.get_records(live_added).items()])
+            config = dict(manifest['config'])
+            self._next_id = config.pop('next_id', self._next_id)
+            self._deleted_ids |= set(config.pop('deleted_ids', []))
+            self.generation = manifest['generation']
+            logger.info(f"Applied {len(added)} new vectors from {path} (generation {self.generation}) "
+                        f"in {time.perf_counter() - started:.3f}s")
+            return 'incremental'
+        self.load_from_disk(path)
+        return 'reloaded'
+
+    def evaluate_index(self, queries: np.ndarray, top_k: int = 10) -> Dict[str, Any]:
+        """
+        Compare the current index against an exact flat baseline.
+
+        Args:
+            queries: (n, dimension) matrix of query vectors
+            top_k: Number of neighbours compared per query
+
+        Returns:
+            Dictionary with recall@k and mean per-query latency of both indexes
+        """
+        if not self._rows:
+            raise ValueError("Vector store is empty")
+        queries = self._prepare_vectors(queries)
+        top_k = min(top_k, len(self._rows))
+        ids, vectors = self._stored_vectors()
+        baseline = faiss.IndexIDMap2(self._build_index('flat'))
+        baseline.add_with_ids(vectors, ids)
+
+        started = time.perf_counter()
+        _, exact = baseline.search(queries, top_k)
+        flat_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        started = time.perf_counter()
+        approx = self._candidate_ids(queries, top_k)
+        index_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        hits = sum(len(set(e[e >= 0]) & set(a[a >= 0])) for e, a in zip(exact, approx))
+        return {
+            'index_type': self.index_type if self.trained else 'flat',
+            'vectors': len(self._rows),
+            'queries': len(queries),
+            'top_k': top_k,
+            f'recall@{top_k}': hits / (len(queries) * top_k),
+            'flat_ms_per_query': flat_ms,
+            'index_ms_per_query': index_ms,
+            'speedup': flat_ms / index_ms if index_ms > 0 else float('inf'),
+            'ef_search': self.ef_search,
+            'nprobe': self.nprobe
+        }
     
     def get_structure_info(self) -> dict:
         """Return structure information about the stored chunks."""
-        info = {
-            'total_chunks': len(self.chunks),
-            'content_types': {},
-            'domains': {}
+        return {
+            'total_chunks': len(self._rows),
+            'content_types': {ctype: len(ids) for ctype, ids in self.content_type_ids.items()},
+            'domains': {domain: len(ids) for domain, ids in self.domain_ids.items()}
         }
-        for chunk in self.chunks:
-            # Count by content type
-            ctype = chunk.get('content_type', 'unknown')
-            info['content_types'][ctype] = info['content_types'].get(ctype, 0) + 1
-            # Count by domain
-            domain = chunk.get('domain', 'unknown')
-            info['domains'][domain] = info['domains'].get(domain, 0) + 1
-        return info
+
+    def get_domains(self) -> List[str]:
+        """Return the domains that have chunks in the store"""
+        return sorted(self.domain_ids)
     
+    def _remove_ids(self, ids: np.ndarray):
+        """Remove ids from the index, tombstoning them where the index cannot delete in place"""
+        if isinstance(self._base_index(), faiss.IndexHNSW):
+            self._deleted_ids.update(ids.tolist())
+            if len(self._deleted_ids) > self.max_deleted_fraction * self.index.ntotal:
+                logger.info(f"Rebuilding HNSW index to purge {len(self._deleted_ids)} deleted vectors")
+                self._rebuild_index()
+        elif self.index is not None:
+            self.index.remove_ids(faiss.IDSelectorBatch(ids))
+
+    def _delete_ids(self, ids: Set[int]):
+        self._forget_ids(ids)
+        if not self._rows:
+            self.index = None
+            self._deleted_ids = set()
+        else:
+            self._remove_ids(np.fromiter(ids, dtype=np.int64, count=len(ids)))
+
     def delete_site(self, domain: str):
         """
         Delete all chunks and embeddings for a specific domain from the vector store.
+        Only the domain's own ids are touched; the rest of the index is left in place.
         
         Args:
             domain: The domain to delete from the store.
         """
-        if not self.chunks or self.index is None:
-            logger.warning("Vector store is empty or not initialized.")
-            return
-
-        # Debug: print domains before deletion
-        domains_before = set()
-        for chunk in self.chunks:
-            domains_before.add(chunk.get('domain'))
-            domains_before.add(chunk.get('source_domain'))
-        logger.info(f"Domains in vector store before deletion: {domains_before}")
-
-        # Identify indices to keep (not matching the domain in domain, source_domain, or url)
-        keep_indices = [i for i, chunk in enumerate(self.chunks)
-                        if (chunk.get('domain') != domain and
-                            chunk.get('source_domain') != domain and
-                            (not chunk.get('url') or domain not in chunk.get('url')))]
-        if len(keep_indices) == len(self.chunks):
+        ids = self.domain_ids.pop(domain, None)
+        if not ids:
             logger.info(f"No chunks found for domain '{domain}' to delete.")
             return
 
-        # Keep only the chunks not matching the domain
-        self.chunks = [self.chunks[i] for i in keep_indices]
-
-        # Debug: print domains after deletion
-        domains_after = set()
-        for chunk in self.chunks:
-            domains_after.add(chunk.get('domain'))
-            domains_after.add(chunk.get('source_domain'))
-        logger.info(f"Domains in vector store after deletion: {domains_after}")
-
-        # Rebuild the FAISS index with the remaining embeddings
-        if self.chunks:
-            valid_chunks = [chunk for chunk in self.chunks if 'embedding' in chunk]
-            if len(valid_chunks) < len(self.chunks):
-                logger.warning(f"Some chunks are missing 'embedding' and will be skipped during index rebuild.")
-            if valid_chunks:
-                embeddings = [chunk['embedding'] for chunk in valid_chunks]
-                self._create_index()
-                embeddings_array = np.array(embeddings, dtype=np.float32)
-                self.index.add(embeddings_array)
-                self.chunks = valid_chunks  # Only keep valid chunks
-            else:
-                logger.warning("No valid chunks with 'embedding' remain after deletion.")
-                self.index = None
-                self.chunks = []
-        else:
-            self.index = None
-        logger.info(f"Deleted all data for domain '{domain}' from vector store.")
+        self._delete_ids(ids)
+        logger.info(f"Deleted {len(ids)} chunks for domain '{domain}' from vector store.")
+
+    def delete_urls(self, urls: List[str]) -> int:
+        """
+        Delete the chunks of the given pages, e.g. pages that changed or disappeared since
+        the last crawl. Unsaved chunks are matched in memory and saved ones through the
+        url indexes of the metadata database, so the cost follows the number of pages.
+
+        A deduplicated chunk stands for every page in its 'source_urls'. It is only deleted
+        once none of them is left; until then the pages are dropped from 'source_urls' and
+        url moves to a remaining page.
+
+        Args:
+            urls: Page URLs whose chunks should be deleted
+
+        Returns:
+            Number of chunks deleted
+        """
+        wanted = set(urls)
+        if not wanted:
+            return 0
+        candidates = {chunk_id for chunk_id, record in self._records.items()
+                      if record.url in wanted or not wanted.isdisjoint(record.get('source_urls') or ())}
+        if self._metadata is not None:
+            candidates.update(chunk_id for chunk_id in self._metadata.ids_for_urls(list(wanted)) if chunk_id in self._rows)
+        ids = set()
+        kept = []
+        for chunk_id, record in self.get_records(list(candidates)).items():
+            remaining = [url for url in record.get('source_urls') or [record.url] if url not in wanted]
+            if not remaining:
+                ids.add(chunk_id)
+                continue
+            if record.url in wanted:
+                record.url = remaining[0]
+            record.extra = {**record.extra, 'source_urls': remaining}
+            kept.append(record)
+        saved = [record for record in kept if record.id not in self._records]
+        if saved:
+            self._metadata.put_many(saved)
+        if ids:
+            self._delete_ids(ids)
+            logger.info(f"Deleted {len(ids)} chunks of {len(wanted)} pages from vector store.")
+        if kept:
+            logger.info(f"Kept {len(kept)} deduplicated chunks still found on other pages")
+        return len(ids)
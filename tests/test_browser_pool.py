@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+import backend.browser_pool as browser_pool_module
+from backend.browser_pool import BrowserPool
+
+
+class FakePage:
+    def is_closed(self):
+        return False
+
+
+class FakeContext:
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, failures):
+        self.failures = failures
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        if self.failures['count']:
+            self.failures['count'] -= 1
+            raise RuntimeError("new_context failed")
+        return FakeContext()
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self, browsers, failures):
+        self.chromium = self
+        self.browsers = browsers
+        self.failures = failures
+
+    async def start(self):
+        return self
+
+    async def launch(self):
+        browser = FakeBrowser(self.failures)
+        self.browsers.append(browser)
+        return browser
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture
+def fake_playwright(monkeypatch):
+    browsers, failures = [], {'count': 0}
+    monkeypatch.setattr(browser_pool_module, 'async_playwright', lambda: FakePlaywright(browsers, failures))
+    return browsers, failures
+
+
+def test_failed_recycle_keeps_the_slot(fake_playwright):
+    browsers, failures = fake_playwright
+
+    async def run():
+        pool = BrowserPool(size=1, max_uses_per_page=1)
+        async with pool.lease():
+            failures['count'] = 2  # the recycle and the retry on the next lease fail
+        with pytest.raises(RuntimeError):
+            async with asyncio.timeout(1):
+                async with pool.lease():
+                    pass
+        async with asyncio.timeout(1):
+            async with pool.lease() as page:
+                assert isinstance(page, FakePage)
+        assert pool.get_stats()['idle'] == 1
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_relaunch_wakes_waiting_leases(fake_playwright):
+    browsers, _ = fake_playwright
+
+    async def run():
+        pool = BrowserPool(size=1)
+        release = asyncio.Event()
+        leased = []
+
+        async def hold():
+            async with pool.lease():
+                await release.wait()
+
+        async def lease_once():
+            async with pool.lease() as page:
+                leased.append(page)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(lease_once())
+        await asyncio.sleep(0)
+        browsers[-1].connected = False
+        async with asyncio.timeout(1):
+            await asyncio.gather(waiter, lease_once())
+        release.set()
+        await holder
+        assert len(browsers) == 2 and len(leased) == 2
+        assert pool.get_stats()['idle'] == 1
+        await pool.close()
+
+    asyncio.run(run())
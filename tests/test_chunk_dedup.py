@@ -0,0 +1,24 @@
+from backend.chunk_dedup import ChunkDeduplicator
+
+FOOTER = "Copyright Example Inc. All rights reserved. Privacy policy, terms of service and cookie settings."
+
+def chunk(url, text):
+    return {'text': text, 'url': url, 'source_domain': 'docs.example', 'content_type': 'text'}
+
+def test_kept_chunks_are_released_once_indexed_and_late_duplicates_reported():
+    deduplicator = ChunkDeduplicator()
+    first = [chunk("https://docs.example/a", FOOTER), chunk("https://docs.example/a", "Pricing for teams and companies.")]
+    second = [chunk("https://docs.example/b", FOOTER), chunk("https://docs.example/b", "Careers at the company.")]
+    kept = deduplicator.filter(first) + deduplicator.filter(second)
+    assert [c['text'] for c in kept] == [FOOTER, "Pricing for teams and companies.", "Careers at the company."]
+    # Merged before it was indexed: the footer chunk carries both pages
+    assert kept[0]['source_urls'] == ["https://docs.example/a", "https://docs.example/b"]
+
+    # The pricing chunk's embedding failed, so only the others are indexed
+    deduplicator.mark_indexed([kept[0], kept[2]], [10, 12])
+    assert not deduplicator._queued and not deduplicator._positions
+
+    deduplicator.filter([chunk("https://docs.example/c", FOOTER)])
+    assert deduplicator.late_source_urls() == {'docs.example': {10: {'source_urls': [
+        "https://docs.example/a", "https://docs.example/b", "https://docs.example/c"]}}}
+    assert deduplicator.stats == {'chunks': 5, 'duplicates': 2}
@@ -0,0 +1,108 @@
+import re
+import numpy as np
+import pytest
+import tiktoken
+import backend.chunker as chunker_module
+from backend.chunker import TextChunker
+
+WORDS = ("the time world state people work life year day way man part place case group number point company "
+         "system program question government night home water room area money story fact month lot right "
+         "study book eye job word business issue side kind head house service friend power hour game line").split()
+
+
+@pytest.fixture(scope='module')
+def chunker():
+    try:
+        tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        pytest.skip(f"cl100k_base encoding is not available: {e}")
+    return TextChunker(max_tokens=120, overlap_tokens=30)
+
+
+def prose(sentences, seed=0):
+    rng = np.random.default_rng(seed)
+    return ' '.join(
+        f"The {' '.join(rng.choice(WORDS, size=int(rng.integers(4, 24))))} {'of' if i % 3 else 'for'} "
+        f"{rng.choice(WORDS)}{'.!?'[i % 3]}"
+        for i in range(sentences)
+    )
+
+
+def old_sentence_chunks(chunker, text):
+    """Sentence packing as it was before pages were tokenized once: every sentence encoded on its own"""
+    def count(piece):
+        return len(chunker.encoding.encode(piece))
+
+    chunks, current, current_tokens = [], [], 0
+    for sentence in [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]:
+        sentence_tokens = count(sentence)
+        assert sentence_tokens <= chunker.max_tokens
+        if current_tokens + sentence_tokens > chunker.max_tokens and current:
+            chunks.append(' '.join(current))
+            if chunker.overlap_tokens > 0 and len(current) > 1:
+                overlap_tokens = count(' '.join(current[-2:]))
+                current = current[-2:] if overlap_tokens <= chunker.overlap_tokens else current[-1:]
+                current_tokens = overlap_tokens if len(current) == 2 else count(current[0])
+            else:
+                current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += sentence_tokens
+    if current:
+        chunks.append(' '.join(current))
+    return [{'text': chunk, 'tokens': count(chunk)} for chunk in chunks]
+
+
+def test_token_byte_table_matches_decoded_tokens(chunker):
+    encoding = chunker.encoding
+    expected = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            expected[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    assert np.array_equal(chunker._token_bytes, expected)
+    assert TextChunker()._token_bytes is chunker_module._TOKEN_BYTES[encoding.name]
+
+
+def test_sentence_chunks_match_encoding_each_sentence(chunker):
+    text = prose(200)
+    chunks = chunker.chunk_text(text, "https://docs.example/page")
+    assert len(chunks) > 5
+    assert [{'text': c['text'], 'tokens': c['tokens']} for c in chunks] == old_sentence_chunks(chunker, text)
+
+
+LOCAL_WORDS = "the pool keeps warm pages for every crawl and each page café naïve Zürich résumé façade 東京 données".split()
+
+
+@pytest.fixture
+def local_chunker(monkeypatch):
+    """Chunker over a small byte-level encoding built here, so no encoding has to be downloaded"""
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    # Words only merge with the space before them, so a chunk's first word tokenizes differently
+    for word in LOCAL_WORDS:
+        piece = f" {word}".encode('utf-8')
+        for end in range(2, len(piece) + 1):
+            ranks.setdefault(piece[:end], len(ranks))
+    encoding = tiktoken.Encoding(
+        'local_test_bpe',
+        pat_str=r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s""",
+        mergeable_ranks=ranks,
+        special_tokens={}
+    )
+    monkeypatch.setattr(chunker_module.tiktoken, 'get_encoding', lambda name: encoding)
+    return TextChunker(max_tokens=60, overlap_tokens=20)
+
+
+def test_chunk_tokens_match_encoding_the_chunk(local_chunker):
+    rng = np.random.default_rng(0)
+    separators = [' ', ' ', '\n', '\n\n', '  ']
+    text = ''.join(
+        ' '.join(rng.choice(LOCAL_WORDS, size=int(rng.integers(3, 20)))).capitalize() + '.!?'[i % 3]
+        + separators[int(rng.integers(0, len(separators)))]
+        for i in range(300)
+    ) + ' '.join(rng.choice(LOCAL_WORDS, size=80))  # a sentence too long for one chunk
+    chunks = local_chunker.chunk_text(text, "https://docs.example/page")
+    assert len(chunks) > 20
+    for chunk in chunks:
+        assert chunk['tokens'] == len(local_chunker.encoding.encode(chunk['text']))
+        assert chunk['tokens'] <= local_chunker.max_tokens
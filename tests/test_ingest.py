@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import zlib
+import numpy as np
+import pytest
+from backend.crawl_state import CrawlStateStore
+from backend.ingest import IngestionPipeline
+from backend.sharded_store import ShardedVectorStore
+
+DIMENSION = 1536
+NAV = "Home Products Pricing About Contact Careers Blog Support Login Sign up Privacy Terms"
+
+def page_text(body):
+    return f"{NAV}\n\n{body}"
+
+class FakeScraper:
+    """
+    Crawls a fixed site breadth-first. site maps url -> (content, internal links); failures
+    maps url -> HTTP status. A page whose content matches the known hash comes back unchanged.
+    """
+
+    def __init__(self, site, failures=None):
+        self.site = site
+        self.failures = failures or {}
+
+    def _page(self, url, depth, known):
+        status = self.failures.get(url, 200 if url in self.site else 404)
+        if status != 200:
+            return {'url': url, 'title': '', 'content': '', 'content_type': 'text', 'success': False,
+                    'links': {'internal': [], 'external': [], 'api': [], 'images': []}, 'depth': depth,
+                    'gone': status in (404, 410), 'status': status, 'error': f"HTTP {status}"}
+        content, links = self.site[url]
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return {'url': url, 'title': url, 'content': content, 'content_type': 'text', 'success': True,
+                'links': {'internal': list(links), 'external': [], 'api': [], 'images': []}, 'depth': depth,
+                'content_hash': content_hash, 'unchanged': (known or {}).get('content_hash') == content_hash}
+
+    async def scrape_website(self, start_url, max_depth=2, concurrency=None, on_page=None, retain_content=True,
+                             known_pages=None):
+        pages, visited, frontier = [], set(), [start_url]
+        for depth in range(max_depth + 1):
+            next_frontier = []
+            for url in frontier:
+                if url in visited:
+                    continue
+                visited.add(url)
+                page = self._page(url, depth, (known_pages or {}).get(url))
+                pages.append(page)
+                if on_page is not None:
+                    await on_page(page)
+                next_frontier.extend(page['links']['internal'])
+            frontier = next_frontier
+        return {'success': True, 'pages': pages}
+
+class FakeChunker:
+    """One chunk per paragraph"""
+
+    def chunk_text(self, text, source_url, content_type='text', metadata=None):
+        return [{'text': paragraph, 'url': source_url, 'tokens': len(paragraph.split()), 'chunk_id': i,
+                 **{k: v for k, v in (metadata or {}).items() if k != 'json_data'}}
+                for i, paragraph in enumerate(text.split("\n\n"))]
+
+class FakeEmbeddings:
+    """Deterministic unit vector per text"""
+
+    async def embed_batch(self, texts, token_counts=None):
+        return [embed(text) for text in texts]
+
+def embed(text):
+    vector = np.random.default_rng(zlib.crc32(text.encode('utf-8'))).standard_normal(DIMENSION)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = ShardedVectorStore()
+    return IngestionPipeline(FakeScraper({}), FakeChunker(), FakeEmbeddings(), store,
+                             crawl_state=CrawlStateStore(""))
+
+def crawl(pipeline, site, recrawl=False, streaming=False, failures=None):
+    pipeline.scraper.site = site
+    pipeline.scraper.failures = failures or {}
+    return asyncio.run(pipeline.run(ROOT, recrawl=recrawl, streaming=streaming))
+
+def indexed_texts(store):
+    texts = set()
+    for text in {NAV, "welcome", "page a", "page a changed", "page b", "page c", "guides", "guide x", "guide y"}:
+        hits = store.search(embed(text), top_k=1)
+        if hits and hits[0]['text'] == text:
+            texts.add(text)
+    return texts
+
+def nav_hit(store):
+    return store.search(embed(NAV), top_k=1)[0]
+
+ROOT = "https://example.com/"
+A, B, C = "https://example.com/a", "https://example.com/b", "https://example.com/c"
+SITE = {
+    ROOT: ("welcome", [A, B, C]),
+    A: (page_text("page a"), []),
+    B: (page_text("page b"), []),
+    C: (page_text("page c"), []),
+}
+
+def test_delete_urls_keeps_chunks_still_found_on_other_pages(tmp_path):
+    store = ShardedVectorStore()
+    store.add_embeddings([embed(NAV)], [{'text': NAV, 'url': A, 'source_domain': 'example.com',
+                                         'content_type': 'text', 'tokens': 12, 'chunk_id': 0, 'source_urls': [A, B, C]}])
+    store.save_to_disk(str(tmp_path / 'store'))
+    loaded = ShardedVectorStore()
+    loaded.load_from_disk(str(tmp_path / 'store'))
+
+    assert loaded.delete_urls('example.com', [A]) == 0
+    hit = nav_hit(loaded)
+    assert hit['url'] == B
+    assert hit['source_urls'] == [B, C]
+    assert loaded.delete_urls('example.com', [C]) == 0
+    assert loaded.delete_urls('example.com', [B]) == 1
+    assert loaded.is_empty()
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_recrawl_with_changed_representative_page_keeps_shared_chunk(pipeline, streaming):
+    first = crawl(pipeline, SITE, streaming=streaming)
+    assert first['chunks_deduplicated'] == 2
+    assert nav_hit(pipeline.vector_store)['url'] == A
+
+    result = crawl(pipeline, {**SITE, A: ("page a changed", [])}, recrawl=True, streaming=streaming)
+    assert result['pages_unchanged'] == 3
+    assert indexed_texts(pipeline.vector_store) == {NAV, "welcome", "page a changed", "page b", "page c"}
+    hit = nav_hit(pipeline.vector_store)
+    assert hit['url'] == B
+    assert hit['source_urls'] == [B, C]
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_recrawl_with_removed_representative_page_keeps_shared_chunk(pipeline, streaming):
+    crawl(pipeline, SITE, streaming=streaming)
+    result = crawl(pipeline, SITE, recrawl=True, streaming=streaming, failures={A: 404})
+    assert result['pages_removed'] == 1
+    assert indexed_texts(pipeline.vector_store) == {NAV, "welcome", "page b", "page c"}
+    assert nav_hit(pipeline.vector_store)['url'] == B
+    assert set(pipeline.crawl_state.get_site('example.com')) == {ROOT, B, C}
+
+GUIDES = "https://example.com/guides"
+X, Y = "https://example.com/guides/x", "https://example.com/guides/y"
+HUB_SITE = {
+    ROOT: ("welcome", [GUIDES]),
+    GUIDES: ("guides", [X, Y]),
+    X: ("guide x", []),
+    Y: ("guide y", []),
+}
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_recrawl_with_failed_hub_page_keeps_its_subtree(pipeline, streaming):
+    crawl(pipeline, HUB_SITE, streaming=streaming)
+    result = crawl(pipeline, HUB_SITE, recrawl=True, streaming=streaming, failures={GUIDES: 503})
+    assert result['pages_removed'] == 0
+    assert indexed_texts(pipeline.vector_store) == {"welcome", "guides", "guide x", "guide y"}
+    assert set(pipeline.crawl_state.get_site('example.com')) == {ROOT, GUIDES, X, Y}
+
+def test_recrawl_removes_pages_no_longer_linked_or_behind_a_removed_hub(pipeline):
+    crawl(pipeline, HUB_SITE)
+    unlinked = crawl(pipeline, {**HUB_SITE, GUIDES: ("guides", [X])}, recrawl=True)
+    assert unlinked['pages_removed'] == 1
+    assert indexed_texts(pipeline.vector_store) == {"welcome", "guides", "guide x"}
+
+    gone = crawl(pipeline, HUB_SITE, recrawl=True, failures={GUIDES: 410})
+    assert gone['pages_removed'] == 2
+    assert indexed_texts(pipeline.vector_store) == {"welcome"}
+    assert set(pipeline.crawl_state.get_site('example.com')) == {ROOT}
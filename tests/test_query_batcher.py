@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import numpy as np
+from backend.query_batcher import QueryBatcher
+from backend.sharded_store import ShardedVectorStore
+from backend.vector_store import LexicalIndexBuild
+
+DIMENSION = 1536
+
+def unit(*weights):
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    vector[:len(weights)] = weights
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def build_store():
+    store = ShardedVectorStore(lexical_min_score=0.5)
+    texts = ["pricing plans for teams", "pricing plans compared", "monthly billing of plans", "careers at the company"]
+    vectors = [unit(1.0, 0.1), unit(1.0, 0.5), unit(1.0, 1.0), unit(0.0, 1.0)]
+    store.add_embeddings(vectors, [
+        {'text': text, 'url': f"https://docs.example/{i}", 'source_domain': 'docs.example', 'content_type': 'text',
+         'tokens': 5, 'chunk_id': i}
+        for i, text in enumerate(texts)
+    ])
+    return store
+
+def test_batched_queries_match_unbatched_search():
+    store = build_store()
+    batcher = QueryBatcher(store, window_ms=50)
+    query = unit(1.0, 0.2)
+    requests = [(3, None, "pricing plans"), (3, 0.9, "pricing plans"), (1, 0.5, "pricing plans"), (2, 0.9, "careers")]
+
+    async def run():
+        return await asyncio.gather(*(batcher.search(query, top_k, min_score=cutoff, query_text=text)
+                                      for top_k, cutoff, text in requests))
+
+    batched = asyncio.run(run())
+    # One batch per top_k: hybrid candidate depth, and so the fused ranking, follows top_k
+    assert batcher.stats['batches'] == 3 and batcher.stats['largest_batch'] == 2
+    for (top_k, cutoff, text), hits in zip(requests, batched):
+        expected = store.search(query, top_k, min_score=cutoff, query_text=text)
+        assert [hit['url'] for hit in hits] == [hit['url'] for hit in expected]
+        assert len(hits) == len(expected)
+    # A strong lexical match is kept even though its similarity is below the cutoff
+    assert 'https://docs.example/3' in [hit['url'] for hit in batched[3]]
+
+def test_hybrid_search_builds_lexical_indexes_off_the_event_loop(tmp_path, monkeypatch):
+    build_store().save_to_disk(str(tmp_path / 'store'))
+    store = ShardedVectorStore(lexical_min_score=0.5)
+    store.load_from_disk(str(tmp_path / 'store'))
+    assert all(shard._lexical is None for shard in store.shards.values())
+    threads = []
+    run_build = LexicalIndexBuild.run
+    monkeypatch.setattr(LexicalIndexBuild, 'run', lambda build: threads.append(threading.current_thread()) or run_build(build))
+    batcher = QueryBatcher(store, window_ms=5)
+
+    async def run():
+        return await asyncio.gather(*(batcher.search(unit(1.0, 0.2), 3, query_text=text)
+                                      for text in ("pricing plans", "monthly billing")))
+
+    hits = asyncio.run(run())
+    assert len(threads) == len(store.shards) and threading.main_thread() not in threads
+    assert all(shard._lexical is not None for shard in store.shards.values())
+    assert hits[1][0]['url'] == 'https://docs.example/2'
+    assert not batcher._lexical_tasks
+
+def test_hybrid_ranking_does_not_depend_on_the_top_k_of_other_queries():
+    # Chunk i is the (i + 1)-th dense match; 'zebra' is a lexical match for chunks 19 and 20 only.
+    # Chunk 20 is only a dense candidate from top_k 10 on (40 deep instead of 20), which moves it first.
+    store = ShardedVectorStore()
+    angles = np.linspace(0.1, 1.4, 45)
+    vectors = []
+    for i, angle in enumerate(angles):
+        vector = np.zeros(DIMENSION, dtype=np.float32)
+        vector[0], vector[i + 1] = np.cos(angle), np.sin(angle)
+        vectors.append(vector.tolist())
+    texts = [f"filler text number {i}" for i in range(45)]
+    texts[19], texts[20] = "zebra crossing guide", "zebra zebra crossing"
+    store.add_embeddings(vectors, [
+        {'text': text, 'url': f"https://docs.example/{i}", 'source_domain': 'docs.example', 'content_type': 'text',
+         'tokens': 3, 'chunk_id': i}
+        for i, text in enumerate(texts)
+    ])
+    query = unit(1.0)
+    assert store.search(query, 1, query_text="zebra")[0]['url'] == 'https://docs.example/19'
+    assert store.search(query, 10, query_text="zebra")[0]['url'] == 'https://docs.example/20'
+    batcher = QueryBatcher(store, window_ms=50)
+
+    async def run():
+        return await asyncio.gather(batcher.search(query, 1, query_text="zebra"),
+                                    batcher.search(query, 10, query_text="zebra"))
+
+    top_one, top_ten = asyncio.run(run())
+    assert [hit['url'] for hit in top_one] == ['https://docs.example/19']
+    assert top_ten[0]['url'] == 'https://docs.example/20'
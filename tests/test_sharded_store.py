@@ -0,0 +1,70 @@
+import os
+import numpy as np
+from backend.sharded_store import ShardedVectorStore
+
+DIMENSION = 1536
+
+def unit(*weights):
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    for axis, weight in enumerate(weights):
+        vector[axis] = weight
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def chunk(domain, text, index):
+    return {'text': text, 'url': f"https://{domain}/{index}", 'source_domain': domain, 'content_type': 'text',
+            'tokens': 10, 'chunk_id': index}
+
+def build_store():
+    store = ShardedVectorStore()
+    relevant = [
+        (unit(1.0, 0.2), "pricing plans for teams and the enterprise pricing tiers"),
+        (unit(1.0, 0.4), "pricing plans compared side by side"),
+        (unit(1.0, 0.6), "how pricing plans are billed every month"),
+        (unit(1.0, 0.8), "pricing plans and discounts for students"),
+        (unit(0.2, 1.0), "company history and the founding team"),
+        (unit(0.1, 1.0), "careers and open positions"),
+    ]
+    store.add_embeddings([v for v, _ in relevant], [chunk('docs.example', t, i) for i, (_, t) in enumerate(relevant)])
+    # A small unrelated site whose only chunk shares one query word
+    store.add_embeddings([unit(0.0, 0.0, 1.0)], [chunk('blog.example', "the pricing of a bicycle repair", 0)])
+    return store
+
+def test_hybrid_search_ranks_across_shards_by_relevance():
+    store = build_store()
+    query = unit(1.0, 0.1)
+    hits = store.search(query, top_k=4, query_text="pricing plans")
+    assert [hit['source_domain'] for hit in hits] == ['docs.example'] * 4
+    assert [hit['url'] for hit in hits] == [f"https://docs.example/{i}" for i in range(4)]
+    assert [hit.rank for hit in hits] == [1, 2, 3, 4]
+    fusion = [hit.fusion_score for hit in hits]
+    assert fusion == sorted(fusion, reverse=True)
+
+def test_hybrid_min_score_applies_to_lexical_matches():
+    store = build_store()
+    hits = store.search(unit(1.0, 0.1), top_k=10, min_score=0.5, query_text="the pricing")
+    assert hits and all(hit.similarity_score >= 0.5 for hit in hits)
+    assert 'blog.example' not in {hit['source_domain'] for hit in hits}
+
+def test_dense_search_merges_shards_by_similarity():
+    store = build_store()
+    hits = store.search(unit(0.0, 0.1, 1.0), top_k=2)
+    assert hits[0]['source_domain'] == 'blog.example'
+    assert hits[0].similarity_score >= hits[1].similarity_score
+
+def test_readers_leave_an_unsharded_store_for_the_writer_to_split(tmp_path):
+    from backend.vector_store import VectorStore
+    path = str(tmp_path / 'store')
+    unsharded = VectorStore()
+    unsharded.add_embeddings([unit(1.0), unit(0.0, 1.0)], [chunk('docs.example', "pricing", 0), chunk('blog.example', "news", 1)])
+    unsharded.save_to_disk(path)
+    files = sorted(os.listdir(path))
+
+    reader = ShardedVectorStore()
+    reader.load_from_disk(path, read_only=True)
+    assert reader.is_empty() and sorted(os.listdir(path)) == files
+    assert reader.refresh_from_disk(path) == 'unchanged'
+
+    writer = ShardedVectorStore()
+    writer.load_from_disk(path)
+    assert sorted(writer.shards) == ['blog.example', 'docs.example']
+    assert reader.refresh_from_disk(path) == 'reloaded' and reader.get_size() == 2
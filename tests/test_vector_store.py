@@ -0,0 +1,153 @@
+import os
+import numpy as np
+from backend.vector_store import VectorStore
+
+DIMENSION = 1536
+
+def random_vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+def chunks(count, domain='docs.example'):
+    return [{'text': f"page {i} about product SKU-{i:04d}", 'url': f"https://{domain}/{i}", 'source_domain': domain,
+             'content_type': 'text', 'tokens': 6, 'chunk_id': i} for i in range(count)]
+
+def test_lexical_index_is_built_on_first_use_after_load(tmp_path):
+    store = VectorStore()
+    vectors = random_vectors(50)
+    store.add_embeddings(vectors, chunks(50))
+    store.save_to_disk(str(tmp_path / 'store'))
+
+    loaded = VectorStore()
+    loaded.load_from_disk(str(tmp_path / 'store'))
+    assert loaded._lexical is None
+    hits = loaded.search(vectors[7], top_k=3, query_text="SKU-0007")
+    assert hits[0]['url'] == "https://docs.example/7"
+    assert len(loaded._lexical) == 50
+
+def test_lexical_build_replays_writes_made_while_it_runs(tmp_path):
+    store = VectorStore()
+    vectors = random_vectors(60)
+    store.add_embeddings(vectors[:50], chunks(50))
+    store.save_to_disk(str(tmp_path / 'store'))
+
+    loaded = VectorStore()
+    loaded.load_from_disk(str(tmp_path / 'store'))
+    build = loaded.begin_lexical_build()
+    assert build is not None and loaded.begin_lexical_build() is build
+    loaded.add_embeddings(vectors[50:], chunks(60)[50:])
+    loaded._delete_ids({7, 55})
+    build.run()
+    assert loaded._lexical is None
+    build.install()
+    assert loaded.begin_lexical_build() is None and len(loaded._lexical) == 58
+    assert loaded.search(vectors[53], top_k=1, query_text="SKU-0053")[0]['vector_id'] == 53
+    lexical_ids, _ = loaded._lexical.search("SKU-0007 SKU-0055", 10)
+    assert not {7, 55} & set(lexical_ids.tolist())
+
+def test_ivfpq_rebuild_below_pq_training_size_keeps_vectors():
+    store = VectorStore(index_type='ivfpq', min_train_size=10)
+    vectors = random_vectors(100)
+    store.add_embeddings(vectors, chunks(100))
+    assert not store.trained
+
+    store._rebuild_index()
+    assert not store.trained
+    hits = store.search(vectors[42], top_k=1)
+    assert hits and hits[0]['vector_id'] == 42
+    assert store.evaluate_index(vectors[:5], top_k=5)['recall@5'] == 1.0
+
+def test_appending_to_a_loaded_store_keeps_the_base_mapped(tmp_path):
+    store = VectorStore()
+    vectors = random_vectors(60)
+    store.add_embeddings(vectors[:40], chunks(40))
+    store.save_to_disk(str(tmp_path / 'store'))
+
+    loaded = VectorStore()
+    loaded.load_from_disk(str(tmp_path / 'store'))
+    loaded.add_embeddings(vectors[40:], [{**chunk, 'chunk_id': i} for i, chunk in enumerate(chunks(60)[40:], 40)])
+    loaded._delete_ids({3, 45})
+    assert isinstance(loaded._base_vectors, np.memmap) and not loaded._base_vectors.flags.writeable
+    assert loaded._tail_size == 19
+    ids, stored = loaded._stored_vectors()
+    assert sorted(ids.tolist()) == [i for i in range(60) if i not in (3, 45)]
+    assert loaded.search(vectors[50], top_k=1)[0]['vector_id'] == 50
+    assert loaded.search(vectors[10], top_k=1)[0]['vector_id'] == 10
+
+def test_flat_store_searches_the_mapped_vectors_without_an_index(tmp_path):
+    store = VectorStore()
+    vectors = random_vectors(300)
+    store.add_embeddings(vectors, chunks(300))
+    store._delete_ids({i for i in range(0, 300, 7)})
+    store.save_to_disk(str(tmp_path / 'store'))
+    assert not any(name.endswith('.faiss') for name in os.listdir(tmp_path / 'store'))
+
+    loaded = VectorStore()
+    loaded.load_from_disk(str(tmp_path / 'store'))
+    assert loaded.index is None
+    assert loaded.search(vectors[299], top_k=1)[0]['vector_id'] == 299
+    assert all(hit['vector_id'] % 7 for hit in loaded.search(vectors[0], top_k=10))
+    hits = loaded.search(vectors[5], top_k=1, domain_filter='other.example')
+    assert hits == []
+
+def test_snapshot_cleanup_spares_files_of_a_running_compaction(tmp_path, monkeypatch):
+    import threading
+    import backend.vector_store as vector_store_module
+    path = str(tmp_path / 'store')
+    store = VectorStore(max_segments=100)
+    vectors = random_vectors(30)
+    store.add_embeddings(vectors[:10], chunks(10))
+    store.save_to_disk(path)
+    store.add_embeddings(vectors[10:20], chunks(20)[10:])
+    store.save_to_disk(path)
+
+    writing, release = threading.Event(), threading.Event()
+    atomic_write = vector_store_module._atomic_write
+
+    def slow_write(target, write):
+        if threading.current_thread().name == "vector-store-compaction" and target.endswith('.f32'):
+            write(f"{target}.tmp")
+            writing.set()
+            release.wait(5)
+            os.replace(f"{target}.tmp", target)
+        else:
+            atomic_write(target, write)
+
+    monkeypatch.setattr(vector_store_module, '_atomic_write', slow_write)
+    store.compact(path)
+    assert writing.wait(5)
+    in_flight = [name for name in os.listdir(path) if name.endswith('.f32.tmp')]
+    assert in_flight
+    # A rebuilt index forces a full snapshot, whose cleanup runs while the compaction is writing
+    store._snapshot_stale = True
+    store.save_to_disk(path)
+    assert all(os.path.exists(os.path.join(path, name)) for name in in_flight)
+    release.set()
+    store.wait_for_compaction()
+
+    loaded = VectorStore()
+    loaded.load_from_disk(path)
+    assert loaded.get_size() == 20
+
+def test_refresh_reloads_when_a_compaction_deletes_segments_mid_replay(tmp_path, monkeypatch):
+    path = str(tmp_path / 'store')
+    writer = VectorStore(max_segments=100)
+    vectors = random_vectors(30)
+    writer.add_embeddings(vectors[:10], chunks(10))
+    writer.save_to_disk(path)
+    reader = VectorStore()
+    reader.load_from_disk(path)
+    for start in (10, 20):
+        writer.add_embeddings(vectors[start:start + 10], chunks(start + 10)[start:])
+        writer.save_to_disk(path)
+
+    apply_segment = VectorStore._apply_segment
+
+    def compact_first(store, segment_path, segment):
+        # The writer's compaction lands after the reader read the manifest
+        writer.compact(path, background=False)
+        return apply_segment(store, segment_path, segment)
+
+    monkeypatch.setattr(VectorStore, '_apply_segment', compact_first)
+    assert reader.refresh_from_disk(path) == 'reloaded'
+    assert reader.get_size() == 30 and reader.generation == writer.generation
+    assert reader.search(vectors[25], top_k=1)[0]['vector_id'] == 25